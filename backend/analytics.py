@@ -0,0 +1,343 @@
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+LB_TO_KG = 0.45359237
+
+LOAD_WITH_UNIT = re.compile(r"(\d+(?:[.,]\d+)?)\s*(kgs?|quilos?|lbs?|libras?)\b")
+NUMBER = re.compile(r"\d+(?:[.,]\d+)?")
+SETS_PREFIX = re.compile(r"^\s*(\d+)\s*[x×]\s*(.*)$")
+REP_RANGE = re.compile(r"(\d+)\s*(?:-|a|até)\s*(\d+)")
+INTEGER = re.compile(r"\d+")
+
+
+def _to_float(text: str) -> float:
+    return float(text.replace(",", "."))
+
+
+def parse_load(text: Optional[str]) -> Optional[float]:
+    """Carga em kg a partir de textos como "40kg", "12,5", "90 lbs"."""
+    if not text:
+        return None
+    lowered = text.lower()
+    match = LOAD_WITH_UNIT.search(lowered)
+    if match:
+        value, unit = _to_float(match.group(1)), match.group(2)
+        if unit.startswith(("lb", "libra")):
+            value *= LB_TO_KG
+        return round(value, 2)
+    match = NUMBER.search(lowered)
+    return round(_to_float(match.group(0)), 2) if match else None
+
+
+def parse_reps(text: Optional[str]) -> Tuple[Optional[int], Optional[float]]:
+    """(séries, repetições) a partir de "3x12", "8-10", "3 x 8-10" ou "12/10/8"."""
+    if not text:
+        return None, None
+    lowered = text.lower()
+    sets = None
+    match = SETS_PREFIX.match(lowered)
+    if match:
+        sets, lowered = int(match.group(1)), match.group(2)
+
+    rep_range = REP_RANGE.search(lowered)
+    if rep_range:
+        low, high = int(rep_range.group(1)), int(rep_range.group(2))
+        return sets, (low + high) / 2
+
+    numbers = [int(n) for n in INTEGER.findall(lowered)]
+    if not numbers:
+        return sets, None
+    if len(numbers) > 1:
+        # Pirâmide ("12/10/8"): uma série por número
+        return sets or len(numbers), sum(numbers) / len(numbers)
+    return sets, float(numbers[0])
+
+
+def normalize_history(data: dict) -> dict:
+    """Preenche load_kg, set_count e rep_count mantendo os campos de texto originais."""
+    parsed_sets, reps = parse_reps(data.get("reps"))
+    data["load_kg"] = parse_load(data.get("weight"))
+    data["set_count"] = data.get("sets") or parsed_sets
+    data["rep_count"] = reps
+    return data
+
+
+def _as_array(values: Iterable) -> np.ndarray:
+    return np.array([np.nan if v is None else float(v) for v in values], dtype=float)
+
+
+def compute_metrics(load: np.ndarray, sets: np.ndarray, reps: np.ndarray) -> Dict[str, np.ndarray]:
+    """Volume, 1RM estimado (Epley) e recordes, vetorizado sobre a série ordenada por data."""
+    volume = load * np.where(np.isnan(sets), 1.0, sets) * reps
+    e1rm = np.where(reps <= 1, load, load * (1 + reps / 30.0))
+    best_load = np.fmax.accumulate(np.where(np.isnan(load), -np.inf, load))
+    best_e1rm = np.fmax.accumulate(np.where(np.isnan(e1rm), -np.inf, e1rm))
+    # O primeiro registro é a linha de base, não um recorde
+    previous_load = np.concatenate(([np.inf], best_load[:-1]))
+    previous_e1rm = np.concatenate(([np.inf], best_e1rm[:-1]))
+    is_pr = (load > previous_load) | (e1rm > previous_e1rm)
+    return {"volume": volume, "e1rm": e1rm, "is_pr": is_pr}
+
+
+def _value(x) -> Optional[float]:
+    return None if x is None or np.isnan(x) else round(float(x), 2)
+
+
+class ExerciseSeries:
+    def __init__(self, name: str):
+        self.name = name
+        self.exercise_ids: set = set()
+        self.dates: List[str] = []
+        self.load = np.empty(0)
+        self.sets = np.empty(0)
+        self.reps = np.empty(0)
+        self.volume = np.empty(0)
+        self.e1rm = np.empty(0)
+        self.is_pr = np.empty(0, dtype=bool)
+
+    def load_rows(self, rows: List[dict]) -> None:
+        rows = sorted(rows, key=lambda r: r["date"])
+        self.dates = [r["date"] for r in rows]
+        self.load = _as_array(r["load_kg"] for r in rows)
+        self.sets = _as_array(r["set_count"] for r in rows)
+        self.reps = _as_array(r["rep_count"] for r in rows)
+        metrics = compute_metrics(self.load, self.sets, self.reps)
+        self.volume, self.e1rm, self.is_pr = metrics["volume"], metrics["e1rm"], metrics["is_pr"]
+
+    def append(self, row: dict) -> bool:
+        """Acrescenta um registro sem recalcular a série; False se ele não for o mais recente."""
+        if self.dates and row["date"] < self.dates[-1]:
+            return False
+        load, sets, reps = _as_array([row["load_kg"], row["set_count"], row["rep_count"]])
+        metrics = compute_metrics(np.array([load]), np.array([sets]), np.array([reps]))
+        volume, e1rm = metrics["volume"][0], metrics["e1rm"][0]
+        best_load = np.fmax.reduce(self.load, initial=-np.inf) if self.dates else np.inf
+        best_e1rm = np.fmax.reduce(self.e1rm, initial=-np.inf) if self.dates else np.inf
+        self.dates.append(row["date"])
+        self.load = np.append(self.load, load)
+        self.sets = np.append(self.sets, sets)
+        self.reps = np.append(self.reps, reps)
+        self.volume = np.append(self.volume, volume)
+        self.e1rm = np.append(self.e1rm, e1rm)
+        self.is_pr = np.append(self.is_pr, bool(load > best_load or e1rm > best_e1rm))
+        return True
+
+    def to_dict(self, last: Optional[int] = None) -> dict:
+        start = max(len(self.dates) - last, 0) if last else 0
+        points = [
+            {
+                "date": self.dates[i],
+                "load_kg": _value(self.load[i]),
+                "sets": _value(self.sets[i]),
+                "reps": _value(self.reps[i]),
+                "volume_kg": _value(self.volume[i]),
+                "e1rm_kg": _value(self.e1rm[i]),
+                "is_pr": bool(self.is_pr[i]),
+            }
+            for i in range(start, len(self.dates))
+        ]
+        return {
+            "name": self.name,
+            "exercise_ids": sorted(self.exercise_ids),
+            "sessions": len(self.dates),
+            "last_date": self.dates[-1] if self.dates else None,
+            "best_load_kg": _value(np.nanmax(self.load)) if np.any(~np.isnan(self.load)) else None,
+            "best_e1rm_kg": _value(np.nanmax(self.e1rm)) if np.any(~np.isnan(self.e1rm)) else None,
+            "total_volume_kg": _value(np.nansum(self.volume)),
+            "points": points,
+        }
+
+
+def series_key(name: str) -> str:
+    return " ".join(name.lower().split())
+
+
+class StudentProgress:
+    """Séries de progressão de um aluno, agrupadas pelo nome do exercício."""
+
+    def __init__(self, student_id: str, workouts: List[dict], exercises: List[dict], history: List[dict]):
+        self.student_id = student_id
+        self.built_at = time.monotonic()
+        self.workout_ids = {w["id"] for w in workouts}
+        self.series: Dict[str, ExerciseSeries] = {}
+        self.exercise_index: Dict[str, str] = {}
+        for exercise in exercises:
+            self.add_exercise(exercise)
+        rows_by_key: Dict[str, List[dict]] = {}
+        for row in history:
+            key = self.exercise_index.get(row["exercise_id"])
+            if key is not None:
+                rows_by_key.setdefault(key, []).append(with_metrics(row))
+        for key, rows in rows_by_key.items():
+            self.series[key].load_rows(rows)
+
+    def add_exercise(self, exercise: dict) -> None:
+        key = series_key(exercise["name"])
+        self.exercise_index[exercise["id"]] = key
+        self.series.setdefault(key, ExerciseSeries(exercise["name"])).exercise_ids.add(exercise["id"])
+
+    def to_dict(self, last: Optional[int] = None) -> List[dict]:
+        return [s.to_dict(last) for s in self.series.values() if s.dates]
+
+
+def with_metrics(row: dict) -> dict:
+    # Registros anteriores à normalização na escrita ainda não têm as colunas numéricas
+    if row.get("load_kg") is None and row.get("rep_count") is None:
+        return normalize_history(dict(row))
+    return row
+
+
+class ProgressTracker:
+    """Mantém o progresso calculado por aluno e o atualiza incrementalmente a cada escrita."""
+
+    def __init__(self, ttl: float = 300.0, max_students: int = 1000):
+        self.ttl = ttl
+        self.max_students = max_students
+        self._states: "OrderedDict[Tuple[str, str], StudentProgress]" = OrderedDict()
+
+    def get(self, user_id: str, student_id: str) -> Optional[StudentProgress]:
+        state = self._states.get((user_id, student_id))
+        if state is None:
+            return None
+        if time.monotonic() - state.built_at > self.ttl:
+            del self._states[(user_id, student_id)]
+            return None
+        self._states.move_to_end((user_id, student_id))
+        return state
+
+    def set(self, user_id: str, student_id: str, state: StudentProgress) -> None:
+        self._states[(user_id, student_id)] = state
+        self._states.move_to_end((user_id, student_id))
+        while len(self._states) > self.max_students:
+            self._states.popitem(last=False)
+
+    def on_change(self, user_id: str, table: str, op: str, rows: List[dict]) -> None:
+        states = [(key, state) for key, state in self._states.items() if key[0] == user_id]
+        if not states:
+            return
+        for row in rows:
+            for key, state in states:
+                if key not in self._states:
+                    continue
+                if op == "insert" and self._apply_insert(state, table, row):
+                    continue
+                if self._affects(state, table, row):
+                    del self._states[key]
+
+    @staticmethod
+    def _apply_insert(state: StudentProgress, table: str, row: dict) -> bool:
+        """Aplica uma inserção ao estado; False quando é preciso recalcular do zero."""
+        if table == "workouts":
+            if row.get("student_id") == state.student_id:
+                state.workout_ids.add(row["id"])
+            return True
+        if table == "exercises":
+            if row.get("workout_id") in state.workout_ids:
+                state.add_exercise(row)
+            return True
+        if table == "exercise_history":
+            key = state.exercise_index.get(row.get("exercise_id"))
+            if key is None:
+                return True
+            return state.series[key].append(with_metrics(row))
+        return table in ("cardio", "evolution", "weekly_routine", "students")
+
+    @staticmethod
+    def _affects(state: StudentProgress, table: str, row: dict) -> bool:
+        if table == "students":
+            return row.get("id") == state.student_id
+        if table == "workouts":
+            return row.get("student_id") == state.student_id or row.get("id") in state.workout_ids
+        if table == "exercises":
+            return row.get("workout_id") in state.workout_ids or row.get("id") in state.exercise_index
+        if table == "exercise_history":
+            return row.get("exercise_id") in state.exercise_index
+        return False
+
+
+def height_in_meters(height: Optional[float]) -> Optional[float]:
+    if not height:
+        return None
+    # O cadastro aceita tanto 1.75 quanto 175
+    return float(height) / 100 if height > 3 else float(height)
+
+
+def bucket_starts(dates: np.ndarray, bucket: str) -> np.ndarray:
+    """Início do período (segunda-feira da semana ou dia 1 do mês) de cada data."""
+    days = dates.astype("datetime64[D]")
+    if bucket == "month":
+        return days.astype("datetime64[M]").astype("datetime64[D]")
+    # 1970-01-01 foi quinta-feira: (dias + 3) % 7 == 0 nas segundas
+    return days - (days.astype(np.int64) + 3) % 7
+
+
+def _group(dates: List[str], bucket: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    starts = bucket_starts(np.array([d[:10] for d in dates], dtype="datetime64[D]"), bucket)
+    keys, first = np.unique(starts, return_index=True)
+    counts = np.diff(np.append(first, len(starts)))
+    return keys, first, counts
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    sums = np.cumsum(np.insert(values, 0, 0.0))
+    ends = np.arange(1, len(values) + 1)
+    begins = np.maximum(ends - window, 0)
+    return (sums[ends] - sums[begins]) / (ends - begins)
+
+
+def weight_buckets(rows: List[dict], bucket: str, window: int, height_m: Optional[float]) -> List[dict]:
+    """Agrega o peso por período: mín, máx, média, último, média móvel e IMC."""
+    rows = sorted((r for r in rows if r.get("current_weight") is not None), key=lambda r: r["date"])
+    if not rows:
+        return []
+    values = np.array([float(r["current_weight"]) for r in rows])
+    keys, first, counts = _group([r["date"] for r in rows], bucket)
+    means = np.add.reduceat(values, first) / counts
+    lasts = values[first + counts - 1]
+    bmi = lasts / height_m ** 2 if height_m else np.full(len(keys), np.nan)
+    return [
+        {
+            "start": str(key),
+            "count": int(count),
+            "min": _value(low),
+            "max": _value(high),
+            "mean": _value(mean),
+            "last": _value(last),
+            "rolling_mean": _value(rolling),
+            "bmi": _value(b),
+        }
+        for key, count, low, high, mean, last, rolling, b in zip(
+            keys, counts,
+            np.minimum.reduceat(values, first), np.maximum.reduceat(values, first),
+            means, lasts, rolling_mean(means, window), bmi,
+        )
+    ]
+
+
+def cardio_buckets(rows: List[dict], bucket: str, window: int) -> List[dict]:
+    """Sessões e minutos de cardio por período, com média móvel dos minutos."""
+    dated = sorted(
+        ((r.get("date") or r["created_at"][:10], r.get("duration")) for r in rows),
+        key=lambda item: item[0],
+    )
+    if not dated:
+        return []
+    durations = np.array([np.nan if d is None else float(d) for _, d in dated])
+    keys, first, counts = _group([d for d, _ in dated], bucket)
+    totals = np.add.reduceat(np.nan_to_num(durations), first)
+    timed = np.add.reduceat((~np.isnan(durations)).astype(float), first)
+    means = np.divide(totals, timed, out=np.full(len(keys), np.nan), where=timed > 0)
+    return [
+        {
+            "start": str(key),
+            "sessions": int(count),
+            "total_duration": _value(total),
+            "mean_duration": _value(mean),
+            "rolling_duration": _value(rolling),
+        }
+        for key, count, total, mean, rolling in zip(keys, counts, totals, means, rolling_mean(totals, window))
+    ]
@@ -0,0 +1,158 @@
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+import httpx
+from cachetools import TLRUCache
+from jose import jwt, JWTError
+
+logger = logging.getLogger(__name__)
+
+SYMMETRIC_ALGORITHMS = {"HS256", "HS384", "HS512"}
+ASYMMETRIC_ALGORITHMS = {"RS256", "RS384", "RS512", "ES256", "ES384", "ES512"}
+
+
+class TokenVerificationError(Exception):
+    pass
+
+
+class TokenVerifier:
+    """Verifica JWTs do Supabase localmente (segredo HS256 ou JWKS), com cache dos tokens já validados."""
+
+    def __init__(
+        self,
+        supabase_url: str,
+        jwt_secret: str = "",
+        audience: str = "authenticated",
+        cache_ttl: int = 300,
+        cache_size: int = 10000,
+        jwks_ttl: int = 3600,
+        jwks_min_refresh_interval: int = 60,
+        remote_check: Optional[Callable[[str], Optional[str]]] = None,
+        check_revoked: bool = False,
+    ):
+        self.jwt_secret = jwt_secret
+        self.audience = audience
+        self.issuer = f"{supabase_url.rstrip('/')}/auth/v1"
+        self.jwks_url = f"{self.issuer}/.well-known/jwks.json"
+        self.cache_ttl = cache_ttl
+        self.jwks_ttl = jwks_ttl
+        self.jwks_min_refresh_interval = jwks_min_refresh_interval
+        self.remote_check = remote_check
+        self.check_revoked = check_revoked
+
+        # O item expira no que vier primeiro: TTL do cache ou `exp` do próprio token
+        self._cache = TLRUCache(maxsize=cache_size, ttu=self._time_to_use, timer=time.time)
+        self._cache_lock = threading.Lock()
+        self._jwks: dict = {}
+        self._jwks_fetched_at = 0.0
+        self._jwks_lock = threading.Lock()
+
+    def _time_to_use(self, _key, value, now):
+        _user_id, exp = value
+        return min(now + self.cache_ttl, exp)
+
+    def cached(self, token: str) -> Optional[str]:
+        with self._cache_lock:
+            cached = self._cache.get(token)
+        return cached[0] if cached is not None else None
+
+    def verify(self, token: str) -> str:
+        user_id = self.cached(token)
+        if user_id is not None:
+            return user_id
+
+        try:
+            claims = self._decode(token)
+        except TokenVerificationError:
+            raise
+        except JWTError as e:
+            raise TokenVerificationError(str(e)) from e
+
+        if claims is None:
+            # Sem segredo nem JWKS disponíveis: valida no Supabase Auth
+            user_id = self._verify_remote(token)
+            exp = time.time() + self.cache_ttl
+        else:
+            user_id = claims.get("sub")
+            exp = float(claims.get("exp", 0))
+            if not user_id:
+                raise TokenVerificationError("Token sem 'sub'")
+            if self.check_revoked and self._verify_remote(token) != user_id:
+                raise TokenVerificationError("Sessão revogada")
+
+        with self._cache_lock:
+            self._cache[token] = (user_id, exp)
+        return user_id
+
+    def invalidate(self, token: str) -> None:
+        with self._cache_lock:
+            self._cache.pop(token, None)
+
+    def warm(self) -> None:
+        """Busca o JWKS antes do primeiro token, quando não há segredo HS256 configurado."""
+        if not self.jwt_secret:
+            with self._jwks_lock:
+                self._refresh_jwks(time.time())
+
+    @property
+    def jwks_loaded(self) -> bool:
+        return bool(self._jwks)
+
+    def _decode(self, token: str) -> Optional[dict]:
+        header = jwt.get_unverified_header(token)
+        alg = header.get("alg")
+
+        if alg in SYMMETRIC_ALGORITHMS:
+            if not self.jwt_secret:
+                return None
+            key = self.jwt_secret
+        elif alg in ASYMMETRIC_ALGORITHMS:
+            key = self._get_signing_key(header.get("kid"))
+            if key is None:
+                return None
+        else:
+            raise TokenVerificationError(f"Algoritmo não suportado: {alg}")
+
+        return jwt.decode(
+            token,
+            key,
+            algorithms=[alg],
+            audience=self.audience,
+            issuer=self.issuer,
+            options={"require_exp": True, "require_sub": True},
+        )
+
+    def _get_signing_key(self, kid: Optional[str]) -> Optional[dict]:
+        now = time.time()
+        with self._jwks_lock:
+            key = self._jwks.get(kid)
+            expired = now - self._jwks_fetched_at > self.jwks_ttl
+            # Chave desconhecida pode indicar rotação; refaz o fetch com limite de frequência
+            unknown = key is None and now - self._jwks_fetched_at > self.jwks_min_refresh_interval
+            if expired or unknown:
+                self._refresh_jwks(now)
+                key = self._jwks.get(kid)
+            return key
+
+    def _refresh_jwks(self, now: float) -> None:
+        try:
+            response = httpx.get(self.jwks_url, timeout=5.0)
+            response.raise_for_status()
+            keys = response.json().get("keys", [])
+            self._jwks = {k.get("kid"): k for k in keys}
+        except Exception as e:
+            logger.error(f"Erro ao buscar JWKS: {e}")
+        self._jwks_fetched_at = now
+
+    def _verify_remote(self, token: str) -> str:
+        if self.remote_check is None:
+            raise TokenVerificationError("Verificação remota indisponível")
+        try:
+            user_id = self.remote_check(token)
+        except Exception as e:
+            raise TokenVerificationError(str(e)) from e
+        if not user_id:
+            raise TokenVerificationError("Token inválido")
+        return user_id
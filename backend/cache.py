@@ -0,0 +1,198 @@
+import asyncio
+import hashlib
+import json
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+MISSING = object()
+
+
+def estimate_size(value: Any) -> int:
+    return len(json.dumps(value, default=str, separators=(",", ":")))
+
+
+class ResponseCache:
+    """Cache LRU + TTL em memória, particionado por usuário e recurso.
+
+    Cada chave guarda os filtros de coluna usados na consulta, o que permite
+    invalidar apenas as entradas que uma linha alterada pode afetar.
+    """
+
+    def __init__(self, ttl: float = 30.0, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple, Tuple[Any, float, int]]" = OrderedDict()
+        self._index: Dict[Tuple[str, str], set] = {}
+        self._generations: Dict[str, int] = {}
+        # Entra em todo ETag: as gerações recomeçam do zero a cada processo
+        self.epoch = secrets.token_hex(8)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(user_id: str, resource: str, filters: Dict[str, Any], params: Tuple[Hashable, ...] = ()) -> Tuple:
+        return (user_id, resource, tuple(sorted(filters.items())), params)
+
+    def get(self, key: Tuple) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return MISSING
+        value, expires_at, _size = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.evictions += 1
+            self.misses += 1
+            return MISSING
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def generation(self, user_id: str) -> int:
+        return self._generations.get(user_id, 0)
+
+    def etag(self, key: Tuple, generation: int) -> str:
+        """ETag forte da versão de uma leitura: a chave e a geração do usuário, sem serializar o valor."""
+        raw = f"{self.epoch}:{generation}:{key!r}".encode()
+        return f'"{hashlib.blake2b(raw, digest_size=16).hexdigest()}"'
+
+    def set(self, key: Tuple, value: Any, generation: Optional[int] = None, size: Optional[int] = None) -> None:
+        # Uma escrita do usuário durante a leitura torna o valor carregado suspeito
+        if generation is not None and generation != self.generation(key[0]):
+            return
+        if size is None:
+            size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, time.monotonic() + self.ttl, size)
+        self._index.setdefault((key[0], key[1]), set()).add(key)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, user_id: str, resource: str, row: Optional[dict] = None) -> int:
+        """Remove as entradas de `resource` cujos filtros casam com `row`.
+
+        Filtros em colunas ausentes de `row` não restringem nada; sem `row`,
+        todas as entradas do recurso para o usuário são removidas.
+        """
+        self._generations[user_id] = self.generation(user_id) + 1
+        keys = self._index.get((user_id, resource))
+        if not keys:
+            return 0
+        stale = [
+            key for key in keys
+            if row is None or all(row[column] == value for column, value in key[2] if column in row)
+        ]
+        for key in stale:
+            self._remove(key)
+        self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._index.clear()
+        self.bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _remove(self, key: Tuple) -> None:
+        _value, _expires_at, size = self._entries.pop(key)
+        self.bytes -= size
+        bucket = self._index.get((key[0], key[1]))
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del self._index[(key[0], key[1])]
+
+
+class SingleFlight:
+    """Junta leituras concorrentes idênticas numa única chamada ao upstream.
+
+    A primeira chamada com uma chave executa `fn`; as que chegam enquanto ela
+    está em andamento esperam o mesmo resultado (ou a mesma exceção). A espera
+    é limitada a `timeout`: depois disso, ou se a chamada original for
+    cancelada, quem esperava executa a própria consulta.
+    """
+
+    def __init__(self, timeout: float = 5.0):
+        self.timeout = timeout
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.shared = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._calls.get(key)
+        if future is not None:
+            return await self._wait(future, fn)
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        self.calls += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            self.errors += 1
+            future.set_exception(e)
+            # Sem ninguém esperando, evita o aviso de exceção nunca lida
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    async def _wait(self, future: asyncio.Future, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.shared += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+        except asyncio.CancelledError:
+            task = asyncio.current_task()
+            # Só a chamada original foi cancelada; esta requisição segue sozinha
+            if not future.cancelled() or (task is not None and task.cancelling()):
+                raise
+        self.calls += 1
+        return await fn()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "shared": self.shared,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+        }
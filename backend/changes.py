@@ -0,0 +1,128 @@
+import asyncio
+import json
+import secrets
+import time
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+# (seq, tabela, operação, linha, timestamp)
+Event = Tuple[int, str, str, dict, float]
+
+
+class ChangeFeed:
+    """Deltas por linha das escritas de cada treinador, entregues por SSE.
+
+    Guarda os últimos `buffer_size` eventos por usuário para que um cliente
+    que reconecta com `since` receba só o que perdeu. O cursor leva a época
+    deste processo: um cursor de outro worker, de antes de um restart ou já
+    descartado do buffer vira um evento `reset`, e o cliente recarrega.
+    """
+
+    def __init__(self, buffer_size: int = 1000, queue_size: int = 1000):
+        self.epoch = secrets.token_hex(4)
+        self.buffer_size = buffer_size
+        self.queue_size = queue_size
+        self._seq = 0
+        self._buffers: Dict[str, Deque[Event]] = {}
+        self._trimmed: Dict[str, int] = {}
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self.published = 0
+        self.dropped = 0
+
+    def cursor(self, seq: Optional[int] = None) -> str:
+        return f"{self.epoch}-{self._seq if seq is None else seq}"
+
+    def publish(self, user_id: str, table: str, op: str, rows: List[dict]) -> None:
+        buffer = self._buffers.get(user_id)
+        if buffer is None:
+            buffer = self._buffers[user_id] = deque(maxlen=self.buffer_size)
+        now = time.time()
+        for row in rows:
+            self._seq += 1
+            event = (self._seq, table, op, row, now)
+            if len(buffer) == buffer.maxlen:
+                self._trimmed[user_id] = buffer[0][0]
+            buffer.append(event)
+            self.published += 1
+            for queue in list(self._subscribers.get(user_id, ())):
+                try:
+                    queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    self._overflow(user_id, queue)
+
+    def _overflow(self, user_id: str, queue: asyncio.Queue) -> None:
+        # Cliente lento demais: descarta o que estava pendente e manda reset
+        self.unsubscribe(user_id, queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+        self.dropped += 1
+
+    def backlog(self, user_id: str, since: str) -> Optional[List[Event]]:
+        """Eventos depois de `since`, ou None se o cursor não pode ser retomado."""
+        epoch, _, seq = since.partition("-")
+        if epoch != self.epoch or not seq.isdigit() or int(seq) > self._seq:
+            return None
+        seq = int(seq)
+        if seq < self._trimmed.get(user_id, 0):
+            return None
+        return [event for event in self._buffers.get(user_id, ()) if event[0] > seq]
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue) -> None:
+        subscribers = self._subscribers.get(user_id)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[user_id]
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": sum(len(s) for s in self._subscribers.values()),
+            "published": self.published,
+            "dropped": self.dropped,
+            "buffered": sum(len(b) for b in self._buffers.values()),
+        }
+
+    def format(self, event: Event) -> str:
+        seq, table, op, row, ts = event
+        data = json.dumps({"table": table, "op": op, "row": row, "ts": ts}, ensure_ascii=False, default=str)
+        return f"id: {self.cursor(seq)}\nevent: change\ndata: {data}\n\n"
+
+    async def stream(
+        self,
+        user_id: str,
+        since: Optional[str],
+        heartbeat: float,
+        is_disconnected: Callable[[], Awaitable[bool]],
+    ) -> AsyncIterator[str]:
+        # Inscreve antes de ler o buffer para não perder o que chegar no meio
+        queue = self.subscribe(user_id)
+        try:
+            last = self._seq
+            backlog = self.backlog(user_id, since) if since else []
+            if backlog is None:
+                yield "event: reset\ndata: {}\n\n"
+                return
+            for event in backlog:
+                yield self.format(event)
+            # O cursor atual fecha o replay: quem conecta sem `since` começa daqui
+            yield f"id: {self.cursor(last)}\nevent: ready\ndata: {{}}\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    if await is_disconnected():
+                        return
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    yield "event: reset\ndata: {}\n\n"
+                    return
+                yield self.format(event)
+        finally:
+            self.unsubscribe(user_id, queue)
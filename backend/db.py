@@ -0,0 +1,326 @@
+import asyncio
+import functools
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+from metrics import track
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+Order = Sequence[Tuple[str, bool]]
+
+
+class Database(ABC):
+    """Repositório das tabelas do app; as consultas nunca bloqueiam o event loop.
+
+    `select` recebe filtros de igualdade (listas viram `IN`), ordenação,
+    projeção de colunas, limite, cursor keyset (`after`) e intervalos
+    fechados (`ranges`). As escritas devolvem as linhas afetadas.
+    """
+
+    def start(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    @abstractmethod
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        ...
+
+    @abstractmethod
+    async def select(
+        self,
+        table: str,
+        filters: Dict[str, Any],
+        order: Order = (),
+        columns: str = "*",
+        limit: Optional[int] = None,
+        after: Optional[Tuple[Any, Any]] = None,
+        ranges: Optional[Dict[str, Tuple[Any, Any]]] = None,
+    ) -> List[dict]:
+        ...
+
+    @abstractmethod
+    async def insert(self, table: str, rows: Any) -> List[dict]:
+        ...
+
+    @abstractmethod
+    async def upsert(self, table: str, rows: List[dict], on_conflict: str = "id", ignore_duplicates: bool = False) -> List[dict]:
+        """Insere ou atualiza por `on_conflict`; com `ignore_duplicates`, mantém a linha existente e não a devolve."""
+
+    @abstractmethod
+    async def update(self, table: str, values: dict, filters: Dict[str, Any]) -> List[dict]:
+        ...
+
+    @abstractmethod
+    async def delete(self, table: str, filters: Dict[str, Any]) -> List[dict]:
+        ...
+
+    @abstractmethod
+    async def rpc(self, function: str, params: Dict[str, Any]) -> List[dict]:
+        """Chama uma função SQL do banco (ver `migrations/`), que devolve linhas."""
+
+    @abstractmethod
+    async def ping(self) -> None:
+        """Consulta mínima; abre (ou reaproveita) uma conexão com o banco."""
+
+    # Autenticação
+    @abstractmethod
+    async def sign_in(self, email: str, password: str) -> Optional[Tuple[str, str]]:
+        """(access_token, user_id), ou None se as credenciais não conferem."""
+
+    @abstractmethod
+    async def sign_out(self) -> None:
+        ...
+
+    @abstractmethod
+    def get_user_id(self, token: str) -> Optional[str]:
+        """Valida o token no provedor de auth (síncrono; roda no pool de threads)."""
+
+    @abstractmethod
+    async def create_user(self, email: str, password: str) -> str:
+        ...
+
+
+class SupabaseDatabase(Database):
+    """Acesso ao Supabase sem bloquear o event loop.
+
+    O client síncrono roda num pool de threads limitado e compartilha um único
+    pool de conexões HTTP keep-alive, criado em `start()` no lifespan da app.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        key: str,
+        pool_size: int = 16,
+        max_connections: int = 32,
+        max_keepalive_connections: int = 16,
+        keepalive_expiry: float = 30.0,
+        timeout: float = 10.0,
+        connect_timeout: float = 5.0,
+    ):
+        self.url = url
+        self.key = key
+        self.pool_size = pool_size
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self._client: Optional["Client"] = None
+        self._http: Optional[httpx.Client] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def start(self) -> None:
+        if self._client is not None:
+            return
+        # Import adiado: o pacote supabase é a parte mais lenta do import do app
+        from supabase import create_client
+        from supabase.lib.client_options import SyncClientOptions
+
+        self._http = httpx.Client(limits=self.limits, timeout=self.timeout)
+        self._client = create_client(
+            self.url,
+            self.key,
+            options=SyncClientOptions(httpx_client=self._http, postgrest_client_timeout=self.timeout),
+        )
+        self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="upstream")
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        if self._http is not None:
+            self._http.close()
+        self._client = None
+        self._http = None
+        self._executor = None
+
+    @property
+    def client(self) -> "Client":
+        if self._client is None:
+            self.start()
+        return self._client
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        if self._executor is None:
+            self.start()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    @staticmethod
+    def _quote(value: Any) -> str:
+        # Valor entre aspas num filtro `or` do PostgREST: barra invertida e aspas são escapadas com `\`
+        return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+    @staticmethod
+    def _apply_filters(query, filters: Dict[str, Any]):
+        # Listas viram filtro `in`; demais valores, igualdade
+        for column, value in filters.items():
+            if isinstance(value, (list, tuple, set)):
+                query = query.in_(column, list(value))
+            else:
+                query = query.eq(column, value)
+        return query
+
+    async def select(
+        self,
+        table: str,
+        filters: Dict[str, Any],
+        order: Order = (),
+        columns: str = "*",
+        limit: Optional[int] = None,
+        after: Optional[Tuple[Any, Any]] = None,
+        ranges: Optional[Dict[str, Tuple[Any, Any]]] = None,
+    ) -> List[dict]:
+        query = self._apply_filters(self.client.table(table).select(columns), filters)
+        # Intervalos fechados [início, fim]; None deixa o lado aberto
+        for column, (low, high) in (ranges or {}).items():
+            if low is not None:
+                query = query.gte(column, low)
+            if high is not None:
+                query = query.lte(column, high)
+        if after is not None:
+            # Keyset: linhas estritamente depois de (valor, id) na ordem da primeira coluna
+            column, desc = order[0]
+            op = "lt" if desc else "gt"
+            value, row_id = (self._quote(v) for v in after)
+            query = query.or_(f"{column}.{op}.{value},and({column}.eq.{value},id.{op}.{row_id})")
+        for column, desc in order:
+            query = query.order(column, desc=desc)
+        if limit is not None:
+            query = query.limit(limit)
+        response = await self.run(query.execute)
+        return response.data
+
+    async def insert(self, table: str, rows: Any) -> List[dict]:
+        response = await self.run(self.client.table(table).insert(rows).execute)
+        return response.data
+
+    async def upsert(self, table: str, rows: List[dict], on_conflict: str = "id", ignore_duplicates: bool = False) -> List[dict]:
+        # default_to_null=False: colunas ausentes (ex.: id de linhas novas) usam o DEFAULT da tabela
+        query = self.client.table(table).upsert(
+            rows, on_conflict=on_conflict, ignore_duplicates=ignore_duplicates, default_to_null=False,
+        )
+        response = await self.run(query.execute)
+        return response.data
+
+    async def update(self, table: str, values: dict, filters: Dict[str, Any]) -> List[dict]:
+        query = self._apply_filters(self.client.table(table).update(values), filters)
+        response = await self.run(query.execute)
+        return response.data
+
+    async def delete(self, table: str, filters: Dict[str, Any]) -> List[dict]:
+        query = self._apply_filters(self.client.table(table).delete(), filters)
+        response = await self.run(query.execute)
+        return response.data
+
+    async def rpc(self, function: str, params: Dict[str, Any]) -> List[dict]:
+        response = await self.run(self.client.rpc(function, params).execute)
+        return response.data
+
+    async def ping(self) -> None:
+        await self.select("students", {}, columns="id", limit=1)
+
+    async def sign_in(self, email: str, password: str) -> Optional[Tuple[str, str]]:
+        response = await self.run(self.client.auth.sign_in_with_password, {"email": email, "password": password})
+        if not response.session:
+            return None
+        return response.session.access_token, response.user.id
+
+    async def sign_out(self) -> None:
+        await self.run(self.client.auth.sign_out)
+
+    def get_user_id(self, token: str) -> Optional[str]:
+        response = self.client.auth.get_user(token)
+        return response.user.id if response and response.user else None
+
+    async def create_user(self, email: str, password: str) -> str:
+        response = await self.run(self.client.auth.admin.create_user, {
+            "email": email,
+            "password": password,
+            "email_confirm": True,
+        })
+        return response.user.id
+
+
+def create_database(backend: str, **options) -> Database:
+    """Instancia o repositório configurado em DB_BACKEND (`supabase` ou `sqlite`)."""
+    if backend == "supabase":
+        return SupabaseDatabase(**options)
+    if backend == "sqlite":
+        from sqlite_db import SQLiteDatabase
+        return SQLiteDatabase(**options)
+    raise ValueError(f"DB_BACKEND desconhecido: {backend}")
+
+
+class InstrumentedDatabase(Database):
+    """Envolve um repositório medindo cada operação com `metrics.track`.
+
+    Consultas às tabelas são rotuladas como `<upstream>`/`<op> <tabela>`;
+    as operações de autenticação, como `auth`/`<op>`.
+    """
+
+    def __init__(self, inner: Database, upstream: str):
+        self.inner = inner
+        self.upstream = upstream
+
+    def start(self) -> None:
+        self.inner.start()
+
+    def close(self) -> None:
+        self.inner.close()
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        return await self.inner.run(fn, *args, **kwargs)
+
+    async def select(self, table: str, filters: Dict[str, Any], **kwargs) -> List[dict]:
+        async with track(self.upstream, f"select {table}"):
+            return await self.inner.select(table, filters, **kwargs)
+
+    async def insert(self, table: str, rows: Any) -> List[dict]:
+        async with track(self.upstream, f"insert {table}"):
+            return await self.inner.insert(table, rows)
+
+    async def upsert(self, table: str, rows: List[dict], on_conflict: str = "id", ignore_duplicates: bool = False) -> List[dict]:
+        async with track(self.upstream, f"upsert {table}"):
+            return await self.inner.upsert(table, rows, on_conflict=on_conflict, ignore_duplicates=ignore_duplicates)
+
+    async def update(self, table: str, values: dict, filters: Dict[str, Any]) -> List[dict]:
+        async with track(self.upstream, f"update {table}"):
+            return await self.inner.update(table, values, filters)
+
+    async def delete(self, table: str, filters: Dict[str, Any]) -> List[dict]:
+        async with track(self.upstream, f"delete {table}"):
+            return await self.inner.delete(table, filters)
+
+    async def rpc(self, function: str, params: Dict[str, Any]) -> List[dict]:
+        async with track(self.upstream, f"rpc {function}"):
+            return await self.inner.rpc(function, params)
+
+    async def ping(self) -> None:
+        async with track(self.upstream, "ping"):
+            return await self.inner.ping()
+
+    async def sign_in(self, email: str, password: str) -> Optional[Tuple[str, str]]:
+        async with track("auth", "sign_in"):
+            return await self.inner.sign_in(email, password)
+
+    async def sign_out(self) -> None:
+        async with track("auth", "sign_out"):
+            return await self.inner.sign_out()
+
+    def get_user_id(self, token: str) -> Optional[str]:
+        # Só a consulta ao provedor de auth; tokens validados localmente ou em cache não passam por aqui
+        with track("auth", "get_user"):
+            return self.inner.get_user_id(token)
+
+    async def create_user(self, email: str, password: str) -> str:
+        async with track("auth", "create_user"):
+            return await self.inner.create_user(email, password)
@@ -0,0 +1,51 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+Check = Callable[[], Awaitable[Optional[str]]]
+
+
+class HealthChecker:
+    """Readiness com cache: as dependências são checadas no máximo uma vez a cada `ttl`.
+
+    Cada check devolve None quando está tudo bem ou uma mensagem de erro.
+    Requisições simultâneas durante uma checagem esperam o mesmo resultado,
+    então um probe agressivo do orquestrador não vira carga no Supabase.
+    """
+
+    def __init__(self, checks: Dict[str, Check], ttl: float = 5.0, timeout: float = 2.0):
+        self.checks = checks
+        self.ttl = ttl
+        self.timeout = timeout
+        self.started = False
+        self._result: Optional[dict] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def _run(self, name: str, check: Check) -> dict:
+        started = time.perf_counter()
+        try:
+            error = await asyncio.wait_for(check(), self.timeout)
+        except asyncio.TimeoutError:
+            error = f"sem resposta em {self.timeout:g} s"
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        result = {"ok": error is None, "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+        if error is not None:
+            result["error"] = error
+        return result
+
+    async def ready(self) -> dict:
+        if not self.started:
+            return {"ready": False, "checks": {}, "error": "aquecendo"}
+        if self._result is not None and time.monotonic() - self._checked_at < self.ttl:
+            return self._result
+        async with self._lock:
+            if self._result is not None and time.monotonic() - self._checked_at < self.ttl:
+                return self._result
+            names = list(self.checks)
+            results = await asyncio.gather(*(self._run(name, self.checks[name]) for name in names))
+            checks = dict(zip(names, results))
+            self._result = {"ready": all(r["ok"] for r in results), "checks": checks}
+            self._checked_at = time.monotonic()
+            return self._result
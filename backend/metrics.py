@@ -0,0 +1,254 @@
+import bisect
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from starlette.routing import Match
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Tempo gasto por upstream na requisição atual: {upstream: [segundos, chamadas]}
+_timings: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar("request_timings", default=None)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, labels)} {_number(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Por série: contagem por bucket (não cumulativa), soma e total
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for labels, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = f'le="{_number(bound)}"'
+                    lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {total[0]}")
+                lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self.metrics for line in metric.render()) + "\n"
+
+
+REGISTRY = Registry()
+
+http_duration = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Latência das requisições HTTP por rota", ["method", "route", "status"]))
+http_errors = REGISTRY.register(Counter(
+    "http_request_errors_total", "Respostas 5xx ou exceções não tratadas por rota", ["method", "route"]))
+http_in_flight = REGISTRY.register(Gauge(
+    "http_requests_in_flight", "Requisições HTTP em andamento por rota", ["method", "route"]))
+upstream_duration = REGISTRY.register(Histogram(
+    "upstream_request_duration_seconds", "Latência das chamadas a serviços externos", ["upstream", "operation"]))
+upstream_errors = REGISTRY.register(Counter(
+    "upstream_errors_total", "Chamadas a serviços externos que falharam", ["upstream", "operation"]))
+upstream_in_flight = REGISTRY.register(Gauge(
+    "upstream_requests_in_flight", "Chamadas a serviços externos em andamento", ["upstream", "operation"]))
+
+
+class track:
+    """`async with track("stripe", "checkout.create")`: mede uma chamada a um upstream.
+
+    Além das métricas globais, soma o tempo no detalhamento da requisição
+    corrente (usado no Server-Timing e no log de requisições lentas).
+    Chamadas síncronas, já dentro do pool de threads, usam `with track(...)`.
+    """
+
+    __slots__ = ("upstream", "operation", "started")
+
+    def __init__(self, upstream: str, operation: str):
+        self.upstream = upstream
+        self.operation = operation
+
+    async def __aenter__(self) -> "track":
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self.__exit__(exc_type, exc, tb)
+
+    def __enter__(self) -> "track":
+        upstream_in_flight.inc(self.upstream, self.operation)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        elapsed = time.perf_counter() - self.started
+        upstream_in_flight.dec(self.upstream, self.operation)
+        upstream_duration.observe(elapsed, self.upstream, self.operation)
+        if exc_type is not None:
+            upstream_errors.inc(self.upstream, self.operation)
+        timings = _timings.get()
+        if timings is not None:
+            entry = timings.setdefault(self.upstream, [0.0, 0])
+            entry[0] += elapsed
+            entry[1] += 1
+
+
+def route_path(app, scope) -> str:
+    """Template da rota (ex.: /api/students/{student_id}), para não explodir a cardinalidade."""
+    for route in app.router.routes:
+        match, _child = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: histograma, erros e em andamento por rota, Server-Timing e log de lentidão."""
+
+    def __init__(self, app, router_app=None, server_timing: bool = False, slow_request_ms: float = 0.0):
+        self.app = app
+        self.router_app = router_app
+        self.server_timing = server_timing
+        self.slow_request_ms = slow_request_ms
+        # (método, caminho) -> template, só das rotas sem parâmetros (o template é o próprio
+        # caminho): o tamanho fica limitado ao número de rotas e evita percorrer todas a cada requisição
+        self.static_routes: Dict[Tuple[str, str], str] = {}
+
+    def route(self, scope) -> str:
+        key = (scope["method"], scope["path"])
+        route = self.static_routes.get(key)
+        if route is None:
+            route = route_path(self.router_app, scope)
+            if route == scope["path"]:
+                self.static_routes[key] = route
+        return route
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self.route(scope)
+        timings: Dict[str, List[float]] = {}
+        token = _timings.set(timings)
+        status = 500
+        streaming = False
+        started = time.perf_counter()
+        http_in_flight.inc(method, route)
+
+        async def send_wrapper(message):
+            nonlocal status, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                streaming = any(
+                    k.lower() == b"content-type" and v.startswith(b"text/event-stream")
+                    for k, v in message.get("headers", [])
+                )
+                if self.server_timing:
+                    header = server_timing_header(timings, time.perf_counter() - started)
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _timings.reset(token)
+            http_in_flight.dec(method, route)
+            if status >= 500:
+                http_errors.inc(method, route)
+            # Streams SSE ficam abertos por minutos: contam em andamento, mas não na latência
+            if streaming:
+                return
+            http_duration.observe(elapsed, method, route, str(status))
+            if self.slow_request_ms and elapsed * 1000 >= self.slow_request_ms:
+                logger.warning(
+                    f"Requisição lenta: {method} {scope['path']} -> {status} em {elapsed * 1000:.0f} ms "
+                    f"({server_timing_header(timings, elapsed)})"
+                )
+
+
+def server_timing_header(timings: Dict[str, List[float]], total: float) -> str:
+    # "app" é o que sobra: validação, lógica do handler e serialização
+    upstream = sum(seconds for seconds, _calls in timings.values())
+    parts = [f'{name};dur={seconds * 1000:.1f};desc="{calls}x"' for name, (seconds, calls) in timings.items()]
+    parts.append(f"app;dur={max(total - upstream, 0.0) * 1000:.1f}")
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
@@ -0,0 +1,49 @@
+import functools
+from typing import Any, AsyncIterator, List, Mapping, Optional, Type
+
+import orjson
+from pydantic import BaseModel, TypeAdapter
+from starlette.responses import Response, StreamingResponse
+
+# Linhas serializadas por pedaço quando a lista vai em streaming
+STREAM_CHUNK_ROWS = 1000
+
+
+def dumps(value: Any) -> bytes:
+    return orjson.dumps(value, default=str)
+
+
+class FastJSONResponse(Response):
+    """JSONResponse serializado com orjson (bem mais rápido que o json da stdlib em listas grandes)."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+@functools.lru_cache(maxsize=None)
+def _adapter(model: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+
+def validate_rows(model: Type[BaseModel], rows: List[dict]) -> List[dict]:
+    """Mesmo resultado do response_model do FastAPI (tipos convertidos, colunas fora do modelo descartadas)."""
+    adapter = _adapter(model)
+    return adapter.dump_python(adapter.validate_python(rows), mode="json")
+
+
+async def iter_array(rows: List[dict], chunk_rows: int = STREAM_CHUNK_ROWS) -> AsyncIterator[bytes]:
+    # Cada pedaço devolve o event loop às outras requisições antes do próximo
+    yield b"["
+    for start in range(0, len(rows), chunk_rows):
+        body = dumps(rows[start:start + chunk_rows])
+        yield (b"," if start else b"") + body[1:-1]
+    yield b"]"
+
+
+def rows_response(rows: List[dict], headers: Optional[Mapping[str, str]] = None, stream_rows: int = 0) -> Response:
+    """Resposta de uma lista de linhas já no formato final; acima de `stream_rows` linhas, em streaming."""
+    if stream_rows and len(rows) > stream_rows:
+        return StreamingResponse(iter_array(rows), media_type="application/json", headers=dict(headers or {}))
+    return FastJSONResponse(rows, headers=dict(headers or {}))
@@ -0,0 +1,269 @@
+import functools
+import heapq
+import re
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+# Tabela -> campos indexados, com o peso de cada um no ranking
+FIELDS = {
+    "students": {"name": 1.0, "goal": 0.7},
+    "workouts": {"name": 0.9},
+    "exercises": {"name": 0.9},
+}
+TYPES = {"students": "student", "workouts": "workout", "exercises": "exercise"}
+
+# Palavras candidatas (por trigramas em comum) reavaliadas com distância de edição
+MAX_CANDIDATES = 500
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text: Optional[str]) -> List[str]:
+    """Palavras em minúsculas e sem acento: "Agachamento Búlgaro" -> ["agachamento", "bulgaro"]."""
+    if not text:
+        return []
+    text = unicodedata.normalize("NFKD", text.lower())
+    return _WORD.findall("".join(c for c in text if not unicodedata.combining(c)))
+
+
+@functools.lru_cache(maxsize=100_000)
+def trigrams(word: str) -> FrozenSet[str]:
+    # Mesmo preenchimento do pg_trgm: o início da palavra pesa mais que o fim
+    padded = f"  {word} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein com transposição; para de calcular ao passar de `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def word_score(query: str, word: str) -> float:
+    if word == query:
+        return 1.0
+    if word.startswith(query):
+        return 0.9
+    # Até 1 erro em palavras curtas e 2 nas longas, comparando também com o prefixo
+    limit = 1 if len(query) <= 5 else 2
+    if len(query) < 3:
+        return 0.0
+    distance = min(edit_distance(query, word, limit), edit_distance(query, word[:len(query)], limit))
+    if distance > limit:
+        return 0.0
+    return 0.8 * (1 - distance / (len(query) + 1))
+
+
+@dataclass
+class Document:
+    table: str
+    row_id: str
+    parent_id: Optional[str]
+    values: Dict[str, str]
+    words: Dict[str, Tuple[str, ...]]
+
+
+@dataclass
+class SearchIndex:
+    """Índice de trigramas dos alunos, treinos e exercícios de um treinador.
+
+    Os trigramas apontam para palavras, e as palavras para documentos: nomes
+    se repetem muito (o mesmo exercício em centenas de treinos), então a busca
+    aproximada roda sobre o vocabulário, que é bem menor que o número de linhas.
+    """
+
+    built_at: float = field(default_factory=time.monotonic)
+    documents: Dict[Tuple[str, str], Document] = field(default_factory=dict)
+    vocabulary: Dict[str, Set[Tuple[str, str]]] = field(default_factory=dict)
+    postings: Dict[str, Set[str]] = field(default_factory=dict)
+    children: Dict[Tuple[str, str], Set[Tuple[str, str]]] = field(default_factory=dict)
+
+    def add(self, table: str, row: dict) -> None:
+        key = (table, row["id"])
+        self.remove(table, row["id"], cascade=False)
+        values = {name: row.get(name) or "" for name in FIELDS[table]}
+        words = {name: tuple(normalize(value)) for name, value in values.items()}
+        parent_id = row.get("student_id") if table == "workouts" else row.get("workout_id")
+        self.documents[key] = Document(table, row["id"], parent_id, values, words)
+        for word in {w for field_words in words.values() for w in field_words}:
+            keys = self.vocabulary.get(word)
+            if keys is None:
+                keys = self.vocabulary[word] = set()
+                for gram in trigrams(word):
+                    self.postings.setdefault(gram, set()).add(word)
+            keys.add(key)
+        parent = self.parent_key(table, parent_id)
+        if parent is not None:
+            self.children.setdefault(parent, set()).add(key)
+
+    def remove(self, table: str, row_id: str, cascade: bool = True) -> None:
+        key = (table, row_id)
+        document = self.documents.pop(key, None)
+        if document is not None:
+            for word in {w for field_words in document.words.values() for w in field_words}:
+                keys = self.vocabulary.get(word)
+                if keys is None:
+                    continue
+                keys.discard(key)
+                if not keys:
+                    del self.vocabulary[word]
+                    for gram in trigrams(word):
+                        self.postings[gram].discard(word)
+                        if not self.postings[gram]:
+                            del self.postings[gram]
+            parent = self.parent_key(table, document.parent_id)
+            if parent is not None and parent in self.children:
+                self.children[parent].discard(key)
+        if cascade:
+            # ON DELETE CASCADE: treinos do aluno e exercícios do treino saem junto
+            for child in list(self.children.pop(key, ())):
+                self.remove(*child)
+
+    @staticmethod
+    def parent_key(table: str, parent_id: Optional[str]) -> Optional[Tuple[str, str]]:
+        if parent_id is None or table == "students":
+            return None
+        return ("students" if table == "workouts" else "workouts", parent_id)
+
+    def apply(self, table: str, op: str, row: dict) -> None:
+        if table not in FIELDS:
+            return
+        if op == "delete":
+            self.remove(table, row["id"])
+        else:
+            self.add(table, row)
+
+    def student_of(self, document: Document) -> Optional[Document]:
+        if document.table == "students":
+            return document
+        if document.table == "exercises":
+            workout = self.documents.get(("workouts", document.parent_id))
+            if workout is None:
+                return None
+            document = workout
+        return self.documents.get(("students", document.parent_id))
+
+    def matching_words(self, term: str) -> Dict[str, float]:
+        counts: Counter = Counter()
+        for gram in trigrams(term):
+            counts.update(self.postings.get(gram, ()))
+        matches = {}
+        for word, _shared in counts.most_common(MAX_CANDIDATES):
+            score = word_score(term, word)
+            if score > 0.0:
+                matches[word] = score
+        return matches
+
+    def search(self, query: str, types: Optional[Set[str]] = None, limit: int = 20) -> List[dict]:
+        terms = normalize(query)
+        if not terms:
+            return []
+        matches = [self.matching_words(term) for term in terms]
+        if not all(matches):
+            return []
+
+        # Candidatos: documentos com alguma palavra que casa com o termo mais seletivo
+        rarest = min(matches, key=lambda m: sum(len(self.vocabulary[w]) for w in m))
+        candidates = set().union(*(self.vocabulary[word] for word in rarest))
+
+        field_scores: Dict[Tuple[str, ...], float] = {}
+
+        def field_score(words: Tuple[str, ...]) -> float:
+            score = field_scores.get(words)
+            if score is None:
+                # Todas as palavras da busca precisam casar com alguma palavra do campo
+                per_term = [max((m.get(word, 0.0) for word in words), default=0.0) for m in matches]
+                score = field_scores[words] = 0.0 if min(per_term) == 0.0 else sum(per_term) / len(per_term)
+            return score
+
+        scored = []
+        for key in candidates:
+            if types is not None and key[0] not in types:
+                continue
+            document = self.documents[key]
+            best_field, best = None, 0.0
+            for name, weight in FIELDS[document.table].items():
+                score = weight * field_score(document.words[name])
+                if score > best:
+                    best_field, best = name, score
+            if best_field is not None:
+                scored.append((best, document.values[best_field].lower(), document.row_id, document, best_field))
+
+        results = []
+        for score, _title, _id, document, matched in heapq.nsmallest(limit, scored, key=lambda item: (-item[0], item[1], item[2])):
+            student = self.student_of(document)
+            result = {
+                "type": TYPES[document.table],
+                "id": document.row_id,
+                "title": document.values["name"],
+                "field": matched,
+                "score": round(score, 3),
+                "student_id": student.row_id if student else None,
+                "student_name": student.values["name"] if student else None,
+            }
+            if document.table == "exercises":
+                result["workout_id"] = document.parent_id
+            results.append(result)
+        return results
+
+
+class SearchIndexes:
+    """Índices por treinador, montados na primeira busca e mantidos a cada escrita."""
+
+    def __init__(self, ttl: float = 600.0, max_users: int = 1000):
+        self.ttl = ttl
+        self.max_users = max_users
+        self._indexes: "OrderedDict[str, SearchIndex]" = OrderedDict()
+
+    @staticmethod
+    def build(rows: Dict[str, List[dict]]) -> SearchIndex:
+        index = SearchIndex()
+        for table in FIELDS:
+            for row in rows.get(table, ()):
+                index.add(table, row)
+        return index
+
+    def get(self, user_id: str) -> Optional[SearchIndex]:
+        index = self._indexes.get(user_id)
+        if index is None:
+            return None
+        # Escritas de outros workers não chegam aqui: o TTL limita quanto o índice pode ficar defasado
+        if time.monotonic() - index.built_at > self.ttl:
+            del self._indexes[user_id]
+            return None
+        self._indexes.move_to_end(user_id)
+        return index
+
+    def set(self, user_id: str, index: SearchIndex) -> None:
+        self._indexes[user_id] = index
+        self._indexes.move_to_end(user_id)
+        while len(self._indexes) > self.max_users:
+            self._indexes.popitem(last=False)
+
+    def on_change(self, user_id: str, table: str, op: str, rows: List[dict]) -> None:
+        index = self._indexes.get(user_id)
+        if index is None:
+            return
+        for row in rows:
+            index.apply(table, op, row)
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._indexes),
+            "documents": sum(len(index.documents) for index in self._indexes.values()),
+        }
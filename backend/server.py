@@ -1,41 +1,175 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, Query, Request, Response, Body
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 from pathlib import Path
-from pydantic import BaseModel
-from typing import List, Optional
-import os
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Optional, Literal
+import json
+import base64
+import asyncio
+import contextvars
 import logging
 from datetime import datetime, date, timedelta, timezone
-from supabase import create_client, Client
-from jose import jwt, JWTError
 import stripe
 import secrets
+from settings import Settings
+from health import HealthChecker
+from auth import TokenVerifier, TokenVerificationError
+from db import InstrumentedDatabase, create_database
+from cache import ResponseCache, SingleFlight, MISSING
+from changes import ChangeFeed
+import transfer
+import templates
+import responses
+from search import SearchIndexes
+from metrics import REGISTRY, MetricsMiddleware, track
+from analytics import ProgressTracker, StudentProgress, normalize_history, weight_buckets, cardio_buckets, height_in_meters
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-SUPABASE_URL = os.environ['SUPABASE_URL']
-SUPABASE_ANON_KEY = os.environ['SUPABASE_ANON_KEY']
-SUPABASE_SERVICE_KEY = os.environ['SUPABASE_SERVICE_ROLE_KEY']
-STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY', '')
-STRIPE_PRICE_MONTHLY = os.environ.get('STRIPE_PRICE_MONTHLY', '')
-STRIPE_PRICE_SEMIANNUAL = os.environ.get('STRIPE_PRICE_SEMIANNUAL', '')
-STRIPE_PRICE_ANNUAL = os.environ.get('STRIPE_PRICE_ANNUAL', '')
-FRONTEND_URL = os.environ.get('FRONTEND_URL', 'http://localhost:3000')
+settings = Settings.from_env(sqlite_path=str(ROOT_DIR / 'personalhub.db'))
 
-stripe.api_key = STRIPE_SECRET_KEY
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+DB_BACKEND = settings.db_backend
+SUPABASE_URL = settings.issuer_url
+STRIPE_PRICE_MONTHLY = settings.stripe_price_monthly
+STRIPE_PRICE_SEMIANNUAL = settings.stripe_price_semiannual
+STRIPE_PRICE_ANNUAL = settings.stripe_price_annual
+FRONTEND_URL = settings.frontend_url
+MAX_BULK_ITEMS = settings.max_bulk_items
+CACHE_ENABLED = settings.cache_enabled
+EXPORT_PAGE_SIZE = settings.export_page_size
+IMPORT_BATCH_SIZE = settings.import_batch_size
+METRICS_TOKEN = settings.metrics_token
+PURCHASE_TOKEN_TTL = timedelta(hours=24)
+RESPONSE_VALIDATION = settings.response_validation
+RESPONSE_STREAM_ROWS = settings.response_stream_rows
 
-app = FastAPI()
-api_router = APIRouter(prefix="/api")
+# Só constrói os objetos; conexões, threads e o client do Supabase nascem no lifespan
+if DB_BACKEND == 'sqlite':
+    repository = create_database(
+        'sqlite',
+        path=settings.sqlite_path,
+        jwt_secret=settings.supabase_jwt_secret,
+        issuer_url=settings.issuer_url,
+        pool_size=settings.upstream_pool_size,
+    )
+else:
+    repository = create_database(
+        DB_BACKEND,
+        url=settings.supabase_url,
+        key=settings.supabase_service_role_key,
+        pool_size=settings.upstream_pool_size,
+        max_connections=settings.http_max_connections,
+        max_keepalive_connections=settings.http_max_keepalive,
+        keepalive_expiry=settings.http_keepalive_expiry,
+        timeout=settings.http_timeout,
+        connect_timeout=settings.http_connect_timeout,
+    )
+db = InstrumentedDatabase(repository, 'sqlite' if DB_BACKEND == 'sqlite' else 'postgrest')
+
+response_cache = ResponseCache(ttl=settings.cache_ttl, max_entries=settings.cache_max_entries, max_bytes=settings.cache_max_bytes)
+progress_tracker = ProgressTracker(ttl=settings.progress_ttl)
+single_flight = SingleFlight(timeout=settings.single_flight_timeout)
+change_feed = ChangeFeed(buffer_size=settings.change_buffer_size)
+search_indexes = SearchIndexes(ttl=settings.search_index_ttl)
+
+# Visões agregadas por aluno (chave de cache com student_id) -> tabelas das quais dependem
+STUDENT_VIEWS = {
+    "profile": {"students", "workouts", "exercises", "exercise_history", "cardio", "evolution", "weekly_routine"},
+    "timeseries": {"students", "cardio", "evolution"},
+}
+
+# Visões de todos os alunos do treinador (chave de cache com day_of_week/date) -> tabelas das quais dependem
+TRAINER_VIEWS = {
+    "schedule": {"students", "workouts", "exercises", "exercise_history", "weekly_routine"},
+}
+
+# Partição do cache sem usuário: tokens de cadastro, por sessão do Stripe
+PAYMENTS = "payments"
+
+# Valor de cached_read quando o If-None-Match já casa com a versão atual: nada foi carregado
+NOT_MODIFIED = object()
+
+# Tabela -> (coluna de FK nos filhos, tabelas removidas em cascata pelo ON DELETE CASCADE)
+CASCADES = {
+    "students": ("student_id", ["workouts", "exercises", "exercise_history", "cardio", "evolution", "weekly_routine"]),
+    "workouts": ("workout_id", ["exercises", "exercise_history"]),
+    "exercises": ("exercise_id", ["exercise_history"]),
+}
+
+def get_remote_user_id(token: str) -> Optional[str]:
+    return db.get_user_id(token)
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+token_verifier = TokenVerifier(
+    SUPABASE_URL,
+    jwt_secret=settings.supabase_jwt_secret,
+    cache_ttl=settings.auth_token_cache_ttl,
+    cache_size=settings.auth_token_cache_size,
+    remote_check=get_remote_user_id,
+    check_revoked=settings.auth_check_revoked,
 )
+
 logger = logging.getLogger(__name__)
 
+async def check_database() -> Optional[str]:
+    await db.ping()
+    return None
+
+async def check_auth() -> Optional[str]:
+    # Com segredo HS256 a validação é local; sem ele, depende do JWKS do Supabase Auth
+    if settings.supabase_jwt_secret or DB_BACKEND == 'sqlite':
+        return None
+    if not token_verifier.jwks_loaded:
+        await db.run(token_verifier.warm)
+    return None if token_verifier.jwks_loaded else "JWKS indisponível"
+
+health = HealthChecker(
+    {"database": check_database, "auth": check_auth},
+    ttl=settings.health_cache_ttl,
+    timeout=settings.health_timeout,
+)
+
+async def warm_up() -> None:
+    """Abre conexões do pool e carrega o JWKS antes de o worker se declarar pronto."""
+    results = await asyncio.gather(
+        *(db.ping() for _ in range(max(settings.warmup_connections, 1))),
+        db.run(token_verifier.warm),
+        return_exceptions=True,
+    )
+    for error in results:
+        if isinstance(error, Exception):
+            logger.warning(f"Falha no aquecimento: {error}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    settings.check()
+    stripe.api_key = settings.stripe_secret_key
+    db.start()
+    await warm_up()
+    cleanup = None
+    if settings.token_cleanup_interval > 0:
+        cleanup = asyncio.create_task(purge_tokens_periodically(settings.token_cleanup_interval))
+    health.started = True
+    yield
+    health.started = False
+    if cleanup is not None:
+        cleanup.cancel()
+        try:
+            await cleanup
+        except asyncio.CancelledError:
+            pass
+    db.close()
+
+app = FastAPI(lifespan=lifespan)
+api_router = APIRouter(prefix="/api")
+
 class LoginRequest(BaseModel):
     email: str
     password: str
@@ -114,6 +248,9 @@ class ExerciseHistory(BaseModel):
     sets: Optional[int] = None
     reps: Optional[str] = None
     observations: Optional[str] = None
+    load_kg: Optional[float] = None
+    set_count: Optional[int] = None
+    rep_count: Optional[float] = None
     created_at: str
 
 class CardioCreate(BaseModel):
@@ -168,53 +305,355 @@ class WeeklyRoutine(BaseModel):
     created_at: str
     updated_at: str
 
+class ExerciseWithHistory(Exercise):
+    history: List[ExerciseHistory] = []
+
+class WorkoutWithExercises(Workout):
+    exercises: List[ExerciseWithHistory] = []
+
+class StudentProfile(BaseModel):
+    student: Student
+    workouts: List[WorkoutWithExercises]
+    cardio: List[Cardio]
+    evolution: List[Evolution]
+    weekly_routine: List[WeeklyRoutine]
+
+class ProgressPoint(BaseModel):
+    date: str
+    load_kg: Optional[float] = None
+    sets: Optional[float] = None
+    reps: Optional[float] = None
+    volume_kg: Optional[float] = None
+    e1rm_kg: Optional[float] = None
+    is_pr: bool
+
+class ExerciseProgress(BaseModel):
+    name: str
+    exercise_ids: List[str]
+    sessions: int
+    last_date: Optional[str] = None
+    best_load_kg: Optional[float] = None
+    best_e1rm_kg: Optional[float] = None
+    total_volume_kg: Optional[float] = None
+    points: List[ProgressPoint]
+
+class StudentProgressResponse(BaseModel):
+    student_id: str
+    exercises: List[ExerciseProgress]
+
+class WeightBucket(BaseModel):
+    start: str
+    count: int
+    min: Optional[float] = None
+    max: Optional[float] = None
+    mean: Optional[float] = None
+    last: Optional[float] = None
+    rolling_mean: Optional[float] = None
+    bmi: Optional[float] = None
+
+class CardioBucket(BaseModel):
+    start: str
+    sessions: int
+    total_duration: Optional[float] = None
+    mean_duration: Optional[float] = None
+    rolling_duration: Optional[float] = None
+
+class EvolutionTimeSeries(BaseModel):
+    student_id: str
+    bucket: str
+    height_m: Optional[float] = None
+    weight: List[WeightBucket]
+    cardio: List[CardioBucket]
+
+class WorkoutExerciseCreate(BaseModel):
+    name: str
+    sets: Optional[int] = None
+    reps: Optional[str] = None
+    weight: Optional[str] = None
+    rest: Optional[str] = None
+
+class WorkoutFullCreate(BaseModel):
+    student_id: str
+    name: str
+    date: Optional[str] = None
+    exercises: List[WorkoutExerciseCreate] = Field(default_factory=list, max_length=MAX_BULK_ITEMS)
+
+class WeeklyRoutineDay(BaseModel):
+    id: Optional[str] = None
+    day_of_week: int = Field(ge=0, le=6)
+    workout_name: str
+    exercises: Optional[list] = None
+
+class WeeklyRoutineWeek(BaseModel):
+    days: List[WeeklyRoutineDay] = Field(max_length=MAX_BULK_ITEMS)
+    replace: bool = True
+
+class WeeklyRoutineWeekResult(BaseModel):
+    routine: List[WeeklyRoutine]
+    created: List[str]
+    updated: List[str]
+    deleted: List[str]
+
+class WorkoutCloneRequest(BaseModel):
+    student_ids: List[str] = Field(min_length=1, max_length=MAX_BULK_ITEMS)
+    name: Optional[str] = None
+    date: Optional[str] = None
+
+class WeeklyRoutineCloneRequest(BaseModel):
+    student_ids: List[str] = Field(min_length=1, max_length=MAX_BULK_ITEMS)
+    replace: bool = True
+
+class CloneResult(BaseModel):
+    student_id: str
+    status: Literal["created", "not_found", "skipped"]
+    workout_id: Optional[str] = None
+    created: int = 0
+    deleted: int = 0
+
+class CloneReport(BaseModel):
+    source_id: str
+    results: List[CloneResult]
+
+class ScheduleExercise(BaseModel):
+    # O JSON da rotina é livre: campos além do nome são repassados como estão
+    model_config = ConfigDict(extra="allow")
+    name: Optional[str] = None
+
+class ScheduleEntry(BaseModel):
+    routine_id: str
+    student_id: str
+    student_name: str
+    workout_name: str
+    exercises: List[ScheduleExercise]
+    workout_id: Optional[str] = None
+    has_workout: bool
+    has_history: bool
+
+class DailySchedule(BaseModel):
+    date: str
+    day_of_week: int
+    entries: List[ScheduleEntry]
+
+class SearchResult(BaseModel):
+    type: Literal["student", "workout", "exercise"]
+    id: str
+    title: str
+    field: str
+    score: float
+    student_id: Optional[str] = None
+    student_name: Optional[str] = None
+    workout_id: Optional[str] = None
+
 async def verify_token(authorization: str = Header(None)) -> str:
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Token de autenticação não fornecido")
     
     token = authorization.replace("Bearer ", "")
+    return await authenticate(token)
+
+async def authenticate(token: str) -> str:
+    user_id = token_verifier.cached(token)
+    if user_id:
+        return user_id
     try:
-        response = supabase.auth.get_user(token)
-        if not response.user:
-            raise HTTPException(status_code=401, detail="Token inválido")
-        return response.user.id
-    except Exception as e:
+        # Contexto copiado: a verificação remota, se houver, entra no Server-Timing desta requisição
+        return await db.run(contextvars.copy_context().run, token_verifier.verify, token)
+    except TokenVerificationError as e:
         logger.error(f"Erro ao verificar token: {e}")
         raise HTTPException(status_code=401, detail="Token inválido")
 
+class Conditional:
+    def __init__(self, response: Response, if_none_match: Optional[str] = Header(None)):
+        self.response = response
+        self.if_none_match = if_none_match
+
+    def tags(self) -> set:
+        if not self.if_none_match:
+            return set()
+        return {tag.strip().removeprefix("W/") for tag in self.if_none_match.split(",")}
+
+    def matches(self, etag: str) -> bool:
+        # Só um ETag explícito: com "*" ainda é preciso carregar para saber se o recurso existe
+        return etag in self.tags()
+
+    def check(self, etag: str) -> Optional[Response]:
+        self.response.headers["ETag"] = etag
+        self.response.headers["Cache-Control"] = "private, no-cache"
+        tags = self.tags()
+        if "*" in tags or etag in tags:
+            return Response(status_code=304, headers=dict(self.response.headers))
+        return None
+
+class Page(Conditional):
+    def __init__(
+        self,
+        response: Response,
+        limit: Optional[int] = Query(None, ge=1, le=1000),
+        cursor: Optional[str] = None,
+        fields: Optional[str] = None,
+        if_none_match: Optional[str] = Header(None),
+    ):
+        super().__init__(response, if_none_match)
+        self.limit = limit
+        self.cursor = cursor
+        self.fields = fields
+
+def encode_cursor(row: dict, column: str) -> str:
+    raw = json.dumps([row[column], row["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    # O cursor vem do cliente: só aceita o par [valor da ordenação, id] de escalares que encode_cursor gera
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        decoded = None
+    if (
+        not isinstance(decoded, list)
+        or len(decoded) != 2
+        or not isinstance(decoded[1], str)
+        or isinstance(decoded[0], bool)
+        or not isinstance(decoded[0], (str, int, float))
+    ):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    return decoded[0], decoded[1]
+
+def projection(fields: Optional[str], model, required: List[str]) -> str:
+    if not fields:
+        return "*"
+    columns = [f.strip() for f in fields.split(",") if f.strip()]
+    invalid = [c for c in columns if c not in model.model_fields]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Campo inválido: {', '.join(invalid)}")
+    for column in required:
+        if column not in columns:
+            columns.append(column)
+    return ",".join(columns)
+
+async def cached_read(user_id: str, resource: str, filters: dict, params: tuple, loader, conditional: Optional[Conditional] = None):
+    """Retorna (valor, etag).
+
+    O ETag sai da chave da leitura e da geração do usuário, tomada antes de
+    carregar: qualquer escrita muda o ETag, e o valor nunca é mais antigo que
+    ele. Com `conditional`, um If-None-Match igual ao ETag atual volta como
+    NOT_MODIFIED sem carregar nem serializar nada; `conditional.check(etag)`
+    responde o 304. Leituras idênticas simultâneas compartilham uma única
+    chamada ao upstream, e a geração entra na chave delas, então uma leitura
+    iniciada depois de uma escrita nunca reaproveita uma consulta anterior.
+    """
+    key = ResponseCache.make_key(user_id, resource, filters, params)
+    generation = response_cache.generation(user_id)
+    etag = response_cache.etag(key, generation)
+    if conditional is not None and conditional.matches(etag):
+        return NOT_MODIFIED, etag
+    if CACHE_ENABLED:
+        value = response_cache.get(key)
+        if value is not MISSING:
+            return value, etag
+
+    async def load():
+        value = await loader()
+        if CACHE_ENABLED:
+            response_cache.set(key, value, generation)
+        return value
+
+    return await single_flight.do((key, generation), load), etag
+
+async def load_and_store(user_id: str, loader, store):
+    """Carrega com `loader` e entrega o valor a `store` só se nenhuma escrita do usuário aconteceu durante a carga."""
+    generation = response_cache.generation(user_id)
+    value = await loader()
+    if generation == response_cache.generation(user_id):
+        store(value)
+    return value
+
+def notify_change(user_id: str, table: str, op: str, rows: List[dict]):
+    progress_tracker.on_change(user_id, table, op, rows)
+    change_feed.publish(user_id, table, op, rows)
+    search_indexes.on_change(user_id, table, op, rows)
+    for row in rows:
+        # Num update a coluna filtrada (ex.: workout_id) pode ter mudado: invalida o recurso inteiro
+        match = None if op == "update" else row
+        response_cache.invalidate(user_id, table, match)
+        for view, tables in STUDENT_VIEWS.items():
+            if table in tables:
+                response_cache.invalidate(user_id, view, {"student_id": row["id"]} if table == "students" else match)
+        for view, tables in TRAINER_VIEWS.items():
+            if table in tables:
+                # Só uma inserção traz o dia/data afetados; remoções apagam em cascata linhas de outras datas
+                response_cache.invalidate(user_id, view, row if op == "insert" else None)
+        if op == "delete" and table in CASCADES:
+            column, children = CASCADES[table]
+            for child in children:
+                response_cache.invalidate(user_id, child, {column: row["id"]})
+
+async def fetch_page(table: str, filters: dict, order_column: str, desc: bool, page: Page, model):
+    after = decode_cursor(page.cursor) if page.cursor else None
+    columns = projection(page.fields, model, ["id", order_column])
+
+    async def load():
+        rows = await db.select(
+            table,
+            filters,
+            order=[(order_column, desc), ("id", desc)],
+            columns=columns,
+            limit=page.limit + 1 if page.limit else None,
+            after=after,
+        )
+        next_cursor = None
+        if page.limit and len(rows) > page.limit:
+            rows = rows[:page.limit]
+            next_cursor = encode_cursor(rows[-1], order_column)
+        if RESPONSE_VALIDATION == "once" and not page.fields:
+            # Validadas ao carregar: as respostas servidas do cache não passam de novo pelo modelo
+            rows = responses.validate_rows(model, rows)
+        return rows, next_cursor
+
+    loaded, etag = await cached_read(filters["user_id"], table, filters, (page.limit, page.cursor, page.fields), load, page)
+    if loaded is NOT_MODIFIED:
+        return page.check(etag)
+    rows, next_cursor = loaded
+    if next_cursor:
+        page.response.headers["X-Next-Cursor"] = next_cursor
+    not_modified = page.check(etag)
+    if not_modified:
+        return not_modified
+    if page.fields or RESPONSE_VALIDATION != "full":
+        # Projeção parcial não satisfaz o response_model completo; nos demais casos as
+        # linhas já estão no formato final e vão direto para o orjson
+        return responses.rows_response(rows, page.response.headers, RESPONSE_STREAM_ROWS)
+    return rows
+
 @api_router.post("/auth/login", response_model=LoginResponse)
 async def login(request: LoginRequest):
     try:
-        response = supabase.auth.sign_in_with_password({
-            "email": request.email,
-            "password": request.password
-        })
+        session = await db.sign_in(request.email, request.password)
         
-        if not response.session:
+        if not session:
             raise HTTPException(status_code=401, detail="Email ou senha inválidos")
         
-        return LoginResponse(
-            access_token=response.session.access_token,
-            user_id=response.user.id
-        )
+        access_token, user_id = session
+        return LoginResponse(access_token=access_token, user_id=user_id)
     except Exception as e:
         logger.error(f"Erro no login: {e}")
         raise HTTPException(status_code=401, detail="Email ou senha inválidos")
 
 @api_router.post("/auth/logout")
-async def logout(user_id: str = Depends(verify_token)):
+async def logout(authorization: str = Header(None), user_id: str = Depends(verify_token)):
     try:
-        supabase.auth.sign_out()
+        token_verifier.invalidate(authorization.replace("Bearer ", ""))
+        await db.sign_out()
         return {"message": "Logout realizado com sucesso"}
     except Exception as e:
         logger.error(f"Erro no logout: {e}")
         raise HTTPException(status_code=500, detail="Erro ao realizar logout")
 
 @api_router.get("/students", response_model=List[Student])
-async def get_students(user_id: str = Depends(verify_token)):
+async def get_students(page: Page = Depends(), user_id: str = Depends(verify_token)):
     try:
-        response = supabase.table("students").select("*").eq("user_id", user_id).order("created_at", desc=True).execute()
-        return response.data
+        return await fetch_page("students", {"user_id": user_id}, "created_at", True, page, Student)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro ao buscar alunos: {e}")
         raise HTTPException(status_code=500, detail="Erro ao buscar alunos")
@@ -224,8 +663,9 @@ async def create_student(student: StudentCreate, user_id: str = Depends(verify_t
     try:
         data = student.model_dump()
         data["user_id"] = user_id
-        response = supabase.table("students").insert(data).execute()
-        return response.data[0]
+        rows = await db.insert("students", data)
+        notify_change(user_id, "students", "insert", rows)
+        return rows[0]
     except Exception as e:
         logger.error(f"Erro ao criar aluno: {e}")
         raise HTTPException(status_code=500, detail="Erro ao criar aluno")
@@ -234,10 +674,11 @@ async def create_student(student: StudentCreate, user_id: str = Depends(verify_t
 async def update_student(student_id: str, student: StudentCreate, user_id: str = Depends(verify_token)):
     try:
         data = student.model_dump()
-        response = supabase.table("students").update(data).eq("id", student_id).eq("user_id", user_id).execute()
-        if not response.data:
+        rows = await db.update("students", data, {"id": student_id, "user_id": user_id})
+        notify_change(user_id, "students", "update", rows)
+        if not rows:
             raise HTTPException(status_code=404, detail="Aluno não encontrado")
-        return response.data[0]
+        return rows[0]
     except HTTPException:
         raise
     except Exception as e:
@@ -247,20 +688,168 @@ async def update_student(student_id: str, student: StudentCreate, user_id: str =
 @api_router.delete("/students/{student_id}")
 async def delete_student(student_id: str, user_id: str = Depends(verify_token)):
     try:
-        response = supabase.table("students").delete().eq("id", student_id).eq("user_id", user_id).execute()
+        rows = await db.delete("students", {"id": student_id, "user_id": user_id})
+        notify_change(user_id, "students", "delete", rows)
         return {"message": "Aluno excluído com sucesso"}
     except Exception as e:
         logger.error(f"Erro ao excluir aluno: {e}")
         raise HTTPException(status_code=500, detail="Erro ao excluir aluno")
 
+async def load_workouts_tree(user_id: str, student_id: str, include_exercises: bool, history_limit: int) -> list:
+    workouts = await db.select("workouts", {"student_id": student_id, "user_id": user_id}, order=[("created_at", True)])
+    if not include_exercises or not workouts:
+        return workouts
+
+    exercises = await db.select("exercises", {"workout_id": [w["id"] for w in workouts], "user_id": user_id}, order=[("created_at", False)])
+    if history_limit and exercises:
+        # O limite por exercício é aplicado no banco (função da migração 0005): só as linhas pedidas são lidas
+        history = await db.rpc("latest_exercise_history", {
+            "p_user_id": user_id,
+            "p_exercise_ids": [ex["id"] for ex in exercises],
+            "p_limit": history_limit,
+        })
+        history_by_exercise = {}
+        for entry in history:
+            history_by_exercise.setdefault(entry["exercise_id"], []).append(entry)
+        for ex in exercises:
+            ex["history"] = history_by_exercise.get(ex["id"], [])
+
+    exercises_by_workout = {}
+    for ex in exercises:
+        exercises_by_workout.setdefault(ex["workout_id"], []).append(ex)
+    for w in workouts:
+        w["exercises"] = exercises_by_workout.get(w["id"], [])
+    return workouts
+
+@api_router.get("/students/{student_id}/profile", response_model=StudentProfile)
+async def get_student_profile(
+    student_id: str,
+    include_exercises: bool = True,
+    history_limit: int = Query(0, ge=0, le=100),
+    conditional: Conditional = Depends(),
+    user_id: str = Depends(verify_token),
+):
+    try:
+        filters = {"student_id": student_id, "user_id": user_id}
+
+        async def load():
+            students, workouts, cardio, evolution, weekly_routine = await asyncio.gather(
+                db.select("students", {"id": student_id, "user_id": user_id}),
+                load_workouts_tree(user_id, student_id, include_exercises, history_limit),
+                db.select("cardio", filters, order=[("created_at", True)]),
+                db.select("evolution", filters, order=[("date", True)]),
+                db.select("weekly_routine", filters, order=[("day_of_week", False)]),
+            )
+            if not students:
+                return None
+            return {
+                "student": students[0],
+                "workouts": workouts,
+                "cardio": cardio,
+                "evolution": evolution,
+                "weekly_routine": weekly_routine,
+            }
+
+        profile, etag = await cached_read(user_id, "profile", filters, (include_exercises, history_limit), load, conditional)
+        if profile is None:
+            raise HTTPException(status_code=404, detail="Aluno não encontrado")
+        return conditional.check(etag) or profile
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erro ao buscar perfil do aluno: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao buscar perfil do aluno")
+
+async def load_student_progress(user_id: str, student_id: str) -> StudentProgress:
+    workouts = await db.select("workouts", {"student_id": student_id, "user_id": user_id}, columns="id")
+    exercises, history = [], []
+    if workouts:
+        exercises = await db.select("exercises", {"workout_id": [w["id"] for w in workouts], "user_id": user_id}, columns="id,workout_id,name")
+    if exercises:
+        history = await db.select(
+            "exercise_history",
+            {"exercise_id": [ex["id"] for ex in exercises], "user_id": user_id},
+            order=[("date", False)],
+            columns="exercise_id,date,weight,sets,reps,load_kg,set_count,rep_count",
+        )
+    return StudentProgress(student_id, workouts, exercises, history)
+
+@api_router.get("/students/{student_id}/progress", response_model=StudentProgressResponse)
+async def get_student_progress(
+    student_id: str,
+    last: Optional[int] = Query(None, ge=1, le=1000),
+    user_id: str = Depends(verify_token),
+):
+    try:
+        state = progress_tracker.get(user_id, student_id)
+        if state is None:
+            async def load():
+                students, progress = await asyncio.gather(
+                    db.select("students", {"id": student_id, "user_id": user_id}, columns="id"),
+                    load_student_progress(user_id, student_id),
+                )
+                if not students:
+                    raise HTTPException(status_code=404, detail="Aluno não encontrado")
+                return progress
+
+            state = await load_and_store(user_id, load, lambda progress: progress_tracker.set(user_id, student_id, progress))
+        return {"student_id": student_id, "exercises": state.to_dict(last)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erro ao calcular progresso: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao calcular progresso")
+
+@api_router.get("/students/{student_id}/timeseries", response_model=EvolutionTimeSeries)
+async def get_student_timeseries(
+    student_id: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    bucket: Literal["week", "month"] = "week",
+    window: int = Query(4, ge=1, le=52),
+    conditional: Conditional = Depends(),
+    user_id: str = Depends(verify_token),
+):
+    try:
+        filters = {"student_id": student_id, "user_id": user_id}
+        ranges = {"date": (start.isoformat() if start else None, end.isoformat() if end else None)}
+
+        async def load():
+            students, evolution, cardio = await asyncio.gather(
+                db.select("students", {"id": student_id, "user_id": user_id}, columns="height"),
+                db.select("evolution", filters, columns="date,current_weight", ranges=ranges),
+                db.select("cardio", filters, columns="date,duration,created_at", ranges=ranges),
+            )
+            if not students:
+                return None
+            height_m = height_in_meters(students[0].get("height"))
+            return {
+                "student_id": student_id,
+                "bucket": bucket,
+                "height_m": height_m,
+                "weight": weight_buckets(evolution, bucket, window, height_m),
+                "cardio": cardio_buckets(cardio, bucket, window),
+            }
+
+        series, etag = await cached_read(user_id, "timeseries", filters, (start, end, bucket, window), load, conditional)
+        if series is None:
+            raise HTTPException(status_code=404, detail="Aluno não encontrado")
+        return conditional.check(etag) or series
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erro ao calcular série temporal: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao calcular série temporal")
+
 @api_router.get("/workouts", response_model=List[Workout])
-async def get_workouts(student_id: Optional[str] = None, user_id: str = Depends(verify_token)):
+async def get_workouts(student_id: Optional[str] = None, page: Page = Depends(), user_id: str = Depends(verify_token)):
     try:
-        query = supabase.table("workouts").select("*").eq("user_id", user_id)
+        filters = {"user_id": user_id}
         if student_id:
-            query = query.eq("student_id", student_id)
-        response = query.order("created_at", desc=True).execute()
-        return response.data
+            filters["student_id"] = student_id
+        return await fetch_page("workouts", filters, "created_at", True, page, Workout)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro ao buscar treinos: {e}")
         raise HTTPException(status_code=500, detail="Erro ao buscar treinos")
@@ -270,29 +859,60 @@ async def create_workout(workout: WorkoutCreate, user_id: str = Depends(verify_t
     try:
         data = workout.model_dump()
         data["user_id"] = user_id
-        response = supabase.table("workouts").insert(data).execute()
-        return response.data[0]
+        rows = await db.insert("workouts", data)
+        notify_change(user_id, "workouts", "insert", rows)
+        return rows[0]
     except Exception as e:
         logger.error(f"Erro ao criar treino: {e}")
         raise HTTPException(status_code=500, detail="Erro ao criar treino")
 
+@api_router.post("/workouts/full", response_model=WorkoutWithExercises)
+async def create_workout_full(workout: WorkoutFullCreate, user_id: str = Depends(verify_token)):
+    try:
+        data = workout.model_dump(exclude={"exercises"})
+        data["user_id"] = user_id
+        created = (await db.insert("workouts", data))[0]
+        notify_change(user_id, "workouts", "insert", [created])
+        exercises = []
+        if workout.exercises:
+            stamps = templates.timestamps(len(workout.exercises))
+            rows = [
+                {**ex.model_dump(), "workout_id": created["id"], "user_id": user_id, "created_at": stamp}
+                for ex, stamp in zip(workout.exercises, stamps)
+            ]
+            try:
+                exercises = await db.insert("exercises", rows)
+            except Exception:
+                # Desfaz o treino (exercícios saem por ON DELETE CASCADE) para não deixar treino pela metade
+                deleted = await db.delete("workouts", {"id": created["id"], "user_id": user_id})
+                notify_change(user_id, "workouts", "delete", deleted)
+                raise
+            notify_change(user_id, "exercises", "insert", exercises)
+        created["exercises"] = exercises
+        return created
+    except Exception as e:
+        logger.error(f"Erro ao criar treino completo: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao criar treino")
+
 @api_router.delete("/workouts/{workout_id}")
 async def delete_workout(workout_id: str, user_id: str = Depends(verify_token)):
     try:
-        response = supabase.table("workouts").delete().eq("id", workout_id).eq("user_id", user_id).execute()
+        rows = await db.delete("workouts", {"id": workout_id, "user_id": user_id})
+        notify_change(user_id, "workouts", "delete", rows)
         return {"message": "Treino excluído com sucesso"}
     except Exception as e:
         logger.error(f"Erro ao excluir treino: {e}")
         raise HTTPException(status_code=500, detail="Erro ao excluir treino")
 
 @api_router.get("/exercises", response_model=List[Exercise])
-async def get_exercises(workout_id: Optional[str] = None, user_id: str = Depends(verify_token)):
+async def get_exercises(workout_id: Optional[str] = None, page: Page = Depends(), user_id: str = Depends(verify_token)):
     try:
-        query = supabase.table("exercises").select("*").eq("user_id", user_id)
+        filters = {"user_id": user_id}
         if workout_id:
-            query = query.eq("workout_id", workout_id)
-        response = query.order("created_at").execute()
-        return response.data
+            filters["workout_id"] = workout_id
+        return await fetch_page("exercises", filters, "created_at", False, page, Exercise)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro ao buscar exercícios: {e}")
         raise HTTPException(status_code=500, detail="Erro ao buscar exercícios")
@@ -302,8 +922,9 @@ async def create_exercise(exercise: ExerciseCreate, user_id: str = Depends(verif
     try:
         data = exercise.model_dump()
         data["user_id"] = user_id
-        response = supabase.table("exercises").insert(data).execute()
-        return response.data[0]
+        rows = await db.insert("exercises", data)
+        notify_change(user_id, "exercises", "insert", rows)
+        return rows[0]
     except Exception as e:
         logger.error(f"Erro ao criar exercício: {e}")
         raise HTTPException(status_code=500, detail="Erro ao criar exercício")
@@ -312,10 +933,11 @@ async def create_exercise(exercise: ExerciseCreate, user_id: str = Depends(verif
 async def update_exercise(exercise_id: str, exercise: ExerciseCreate, user_id: str = Depends(verify_token)):
     try:
         data = exercise.model_dump()
-        response = supabase.table("exercises").update(data).eq("id", exercise_id).eq("user_id", user_id).execute()
-        if not response.data:
+        rows = await db.update("exercises", data, {"id": exercise_id, "user_id": user_id})
+        notify_change(user_id, "exercises", "update", rows)
+        if not rows:
             raise HTTPException(status_code=404, detail="Exercício não encontrado")
-        return response.data[0]
+        return rows[0]
     except HTTPException:
         raise
     except Exception as e:
@@ -325,17 +947,19 @@ async def update_exercise(exercise_id: str, exercise: ExerciseCreate, user_id: s
 @api_router.delete("/exercises/{exercise_id}")
 async def delete_exercise(exercise_id: str, user_id: str = Depends(verify_token)):
     try:
-        response = supabase.table("exercises").delete().eq("id", exercise_id).eq("user_id", user_id).execute()
+        rows = await db.delete("exercises", {"id": exercise_id, "user_id": user_id})
+        notify_change(user_id, "exercises", "delete", rows)
         return {"message": "Exercício excluído com sucesso"}
     except Exception as e:
         logger.error(f"Erro ao excluir exercício: {e}")
         raise HTTPException(status_code=500, detail="Erro ao excluir exercício")
 
 @api_router.get("/exercise-history", response_model=List[ExerciseHistory])
-async def get_exercise_history(exercise_id: str, user_id: str = Depends(verify_token)):
+async def get_exercise_history(exercise_id: str, page: Page = Depends(), user_id: str = Depends(verify_token)):
     try:
-        response = supabase.table("exercise_history").select("*").eq("exercise_id", exercise_id).eq("user_id", user_id).order("date", desc=True).execute()
-        return response.data
+        return await fetch_page("exercise_history", {"exercise_id": exercise_id, "user_id": user_id}, "date", True, page, ExerciseHistory)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro ao buscar histórico: {e}")
         raise HTTPException(status_code=500, detail="Erro ao buscar histórico")
@@ -343,19 +967,35 @@ async def get_exercise_history(exercise_id: str, user_id: str = Depends(verify_t
 @api_router.post("/exercise-history", response_model=ExerciseHistory)
 async def create_exercise_history(history: ExerciseHistoryCreate, user_id: str = Depends(verify_token)):
     try:
-        data = history.model_dump()
+        data = normalize_history(history.model_dump())
         data["user_id"] = user_id
-        response = supabase.table("exercise_history").insert(data).execute()
-        return response.data[0]
+        rows = await db.insert("exercise_history", data)
+        notify_change(user_id, "exercise_history", "insert", rows)
+        return rows[0]
     except Exception as e:
         logger.error(f"Erro ao criar registro de histórico: {e}")
         raise HTTPException(status_code=500, detail="Erro ao criar registro de histórico")
 
+@api_router.post("/exercise-history/bulk", response_model=List[ExerciseHistory])
+async def create_exercise_history_bulk(
+    entries: List[ExerciseHistoryCreate] = Body(min_length=1, max_length=MAX_BULK_ITEMS),
+    user_id: str = Depends(verify_token),
+):
+    try:
+        # Um único INSERT multi-linha: ou todos os registros entram, ou nenhum
+        rows = await db.insert("exercise_history", [{**normalize_history(entry.model_dump()), "user_id": user_id} for entry in entries])
+        notify_change(user_id, "exercise_history", "insert", rows)
+        return rows
+    except Exception as e:
+        logger.error(f"Erro ao criar registros de histórico: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao criar registros de histórico")
+
 @api_router.get("/cardio", response_model=List[Cardio])
-async def get_cardio(student_id: str, user_id: str = Depends(verify_token)):
+async def get_cardio(student_id: str, page: Page = Depends(), user_id: str = Depends(verify_token)):
     try:
-        response = supabase.table("cardio").select("*").eq("student_id", student_id).eq("user_id", user_id).order("created_at", desc=True).execute()
-        return response.data
+        return await fetch_page("cardio", {"student_id": student_id, "user_id": user_id}, "created_at", True, page, Cardio)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro ao buscar cardio: {e}")
         raise HTTPException(status_code=500, detail="Erro ao buscar cardio")
@@ -365,8 +1005,9 @@ async def create_cardio(cardio: CardioCreate, user_id: str = Depends(verify_toke
     try:
         data = cardio.model_dump()
         data["user_id"] = user_id
-        response = supabase.table("cardio").insert(data).execute()
-        return response.data[0]
+        rows = await db.insert("cardio", data)
+        notify_change(user_id, "cardio", "insert", rows)
+        return rows[0]
     except Exception as e:
         logger.error(f"Erro ao criar cardio: {e}")
         raise HTTPException(status_code=500, detail="Erro ao criar cardio")
@@ -374,17 +1015,19 @@ async def create_cardio(cardio: CardioCreate, user_id: str = Depends(verify_toke
 @api_router.delete("/cardio/{cardio_id}")
 async def delete_cardio(cardio_id: str, user_id: str = Depends(verify_token)):
     try:
-        response = supabase.table("cardio").delete().eq("id", cardio_id).eq("user_id", user_id).execute()
+        rows = await db.delete("cardio", {"id": cardio_id, "user_id": user_id})
+        notify_change(user_id, "cardio", "delete", rows)
         return {"message": "Cardio excluído com sucesso"}
     except Exception as e:
         logger.error(f"Erro ao excluir cardio: {e}")
         raise HTTPException(status_code=500, detail="Erro ao excluir cardio")
 
 @api_router.get("/evolution", response_model=List[Evolution])
-async def get_evolution(student_id: str, user_id: str = Depends(verify_token)):
+async def get_evolution(student_id: str, page: Page = Depends(), user_id: str = Depends(verify_token)):
     try:
-        response = supabase.table("evolution").select("*").eq("student_id", student_id).eq("user_id", user_id).order("date", desc=True).execute()
-        return response.data
+        return await fetch_page("evolution", {"student_id": student_id, "user_id": user_id}, "date", True, page, Evolution)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro ao buscar evolução: {e}")
         raise HTTPException(status_code=500, detail="Erro ao buscar evolução")
@@ -394,17 +1037,23 @@ async def create_evolution(evolution: EvolutionCreate, user_id: str = Depends(ve
     try:
         data = evolution.model_dump()
         data["user_id"] = user_id
-        response = supabase.table("evolution").insert(data).execute()
-        return response.data[0]
+        rows = await db.insert("evolution", data)
+        notify_change(user_id, "evolution", "insert", rows)
+        return rows[0]
     except Exception as e:
         logger.error(f"Erro ao criar evolução: {e}")
         raise HTTPException(status_code=500, detail="Erro ao criar evolução")
 
 @api_router.get("/weekly-routine", response_model=List[WeeklyRoutine])
-async def get_weekly_routine(student_id: str, user_id: str = Depends(verify_token)):
+async def get_weekly_routine(student_id: str, conditional: Conditional = Depends(), user_id: str = Depends(verify_token)):
     try:
-        response = supabase.table("weekly_routine").select("*").eq("student_id", student_id).eq("user_id", user_id).order("day_of_week").execute()
-        return response.data
+        filters = {"student_id": student_id, "user_id": user_id}
+        routine, etag = await cached_read(
+            user_id, "weekly_routine", filters, (),
+            lambda: db.select("weekly_routine", filters, order=[("day_of_week", False)]),
+            conditional,
+        )
+        return conditional.check(etag) or routine
     except Exception as e:
         logger.error(f"Erro ao buscar rotina semanal: {e}")
         raise HTTPException(status_code=500, detail="Erro ao buscar rotina semanal")
@@ -414,8 +1063,9 @@ async def create_weekly_routine(routine: WeeklyRoutineCreate, user_id: str = Dep
     try:
         data = routine.model_dump()
         data["user_id"] = user_id
-        response = supabase.table("weekly_routine").insert(data).execute()
-        return response.data[0]
+        rows = await db.insert("weekly_routine", data)
+        notify_change(user_id, "weekly_routine", "insert", rows)
+        return rows[0]
     except Exception as e:
         logger.error(f"Erro ao criar rotina semanal: {e}")
         raise HTTPException(status_code=500, detail="Erro ao criar rotina semanal")
@@ -424,10 +1074,11 @@ async def create_weekly_routine(routine: WeeklyRoutineCreate, user_id: str = Dep
 async def update_weekly_routine(routine_id: str, routine: WeeklyRoutineCreate, user_id: str = Depends(verify_token)):
     try:
         data = routine.model_dump()
-        response = supabase.table("weekly_routine").update(data).eq("id", routine_id).eq("user_id", user_id).execute()
-        if not response.data:
+        rows = await db.update("weekly_routine", data, {"id": routine_id, "user_id": user_id})
+        notify_change(user_id, "weekly_routine", "update", rows)
+        if not rows:
             raise HTTPException(status_code=404, detail="Rotina não encontrada")
-        return response.data[0]
+        return rows[0]
     except HTTPException:
         raise
     except Exception as e:
@@ -437,12 +1088,471 @@ async def update_weekly_routine(routine_id: str, routine: WeeklyRoutineCreate, u
 @api_router.delete("/weekly-routine/{routine_id}")
 async def delete_weekly_routine(routine_id: str, user_id: str = Depends(verify_token)):
     try:
-        response = supabase.table("weekly_routine").delete().eq("id", routine_id).eq("user_id", user_id).execute()
+        rows = await db.delete("weekly_routine", {"id": routine_id, "user_id": user_id})
+        notify_change(user_id, "weekly_routine", "delete", rows)
         return {"message": "Rotina excluída com sucesso"}
     except Exception as e:
         logger.error(f"Erro ao excluir rotina semanal: {e}")
         raise HTTPException(status_code=500, detail="Erro ao excluir rotina semanal")
 
+@api_router.put("/students/{student_id}/weekly-routine", response_model=WeeklyRoutineWeekResult)
+async def replace_weekly_routine(student_id: str, week: WeeklyRoutineWeek, user_id: str = Depends(verify_token)):
+    try:
+        existing = await db.select("weekly_routine", {"student_id": student_id, "user_id": user_id}, columns="id")
+        existing_ids = {row["id"] for row in existing}
+        if any(day.id and day.id not in existing_ids for day in week.days):
+            raise HTTPException(status_code=404, detail="Rotina não encontrada")
+
+        rows = []
+        for day in week.days:
+            row = {**day.model_dump(exclude={"id"}), "student_id": student_id, "user_id": user_id}
+            if day.id:
+                row["id"] = day.id
+            rows.append(row)
+        saved = await db.upsert("weekly_routine", rows) if rows else []
+        notify_change(user_id, "weekly_routine", "update", saved)
+
+        kept_ids = {day.id for day in week.days if day.id}
+        stale_ids = sorted(existing_ids - kept_ids) if week.replace else []
+        if stale_ids:
+            deleted = await db.delete("weekly_routine", {"id": stale_ids, "user_id": user_id})
+            notify_change(user_id, "weekly_routine", "delete", deleted)
+
+        return {
+            "routine": sorted(saved, key=lambda r: r["day_of_week"]),
+            "created": [row["id"] for day, row in zip(week.days, saved) if not day.id],
+            "updated": [row["id"] for day, row in zip(week.days, saved) if day.id],
+            "deleted": stale_ids,
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erro ao salvar rotina semanal: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao salvar rotina semanal")
+
+async def owned_students(user_id: str, student_ids: List[str]) -> set:
+    batches = await asyncio.gather(*(
+        db.select("students", {"id": list(ids), "user_id": user_id}, columns="id")
+        for ids in templates.chunks(student_ids, templates.ID_CHUNK_SIZE)
+    ))
+    return {row["id"] for rows in batches for row in rows}
+
+async def delete_ids(user_id: str, table: str, ids: List[str]) -> List[dict]:
+    deleted = []
+    for chunk in templates.chunks(ids, templates.ID_CHUNK_SIZE):
+        deleted.extend(await db.delete(table, {"id": list(chunk), "user_id": user_id}))
+    return deleted
+
+async def insert_batches(user_id: str, table: str, rows: List[dict]) -> List[dict]:
+    # Lotes multi-linha; se um falhar, remove o que os anteriores já gravaram
+    inserted = []
+    try:
+        for batch in templates.chunks(rows, IMPORT_BATCH_SIZE):
+            inserted.extend(await db.insert(table, list(batch)))
+    except Exception:
+        await delete_ids(user_id, table, [row["id"] for row in inserted])
+        raise
+    return inserted
+
+@api_router.post("/workouts/{workout_id}/clone", response_model=CloneReport)
+async def clone_workout(workout_id: str, request: WorkoutCloneRequest, user_id: str = Depends(verify_token)):
+    """Copia o treino, com os exercícios, para cada aluno da lista em dois INSERTs em lote."""
+    try:
+        student_ids = templates.unique(request.student_ids)
+        source, exercises, found = await asyncio.gather(
+            db.select("workouts", {"id": workout_id, "user_id": user_id}),
+            db.select("exercises", {"workout_id": workout_id, "user_id": user_id}, order=[("created_at", False), ("id", False)]),
+            owned_students(user_id, student_ids),
+        )
+        if not source:
+            raise HTTPException(status_code=404, detail="Treino não encontrado")
+
+        targets = [sid for sid in student_ids if sid in found]
+        workouts, copies = templates.clone_workout(source[0], exercises, targets, user_id, request.name, request.date)
+        created = await insert_batches(user_id, "workouts", workouts) if workouts else []
+        notify_change(user_id, "workouts", "insert", created)
+        try:
+            copied = await insert_batches(user_id, "exercises", copies) if copies else []
+        except Exception:
+            # Exercícios já gravados saem por ON DELETE CASCADE
+            deleted = await delete_ids(user_id, "workouts", [w["id"] for w in created])
+            notify_change(user_id, "workouts", "delete", deleted)
+            raise
+        notify_change(user_id, "exercises", "insert", copied)
+
+        new_ids = {w["student_id"]: w["id"] for w in workouts}
+        return {
+            "source_id": workout_id,
+            "results": [
+                {"student_id": sid, "status": "created", "workout_id": new_ids[sid], "created": len(exercises)}
+                if sid in new_ids else {"student_id": sid, "status": "not_found"}
+                for sid in student_ids
+            ],
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erro ao copiar treino: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao copiar treino")
+
+@api_router.post("/students/{student_id}/weekly-routine/clone", response_model=CloneReport)
+async def clone_weekly_routine(student_id: str, request: WeeklyRoutineCloneRequest, user_id: str = Depends(verify_token)):
+    """Aplica a rotina semanal do aluno a outros alunos; com `replace`, a rotina anterior deles é removida."""
+    try:
+        student_ids = templates.unique(request.student_ids)
+        routine, found = await asyncio.gather(
+            db.select("weekly_routine", {"student_id": student_id, "user_id": user_id}, order=[("day_of_week", False)]),
+            owned_students(user_id, [student_id, *student_ids]),
+        )
+        if student_id not in found:
+            raise HTTPException(status_code=404, detail="Aluno não encontrado")
+
+        targets = [sid for sid in student_ids if sid in found and sid != student_id]
+        existing = []
+        if request.replace and targets:
+            batches = await asyncio.gather(*(
+                db.select("weekly_routine", {"student_id": list(ids), "user_id": user_id}, columns="id,student_id")
+                for ids in templates.chunks(targets, templates.ID_CHUNK_SIZE)
+            ))
+            existing = [row for rows in batches for row in rows]
+
+        # Insere antes de remover: se o INSERT falhar, a rotina antiga continua lá
+        rows = templates.clone_routine(routine, targets, user_id)
+        created = await insert_batches(user_id, "weekly_routine", rows) if rows else []
+        notify_change(user_id, "weekly_routine", "insert", created)
+        deleted = await delete_ids(user_id, "weekly_routine", [row["id"] for row in existing])
+        notify_change(user_id, "weekly_routine", "delete", deleted)
+
+        deleted_count = {}
+        for row in deleted:
+            deleted_count[row["student_id"]] = deleted_count.get(row["student_id"], 0) + 1
+        results = []
+        for sid in student_ids:
+            if sid == student_id:
+                results.append({"student_id": sid, "status": "skipped"})
+            elif sid not in found:
+                results.append({"student_id": sid, "status": "not_found"})
+            else:
+                results.append({"student_id": sid, "status": "created", "created": len(routine), "deleted": deleted_count.get(sid, 0)})
+        return {"source_id": student_id, "results": results}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erro ao copiar rotina semanal: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao copiar rotina semanal")
+
+EXPORT_MODELS = {
+    "students": Student,
+    "workouts": Workout,
+    "exercises": Exercise,
+    "exercise_history": ExerciseHistory,
+    "cardio": Cardio,
+    "evolution": Evolution,
+    "weekly_routine": WeeklyRoutine,
+}
+
+IMPORT_MODELS = {
+    "students": StudentCreate,
+    "workouts": WorkoutCreate,
+    "exercises": ExerciseCreate,
+    "exercise_history": ExerciseHistoryCreate,
+    "cardio": CardioCreate,
+    "evolution": EvolutionCreate,
+    "weekly_routine": WeeklyRoutineCreate,
+}
+
+def selected_tables(tables: Optional[str]) -> List[str]:
+    if not tables:
+        return list(transfer.TABLES)
+    selected = [t.strip() for t in tables.split(",") if t.strip()]
+    invalid = [t for t in selected if t not in transfer.TABLES]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Tabela inválida: {', '.join(invalid)}")
+    return [t for t in transfer.TABLES if t in selected]
+
+async def iter_table_pages(table: str, user_id: str, columns: str = "*"):
+    after = None
+    while True:
+        rows = await db.select(
+            table,
+            {"user_id": user_id},
+            order=[("created_at", False), ("id", False)],
+            columns=columns,
+            limit=EXPORT_PAGE_SIZE,
+            after=after,
+        )
+        if rows:
+            yield rows
+        if len(rows) < EXPORT_PAGE_SIZE:
+            return
+        after = (rows[-1]["created_at"], rows[-1]["id"])
+
+@api_router.get("/export")
+async def export_data(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    tables: Optional[str] = None,
+    user_id: str = Depends(verify_token),
+):
+    selected = selected_tables(tables)
+    if format == "csv" and len(selected) != 1:
+        raise HTTPException(status_code=400, detail="A exportação em CSV exige exatamente uma tabela")
+
+    async def ndjson_body():
+        for table in selected:
+            async for rows in iter_table_pages(table, user_id):
+                yield "".join(transfer.ndjson_line(table, row) for row in rows)
+
+    async def csv_body():
+        table = selected[0]
+        columns = list(EXPORT_MODELS[table].model_fields)
+        yield transfer.csv_line(columns)
+        async for rows in iter_table_pages(table, user_id):
+            yield "".join(transfer.csv_line([row.get(c) for c in columns]) for row in rows)
+
+    name = f"personalhub-{selected[0] if format == 'csv' else 'export'}-{date.today().isoformat()}.{format}"
+    return StreamingResponse(
+        ndjson_body() if format == "ndjson" else csv_body(),
+        media_type="application/x-ndjson" if format == "ndjson" else "text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{name}"'},
+    )
+
+@api_router.post("/import")
+async def import_data(
+    request: Request,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    table: Optional[str] = None,
+    dry_run: bool = False,
+    user_id: str = Depends(verify_token),
+):
+    if format == "csv" and table not in transfer.TABLES:
+        raise HTTPException(status_code=400, detail="A importação em CSV exige o parâmetro table")
+
+    async def insert(target: str, rows: List[dict]) -> List[dict]:
+        inserted = await db.insert(target, rows)
+        notify_change(user_id, target, "insert", inserted)
+        return inserted
+
+    def prepare(target: str, data: dict) -> dict:
+        return normalize_history(data) if target == "exercise_history" else data
+
+    importer = transfer.Importer(user_id, IMPORT_MODELS, insert, prepare, batch_size=IMPORT_BATCH_SIZE, dry_run=dry_run)
+    lines = transfer.iter_lines(request.stream())
+    try:
+        if format == "ndjson":
+            line_number = 0
+            async for line in lines:
+                line_number += 1
+                if not line.strip():
+                    continue
+                try:
+                    item = json.loads(line)
+                    target, row = item["table"], item["row"]
+                    if not isinstance(row, dict):
+                        raise ValueError
+                except (ValueError, KeyError, TypeError):
+                    importer.report.error(line_number, "Linha NDJSON inválida")
+                    continue
+                await importer.add(line_number, target, row)
+        else:
+            records = transfer.iter_csv_records(lines)
+            header = await records.__anext__()
+            line_number = 1
+            async for record in records:
+                line_number += 1
+                row = {column: transfer.csv_value(value) for column, value in zip(header, record)}
+                await importer.add(line_number, table, row)
+        return await importer.finish()
+    except StopAsyncIteration:
+        raise HTTPException(status_code=400, detail="Arquivo vazio")
+    except Exception as e:
+        logger.error(f"Erro ao importar dados: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao importar dados")
+
+def schedule_exercises(value) -> List[dict]:
+    if not isinstance(value, list):
+        return []
+    return [item if isinstance(item, dict) else {"name": str(item)} for item in value]
+
+@api_router.get("/schedule", response_model=DailySchedule)
+async def get_schedule(
+    day_of_week: Optional[int] = Query(None, ge=0, le=6),
+    date: Optional[str] = None,
+    conditional: Conditional = Depends(),
+    user_id: str = Depends(verify_token),
+):
+    """Rotina de todos os alunos para um dia da semana, com o que já foi registrado na data.
+
+    Sem `date`, usa hoje; sem `day_of_week`, o dia da semana da data (0 = domingo).
+    """
+    try:
+        day = datetime.strptime(date, "%Y-%m-%d").date() if date else datetime.now().date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Data inválida")
+    if day_of_week is None:
+        day_of_week = day.isoweekday() % 7
+    try:
+        filters = {"day_of_week": day_of_week, "date": day.isoformat()}
+
+        async def load():
+            rows = await db.rpc("daily_schedule", {"p_user_id": user_id, "p_day": day_of_week, "p_date": day.isoformat()})
+            return {
+                "date": day.isoformat(),
+                "day_of_week": day_of_week,
+                "entries": [
+                    {
+                        "routine_id": row["routine_id"],
+                        "student_id": row["student_id"],
+                        "student_name": row["student_name"],
+                        "workout_name": row["workout_name"],
+                        "exercises": schedule_exercises(row["exercises"]),
+                        "workout_id": row["workout_id"],
+                        "has_workout": row["workout_id"] is not None,
+                        "has_history": row["has_history"],
+                    }
+                    for row in rows
+                ],
+            }
+
+        schedule, etag = await cached_read(user_id, "schedule", filters, (), load, conditional)
+        return conditional.check(etag) or schedule
+    except Exception as e:
+        logger.error(f"Erro ao buscar agenda: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao buscar agenda")
+
+SEARCH_COLUMNS = {
+    "students": "id,name,goal,created_at",
+    "workouts": "id,student_id,name,created_at",
+    "exercises": "id,workout_id,name,created_at",
+}
+
+async def load_search_index(user_id: str):
+    async def read(table: str) -> List[dict]:
+        return [row async for rows in iter_table_pages(table, user_id, SEARCH_COLUMNS[table]) for row in rows]
+
+    async def load():
+        tables = list(SEARCH_COLUMNS)
+        results = await asyncio.gather(*(read(table) for table in tables))
+        return SearchIndexes.build(dict(zip(tables, results)))
+
+    return await load_and_store(user_id, load, lambda index: search_indexes.set(user_id, index))
+
+@api_router.get("/search", response_model=List[SearchResult])
+async def search(
+    q: str = Query(min_length=1, max_length=100),
+    types: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    user_id: str = Depends(verify_token),
+):
+    """Busca tolerante a erros de digitação em nomes e objetivos de alunos, treinos e exercícios."""
+    tables = None
+    if types:
+        tables = {t.strip() for t in types.split(",") if t.strip()}
+        invalid = tables - set(SEARCH_COLUMNS)
+        if invalid:
+            raise HTTPException(status_code=400, detail=f"Tipo inválido: {', '.join(sorted(invalid))}")
+    try:
+        index = search_indexes.get(user_id)
+        if index is None:
+            key = ("search", user_id, response_cache.generation(user_id))
+            index = await single_flight.do(key, lambda: load_search_index(user_id))
+        return index.search(q, tables, limit)
+    except Exception as e:
+        logger.error(f"Erro na busca: {e}")
+        raise HTTPException(status_code=500, detail="Erro na busca")
+
+@api_router.get("/changes/stream")
+async def stream_changes(
+    request: Request,
+    since: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None),
+    user_id: str = Depends(verify_token),
+):
+    """Server-Sent Events com as alterações do treinador, linha a linha.
+
+    Cada evento `change` traz {table, op, row} e um id que serve de cursor:
+    reconectando com `since` (ou Last-Event-ID) o cliente recebe só o que
+    perdeu. Um evento `reset` indica que o cursor não pode ser retomado e
+    as listas devem ser recarregadas.
+    """
+    events = change_feed.stream(user_id, since or last_event_id, settings.change_heartbeat, request.is_disconnected)
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@api_router.get("/health/live")
+async def health_live():
+    # Só indica que o processo responde; não toca em nenhum upstream
+    return {"status": "alive"}
+
+@api_router.get("/health/ready")
+async def health_ready():
+    result = await health.ready()
+    return JSONResponse(result, status_code=200 if result["ready"] else 503)
+
+@api_router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics(authorization: str = Header(None)):
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Token de métricas inválido")
+    stats = response_cache.stats()
+    cache_lines = [
+        "# HELP response_cache_entries Entradas no cache de respostas",
+        "# TYPE response_cache_entries gauge",
+        f"response_cache_entries {stats['entries']}",
+        "# HELP response_cache_bytes Tamanho estimado do cache de respostas",
+        "# TYPE response_cache_bytes gauge",
+        f"response_cache_bytes {stats['bytes']}",
+    ]
+    for name in ("hits", "misses", "evictions", "invalidations"):
+        cache_lines += [
+            f"# HELP response_cache_{name}_total Contador de {name} do cache de respostas",
+            f"# TYPE response_cache_{name}_total counter",
+            f"response_cache_{name}_total {stats[name]}",
+        ]
+    flights = single_flight.stats()
+    cache_lines += [
+        "# HELP single_flight_in_flight Leituras ao upstream em andamento que podem ser compartilhadas",
+        "# TYPE single_flight_in_flight gauge",
+        f"single_flight_in_flight {flights['in_flight']}",
+    ]
+    for name, description in (
+        ("calls", "Leituras que foram de fato ao upstream"),
+        ("shared", "Leituras atendidas por uma chamada já em andamento (deduplicadas)"),
+        ("timeouts", "Esperas por uma chamada compartilhada que estouraram o limite"),
+        ("errors", "Chamadas compartilhadas que falharam (o erro chega a todos que esperavam)"),
+    ):
+        cache_lines += [
+            f"# HELP single_flight_{name}_total {description}",
+            f"# TYPE single_flight_{name}_total counter",
+            f"single_flight_{name}_total {flights[name]}",
+        ]
+    changes = change_feed.stats()
+    cache_lines += [
+        "# HELP change_feed_subscribers Streams de alterações abertos",
+        "# TYPE change_feed_subscribers gauge",
+        f"change_feed_subscribers {changes['subscribers']}",
+        "# HELP change_feed_published_total Eventos publicados no stream de alterações",
+        "# TYPE change_feed_published_total counter",
+        f"change_feed_published_total {changes['published']}",
+        "# HELP change_feed_dropped_total Streams encerrados com reset por não acompanharem o ritmo",
+        "# TYPE change_feed_dropped_total counter",
+        f"change_feed_dropped_total {changes['dropped']}",
+    ]
+    return PlainTextResponse(
+        REGISTRY.render() + "\n".join(cache_lines) + "\n",
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+@api_router.get("/cache/stats")
+async def get_cache_stats(user_id: str = Depends(verify_token)):
+    return {
+        "enabled": CACHE_ENABLED,
+        **response_cache.stats(),
+        "single_flight": single_flight.stats(),
+        "search": search_indexes.stats(),
+    }
+
 class CheckoutRequest(BaseModel):
     plan_type: str
     email: str
@@ -466,56 +1576,110 @@ async def create_checkout(request: CheckoutRequest):
         
         plan = plans[request.plan_type]
         
-        checkout_session = stripe.checkout.Session.create(
-            payment_method_types=['card'],
-            line_items=[{
-                'price': plan['price_id'],
-                'quantity': 1,
-            }],
-            mode='subscription',
-            success_url=f"{FRONTEND_URL}/success?session_id={{CHECKOUT_SESSION_ID}}",
-            cancel_url=f"{FRONTEND_URL}/#planos",
-            customer_email=request.email,
-            metadata={
-                'plan_type': request.plan_type,
-                'email': request.email
-            }
-        )
+        async with track("stripe", "checkout.session.create"):
+            checkout_session = await db.run(
+                stripe.checkout.Session.create,
+                payment_method_types=['card'],
+                line_items=[{
+                    'price': plan['price_id'],
+                    'quantity': 1,
+                }],
+                mode='subscription',
+                success_url=f"{FRONTEND_URL}/success?session_id={{CHECKOUT_SESSION_ID}}",
+                cancel_url=f"{FRONTEND_URL}/#planos",
+                customer_email=request.email,
+                metadata={
+                    'plan_type': request.plan_type,
+                    'email': request.email
+                }
+            )
         
         return {"checkout_url": checkout_session.url, "session_id": checkout_session.id}
     except Exception as e:
         logger.error(f"Erro ao criar checkout: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def session_paid(session) -> bool:
+    return session.payment_status == 'paid' or session.status == 'complete'
+
+async def record_paid_session(session) -> dict:
+    """Grava o token de cadastro da sessão uma única vez; repetições devolvem o já gravado."""
+    row = {
+        "token": secrets.token_urlsafe(32),
+        "email": session.metadata.get('email') or session.customer_email,
+        "plan_type": session.metadata.get('plan_type'),
+        "stripe_session_id": session.id,
+        "used": False,
+        "expires_at": (datetime.now(timezone.utc) + PURCHASE_TOKEN_TTL).isoformat(),
+    }
+    rows = await db.upsert("purchase_tokens", [row], on_conflict="stripe_session_id", ignore_duplicates=True)
+    if not rows:
+        rows = await db.select("purchase_tokens", {"stripe_session_id": session.id})
+    response_cache.invalidate(PAYMENTS, "purchase_tokens", {"stripe_session_id": session.id})
+    return rows[0]
+
+async def find_purchase_token(session_id: str) -> Optional[dict]:
+    async def load():
+        rows = await db.select("purchase_tokens", {"stripe_session_id": session_id}, columns="token,email,plan_type,used,expires_at")
+        return rows[0] if rows else None
+
+    token, _etag = await cached_read(PAYMENTS, "purchase_tokens", {"stripe_session_id": session_id}, (), load)
+    return token
+
+def token_expired(token: dict) -> bool:
+    return datetime.fromisoformat(token['expires_at'].replace('Z', '+00:00')) < datetime.now(timezone.utc)
+
+@api_router.post("/stripe/webhook")
+async def stripe_webhook(request: Request, stripe_signature: Optional[str] = Header(None)):
+    if not settings.stripe_webhook_secret:
+        raise HTTPException(status_code=503, detail="Webhook do Stripe não configurado")
+    payload = await request.body()
+    try:
+        event = stripe.Webhook.construct_event(payload, stripe_signature or "", settings.stripe_webhook_secret)
+    except (ValueError, stripe.error.SignatureVerificationError) as e:
+        logger.warning(f"Webhook do Stripe rejeitado: {e}")
+        raise HTTPException(status_code=400, detail="Assinatura inválida")
+
+    if event["type"] in ("checkout.session.completed", "checkout.session.async_payment_succeeded"):
+        session = event["data"]["object"]
+        if session_paid(session):
+            try:
+                await record_paid_session(session)
+            except Exception as e:
+                # 500 faz o Stripe reenviar o evento mais tarde
+                logger.error(f"Erro ao registrar pagamento {session.id}: {e}")
+                raise HTTPException(status_code=500, detail="Erro ao registrar pagamento")
+    return {"received": True}
+
 @api_router.get("/verify-payment/{session_id}")
 async def verify_payment(session_id: str):
     try:
-        session = stripe.checkout.Session.retrieve(session_id)
-        
-        if session.payment_status != 'paid' and session.status != 'complete':
-            raise HTTPException(status_code=400, detail="Pagamento não confirmado")
-        
-        email = session.metadata.get('email') or session.customer_email
-        plan_type = session.metadata.get('plan_type')
-        
-        token = secrets.token_urlsafe(32)
-        expires_at = datetime.now(timezone.utc) + timedelta(hours=24)
-        
-        supabase.table("purchase_tokens").insert({
-            "token": token,
-            "email": email,
-            "plan_type": plan_type,
-            "stripe_session_id": session_id,
-            "used": False,
-            "expires_at": expires_at.isoformat()
-        }).execute()
-        
+        token = await find_purchase_token(session_id)
+        if token is None:
+            # O webhook ainda não chegou (ou não está configurado): confirma no Stripe
+            # uma vez e grava, para as próximas visitas serem só uma leitura local
+            async def confirm():
+                async with track("stripe", "checkout.session.retrieve"):
+                    session = await db.run(stripe.checkout.Session.retrieve, session_id)
+                if not session_paid(session):
+                    raise HTTPException(status_code=400, detail="Pagamento não confirmado")
+                return await record_paid_session(session)
+
+            token = await single_flight.do(("stripe-session", session_id), confirm)
+
+        if token["used"]:
+            raise HTTPException(status_code=400, detail="Pagamento já utilizado para criar uma conta")
+        if token_expired(token):
+            raise HTTPException(status_code=400, detail="Token expirado")
+
         return {
             "valid": True,
-            "token": token,
-            "email": email,
-            "plan_type": plan_type
+            "token": token["token"],
+            "email": token["email"],
+            "plan_type": token["plan_type"]
         }
+    except HTTPException:
+        raise
     except stripe.error.StripeError as e:
         logger.error(f"Erro do Stripe: {e}")
         raise HTTPException(status_code=400, detail="Sessão de pagamento inválida")
@@ -526,28 +1690,33 @@ async def verify_payment(session_id: str):
 @api_router.post("/signup")
 async def signup(request: SignupRequest):
     try:
-        token_response = supabase.table("purchase_tokens").select("*").eq("token", request.token).eq("email", request.email).eq("used", False).execute()
-        
-        if not token_response.data or len(token_response.data) == 0:
+        # Consome o token num único UPDATE condicional: de duas requisições simultâneas, só uma o recebe
+        tokens = await db.update(
+            "purchase_tokens", {"used": True}, {"token": request.token, "email": request.email, "used": False},
+        )
+        if not tokens:
             raise HTTPException(status_code=400, detail="Token inválido ou já utilizado")
-        
-        token_data = token_response.data[0]
-        expires_at = datetime.fromisoformat(token_data['expires_at'].replace('Z', '+00:00'))
-        
-        if expires_at < datetime.now(timezone.utc):
+        token_data = tokens[0]
+        response_cache.invalidate(PAYMENTS, "purchase_tokens", token_data)
+
+        async def release():
+            # Sem conta criada, o token volta ao estado anterior (e segue reportando o próprio erro)
+            await db.update("purchase_tokens", {"used": False}, {"token": request.token})
+            response_cache.invalidate(PAYMENTS, "purchase_tokens", token_data)
+
+        if token_expired(token_data):
+            await release()
             raise HTTPException(status_code=400, detail="Token expirado")
-        
-        auth_response = supabase.auth.admin.create_user({
-            "email": request.email,
-            "password": request.password,
-            "email_confirm": True
-        })
-        
-        supabase.table("purchase_tokens").update({"used": True}).eq("token", request.token).execute()
-        
+
+        try:
+            new_user_id = await db.create_user(request.email, request.password)
+        except Exception:
+            await release()
+            raise
+
         return {
             "message": "Conta criada com sucesso!",
-            "user_id": auth_response.user.id
+            "user_id": new_user_id
         }
     except HTTPException:
         raise
@@ -555,10 +1724,36 @@ async def signup(request: SignupRequest):
         logger.error(f"Erro ao criar conta: {e}")
         raise HTTPException(status_code=500, detail="Erro ao criar conta")
 
+async def purge_expired_tokens() -> int:
+    """Remove tokens de cadastro vencidos e não usados; os usados ficam como registro da compra."""
+    removed = 0
+    now = datetime.now(timezone.utc).isoformat()
+    while True:
+        expired = await db.select(
+            "purchase_tokens", {"used": False}, columns="id",
+            ranges={"expires_at": (None, now)}, limit=templates.ID_CHUNK_SIZE,
+        )
+        if not expired:
+            return removed
+        # `used` no filtro preserva um token consumido entre a leitura e a remoção
+        deleted = await db.delete("purchase_tokens", {"id": [row["id"] for row in expired], "used": False})
+        removed += len(deleted)
+        if len(expired) < templates.ID_CHUNK_SIZE:
+            return removed
+
+async def purge_tokens_periodically(interval: float) -> None:
+    while True:
+        try:
+            removed = await purge_expired_tokens()
+            if removed:
+                logger.info(f"{removed} tokens de cadastro vencidos removidos")
+        except Exception as e:
+            logger.warning(f"Falha ao remover tokens vencidos: {e}")
+        await asyncio.sleep(interval)
+
 app.include_router(api_router)
 
-origins_env = os.environ.get("CORS_ORIGINS", "*")
-origins = [o.strip() for o in origins_env.split(",")]
+origins = [o.strip() for o in settings.cors_origins.split(",")]
 
 app.add_middleware(
     CORSMiddleware,
@@ -566,5 +1761,15 @@ app.add_middleware(
     allow_origins=origins,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Server-Timing"],
 )
 
+if settings.metrics_enabled:
+    # Adicionado por último: fica por fora do CORS e mede a requisição inteira
+    app.add_middleware(
+        MetricsMiddleware,
+        router_app=app,
+        server_timing=settings.server_timing,
+        slow_request_ms=settings.slow_request_ms,
+    )
+
@@ -0,0 +1,96 @@
+import os
+import secrets
+from typing import Literal, Mapping, Optional
+
+from pydantic import BaseModel, ConfigDict, ValidationError
+
+
+class SettingsError(Exception):
+    pass
+
+
+class Settings(BaseModel):
+    """Configuração do backend, lida das variáveis de ambiente uma única vez.
+
+    Cada campo corresponde à variável de mesmo nome em maiúsculas
+    (`cache_ttl` <- CACHE_TTL). Ler não faz nenhuma chamada de rede;
+    `check()` valida o que só é obrigatório para o backend escolhido e
+    roda no startup da aplicação.
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+    db_backend: Literal["supabase", "sqlite"] = "supabase"
+    sqlite_path: str = "personalhub.db"
+    supabase_url: str = ""
+    supabase_anon_key: str = ""
+    supabase_service_role_key: str = ""
+    supabase_jwt_secret: str = ""
+    stripe_secret_key: str = ""
+    stripe_price_monthly: str = ""
+    stripe_price_semiannual: str = ""
+    stripe_price_annual: str = ""
+    stripe_webhook_secret: str = ""
+    frontend_url: str = "http://localhost:3000"
+    cors_origins: str = "*"
+
+    auth_check_revoked: bool = False
+    auth_token_cache_ttl: int = 300
+    auth_token_cache_size: int = 10000
+
+    upstream_pool_size: int = 16
+    http_max_connections: int = 32
+    http_max_keepalive: int = 16
+    http_keepalive_expiry: float = 30.0
+    http_timeout: float = 10.0
+    http_connect_timeout: float = 5.0
+
+    max_bulk_items: int = 500
+    cache_enabled: bool = True
+    cache_ttl: float = 30.0
+    cache_max_entries: int = 10000
+    cache_max_bytes: int = 64 * 1024 * 1024
+    progress_ttl: float = 300.0
+    single_flight_timeout: float = 5.0
+    export_page_size: int = 1000
+    import_batch_size: int = 500
+    change_buffer_size: int = 1000
+    change_heartbeat: float = 15.0
+    search_index_ttl: float = 600.0
+    token_cleanup_interval: float = 3600.0
+    response_validation: Literal["full", "once", "off"] = "once"
+    response_stream_rows: int = 5000
+
+    metrics_enabled: bool = True
+    metrics_token: str = ""
+    server_timing: bool = False
+    slow_request_ms: float = 1000.0
+
+    warmup_connections: int = 4
+    health_cache_ttl: float = 5.0
+    health_timeout: float = 2.0
+
+    @classmethod
+    def from_env(cls, environ: Optional[Mapping[str, str]] = None, **defaults) -> "Settings":
+        environ = os.environ if environ is None else environ
+        values = dict(defaults)
+        for name in cls.model_fields:
+            raw = environ.get(name.upper())
+            if raw is not None and raw != "":
+                values[name] = raw.lower() if name == "db_backend" else raw
+        try:
+            settings = cls(**values)
+        except ValidationError as e:
+            raise SettingsError(f"Configuração inválida: {e}") from e
+        if settings.db_backend == "sqlite" and not settings.supabase_jwt_secret:
+            # Tokens emitidos pelo backend local; sem segredo configurado, valem só até reiniciar
+            settings = settings.model_copy(update={"supabase_jwt_secret": secrets.token_urlsafe(32)})
+        return settings
+
+    @property
+    def issuer_url(self) -> str:
+        return self.supabase_url or "http://localhost"
+
+    def check(self) -> None:
+        if self.db_backend == "supabase" and not (self.supabase_url and self.supabase_service_role_key):
+            raise SettingsError("SUPABASE_URL e SUPABASE_SERVICE_ROLE_KEY são obrigatórios com DB_BACKEND=supabase")
@@ -0,0 +1,351 @@
+import asyncio
+import functools
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from jose import jwt, JWTError
+
+from db import Database, Order
+
+SCHEMA_PATH = Path(__file__).parent / "sqlite_schema.sql"
+PASSWORD_ITERATIONS = 200_000
+
+# Equivalentes das funções SQL de `migrations/` chamadas por `rpc`:
+# nome -> (SQL, tabela usada para decodificar JSON/booleanos, colunas booleanas calculadas)
+FUNCTIONS = {
+    "daily_schedule": ("""
+        SELECT
+          r.id AS routine_id,
+          r.student_id,
+          s.name AS student_name,
+          r.day_of_week,
+          r.workout_name,
+          r.exercises,
+          (
+            SELECT w.id FROM workouts w
+            WHERE w.user_id = :p_user_id AND w.student_id = r.student_id AND w.date = :p_date
+            ORDER BY w.created_at DESC
+            LIMIT 1
+          ) AS workout_id,
+          EXISTS (
+            SELECT 1 FROM exercise_history h
+            JOIN exercises e ON e.id = h.exercise_id
+            JOIN workouts w ON w.id = e.workout_id
+            WHERE h.user_id = :p_user_id AND h.date = :p_date AND w.student_id = r.student_id
+          ) AS has_history
+        FROM weekly_routine r
+        JOIN students s ON s.id = r.student_id
+        WHERE r.user_id = :p_user_id AND r.day_of_week = :p_day
+        ORDER BY s.name, r.created_at
+    """, "weekly_routine", ("has_history",)),
+    "latest_exercise_history": ("""
+        SELECT id, user_id, exercise_id, date, weight, sets, reps, observations, load_kg, set_count, rep_count, created_at
+        FROM (
+          SELECT h.*, row_number() OVER (PARTITION BY h.exercise_id ORDER BY h.date DESC, h.id DESC) AS position
+          FROM json_each(:p_exercise_ids) e
+          JOIN exercise_history h ON h.exercise_id = e.value
+          WHERE h.user_id = :p_user_id
+        )
+        WHERE position <= :p_limit
+        ORDER BY exercise_id, date DESC, id DESC
+    """, "exercise_history", ()),
+}
+
+
+def function_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    # Arrays dos parâmetros (UUID[] no Postgres) chegam às funções como JSON, lidos com json_each
+    return {name: json.dumps(value) if isinstance(value, (list, tuple)) else value for name, value in params.items()}
+
+
+def hash_password(password: str) -> str:
+    salt = secrets.token_hex(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), bytes.fromhex(salt), PASSWORD_ITERATIONS)
+    return f"pbkdf2_sha256${PASSWORD_ITERATIONS}${salt}${digest.hex()}"
+
+
+def check_password(password: str, stored: str) -> bool:
+    _scheme, iterations, salt, expected = stored.split("$")
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), bytes.fromhex(salt), int(iterations))
+    return hmac.compare_digest(digest.hex(), expected)
+
+
+def new_ids(count: int) -> List[str]:
+    # uuid4 em lote: uma leitura de os.urandom para o lote inteiro em vez de uma por linha
+    data = os.urandom(16 * count)
+    return [str(uuid.UUID(bytes=data[i:i + 16], version=4)) for i in range(0, len(data), 16)]
+
+
+def quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+class SQLiteDatabase(Database):
+    """Repositório em SQLite embutido, com o mesmo esquema das tabelas do Supabase.
+
+    Serve para rodar a API e os testes de carga sem rede. Cada thread do pool
+    tem sua própria conexão (WAL permite leituras concorrentes); com `:memory:`
+    o pool é reduzido a uma thread para que todos vejam o mesmo banco.
+    Os tokens de acesso são JWTs HS256 no mesmo formato dos do Supabase Auth.
+    """
+
+    def __init__(
+        self,
+        path: str = "personalhub.db",
+        jwt_secret: str = "",
+        issuer_url: str = "http://localhost",
+        pool_size: int = 4,
+        token_ttl: int = 3600,
+        busy_timeout: float = 5.0,
+    ):
+        self.path = path
+        self.jwt_secret = jwt_secret
+        self.issuer = f"{issuer_url.rstrip('/')}/auth/v1"
+        self.pool_size = 1 if path == ":memory:" else pool_size
+        self.token_ttl = token_ttl
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        # O SQLite aceita um escritor por vez, e quem perde o BEGIN IMMEDIATE dorme no busy handler
+        # com espera crescente: sob carga, uma thread chegava a esperar mais de 1 s. Aqui elas fazem fila
+        self._write_lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._json_columns: Dict[str, set] = {}
+        self._bool_columns: Dict[str, set] = {}
+
+    def start(self) -> None:
+        if self._executor is not None:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="sqlite")
+        self._executor.submit(self._migrate).result()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+        self._executor = None
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        if self._executor is None:
+            self.start()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA foreign_keys = ON")
+            if self.path != ":memory:":
+                conn.execute("PRAGMA journal_mode = WAL")
+                conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _migrate(self) -> None:
+        conn = self._connection()
+        conn.executescript(SCHEMA_PATH.read_text())
+        tables = [r["name"] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        for table in tables:
+            info = conn.execute(f"PRAGMA table_info({quote(table)})").fetchall()
+            self._json_columns[table] = {c["name"] for c in info if c["type"].upper() in ("JSON", "JSONB")}
+            self._bool_columns[table] = {c["name"] for c in info if c["type"].upper() == "BOOLEAN"}
+
+    # Conversão entre tipos do Postgres e do SQLite
+    def _encode(self, table: str, row: dict) -> dict:
+        json_columns = self._json_columns.get(table, ())
+        return {
+            k: json.dumps(v) if k in json_columns and v is not None else v
+            for k, v in row.items()
+        }
+
+    def _decode(self, table: str, row: sqlite3.Row) -> dict:
+        data = dict(row)
+        for column in self._json_columns.get(table, ()):
+            if data.get(column) is not None:
+                data[column] = json.loads(data[column])
+        for column in self._bool_columns.get(table, ()):
+            if data.get(column) is not None:
+                data[column] = bool(data[column])
+        return data
+
+    @staticmethod
+    def _where(filters: Dict[str, Any]) -> Tuple[List[str], List[Any]]:
+        clauses, params = [], []
+        for column, value in filters.items():
+            if isinstance(value, (list, tuple, set)):
+                values = list(value)
+                if not values:
+                    clauses.append("0")
+                    continue
+                clauses.append(f"{quote(column)} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+            elif value is None:
+                clauses.append(f"{quote(column)} IS NULL")
+            else:
+                clauses.append(f"{quote(column)} = ?")
+                params.append(value)
+        return clauses, params
+
+    def _execute(self, table: str, sql: str, params: Any) -> List[dict]:
+        cursor = self._connection().execute(sql, params)
+        return [self._decode(table, row) for row in cursor.fetchall()]
+
+    def _write(self, table: str, statements: List[Tuple[str, List[Any]]]) -> List[dict]:
+        conn = self._connection()
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = [row for sql, params in statements for row in conn.execute(sql, params).fetchall()]
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return [self._decode(table, row) for row in rows]
+
+    async def select(
+        self,
+        table: str,
+        filters: Dict[str, Any],
+        order: Order = (),
+        columns: str = "*",
+        limit: Optional[int] = None,
+        after: Optional[Tuple[Any, Any]] = None,
+        ranges: Optional[Dict[str, Tuple[Any, Any]]] = None,
+    ) -> List[dict]:
+        projection = "*" if columns == "*" else ", ".join(quote(c.strip()) for c in columns.split(","))
+        clauses, params = self._where(filters)
+        for column, (low, high) in (ranges or {}).items():
+            if low is not None:
+                clauses.append(f"{quote(column)} >= ?")
+                params.append(low)
+            if high is not None:
+                clauses.append(f"{quote(column)} <= ?")
+                params.append(high)
+        if after is not None:
+            column, desc = order[0]
+            op = "<" if desc else ">"
+            clauses.append(f"({quote(column)}, id) {op} (?, ?)")
+            params.extend(after)
+        sql = f"SELECT {projection} FROM {quote(table)}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        if order:
+            # Postgres ordena NULL como o maior valor
+            sql += " ORDER BY " + ", ".join(
+                f"{quote(c)} IS NULL {'DESC' if desc else 'ASC'}, {quote(c)} {'DESC' if desc else 'ASC'}"
+                for c, desc in order
+            )
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return await self.run(self._execute, table, sql, params)
+
+    def _insert_statement(self, table: str, row: dict, conflict: str = "") -> Tuple[str, List[Any]]:
+        row = self._encode(table, row)
+        columns = ", ".join(quote(c) for c in row)
+        sql = f"INSERT INTO {quote(table)} ({columns}) VALUES ({', '.join('?' * len(row))}){conflict} RETURNING *"
+        return sql, list(row.values())
+
+    def _insert(self, table: str, rows: List[dict], conflicts: List[str]) -> List[dict]:
+        # Monta os INSERTs já na thread do pool: os.urandom solta o GIL, e no event loop
+        # cada id gerado custava uma troca de thread com as escritas em andamento
+        ids = iter(new_ids(sum(1 for row in rows if not row.get("id"))))
+        return self._write(table, [
+            self._insert_statement(table, row if row.get("id") else {"id": next(ids), **row}, conflict)
+            for row, conflict in zip(rows, conflicts)
+        ])
+
+    async def insert(self, table: str, rows: Any) -> List[dict]:
+        rows = [rows] if isinstance(rows, dict) else rows
+        return await self.run(self._insert, table, rows, [""] * len(rows))
+
+    async def upsert(self, table: str, rows: List[dict], on_conflict: str = "id", ignore_duplicates: bool = False) -> List[dict]:
+        conflicts = []
+        for row in rows:
+            updates = [] if ignore_duplicates else [c for c in row if c != on_conflict]
+            conflicts.append(f" ON CONFLICT ({quote(on_conflict)}) DO " + (
+                "UPDATE SET " + ", ".join(f"{quote(c)} = excluded.{quote(c)}" for c in updates)
+                if updates else "NOTHING"
+            ))
+        return await self.run(self._insert, table, rows, conflicts)
+
+    async def update(self, table: str, values: dict, filters: Dict[str, Any]) -> List[dict]:
+        values = self._encode(table, values)
+        clauses, params = self._where(filters)
+        sql = f"UPDATE {quote(table)} SET " + ", ".join(f"{quote(c)} = ?" for c in values)
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        return await self.run(self._write, table, [(sql + " RETURNING *", list(values.values()) + params)])
+
+    async def delete(self, table: str, filters: Dict[str, Any]) -> List[dict]:
+        clauses, params = self._where(filters)
+        sql = f"DELETE FROM {quote(table)}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        return await self.run(self._write, table, [(sql + " RETURNING *", params)])
+
+    async def rpc(self, function: str, params: Dict[str, Any]) -> List[dict]:
+        sql, table, booleans = FUNCTIONS[function]
+        rows = await self.run(self._execute, table, sql, function_params(params))
+        for row in rows:
+            for column in booleans:
+                row[column] = bool(row[column])
+        return rows
+
+    async def ping(self) -> None:
+        await self.run(self._execute, "users", "SELECT 1", [])
+
+    # Autenticação local
+    def _issue_token(self, user_id: str, email: str) -> str:
+        now = int(time.time())
+        claims = {
+            "sub": user_id,
+            "email": email,
+            "aud": "authenticated",
+            "role": "authenticated",
+            "iss": self.issuer,
+            "iat": now,
+            "exp": now + self.token_ttl,
+        }
+        return jwt.encode(claims, self.jwt_secret, algorithm="HS256")
+
+    async def sign_in(self, email: str, password: str) -> Optional[Tuple[str, str]]:
+        users = await self.select("users", {"email": email})
+        if not users or not await self.run(check_password, password, users[0]["password_hash"]):
+            return None
+        return self._issue_token(users[0]["id"], email), users[0]["id"]
+
+    async def sign_out(self) -> None:
+        # Tokens são stateless; a sessão termina com a invalidação no TokenVerifier
+        return None
+
+    def get_user_id(self, token: str) -> Optional[str]:
+        try:
+            claims = jwt.decode(token, self.jwt_secret, algorithms=["HS256"], audience="authenticated", issuer=self.issuer)
+        except JWTError:
+            return None
+        rows = self._execute("users", "SELECT id FROM users WHERE id = ?", [claims.get("sub")])
+        return rows[0]["id"] if rows else None
+
+    async def create_user(self, email: str, password: str) -> str:
+        password_hash = await self.run(hash_password, password)
+        rows = await self.insert("users", {"email": email, "password_hash": password_hash})
+        return rows[0]["id"]
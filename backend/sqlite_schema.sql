@@ -0,0 +1,129 @@
+-- Esquema do backend SQLite (DB_BACKEND=sqlite)
+-- Espelha SETUP_SUPABASE.sql, UPDATE_DATABASE.sql, LANDING_PAGE_DB.sql e migrations/.
+-- Ids UUID são gerados pela aplicação; datas ficam em texto ISO 8601.
+
+CREATE TABLE IF NOT EXISTS users (
+  id TEXT PRIMARY KEY,
+  email TEXT NOT NULL UNIQUE,
+  password_hash TEXT NOT NULL,
+  created_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS students (
+  id TEXT PRIMARY KEY,
+  user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  name TEXT NOT NULL,
+  age INTEGER,
+  goal TEXT,
+  observations TEXT,
+  initial_weight DECIMAL(5,2),
+  height DECIMAL(5,2),
+  created_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+  updated_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS workouts (
+  id TEXT PRIMARY KEY,
+  user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  student_id TEXT NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+  name TEXT NOT NULL,
+  date DATE,
+  created_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+  updated_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS exercises (
+  id TEXT PRIMARY KEY,
+  user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  workout_id TEXT NOT NULL REFERENCES workouts(id) ON DELETE CASCADE,
+  name TEXT NOT NULL,
+  sets INTEGER,
+  reps TEXT,
+  weight TEXT,
+  rest TEXT,
+  created_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS exercise_history (
+  id TEXT PRIMARY KEY,
+  user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  exercise_id TEXT NOT NULL REFERENCES exercises(id) ON DELETE CASCADE,
+  date DATE NOT NULL,
+  weight TEXT,
+  sets INTEGER,
+  reps TEXT,
+  observations TEXT,
+  load_kg NUMERIC(7,2),
+  set_count INTEGER,
+  rep_count NUMERIC(6,2),
+  created_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS cardio (
+  id TEXT PRIMARY KEY,
+  user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  student_id TEXT NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+  equipment TEXT NOT NULL,
+  duration INTEGER,
+  intensity TEXT,
+  observations TEXT,
+  date DATE DEFAULT CURRENT_DATE,
+  created_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS evolution (
+  id TEXT PRIMARY KEY,
+  user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  student_id TEXT NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+  date DATE NOT NULL,
+  current_weight DECIMAL(5,2),
+  observations TEXT,
+  performance TEXT,
+  created_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS weekly_routine (
+  id TEXT PRIMARY KEY,
+  user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  student_id TEXT NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+  day_of_week INTEGER NOT NULL CHECK (day_of_week >= 0 AND day_of_week <= 6),
+  workout_name TEXT NOT NULL,
+  exercises JSONB,
+  created_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+  updated_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS purchase_tokens (
+  id TEXT PRIMARY KEY,
+  token TEXT NOT NULL UNIQUE,
+  email TEXT NOT NULL,
+  plan_type TEXT NOT NULL,
+  stripe_session_id TEXT,
+  used BOOLEAN DEFAULT FALSE,
+  expires_at TIMESTAMPTZ NOT NULL,
+  created_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_purchase_tokens_token ON purchase_tokens(token);
+CREATE INDEX IF NOT EXISTS idx_purchase_tokens_email ON purchase_tokens(email);
+
+CREATE INDEX IF NOT EXISTS idx_weekly_routine_user_day ON weekly_routine(user_id, day_of_week);
+CREATE INDEX IF NOT EXISTS idx_workouts_user_date ON workouts(user_id, date);
+CREATE INDEX IF NOT EXISTS idx_exercise_history_user_date ON exercise_history(user_id, date);
+
+CREATE INDEX IF NOT EXISTS idx_students_user_created ON students(user_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_workouts_student_created ON workouts(student_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_workouts_user_created ON workouts(user_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_exercises_workout_created ON exercises(workout_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_exercises_user_created ON exercises(user_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_exercise_history_exercise_date ON exercise_history(exercise_id, date, id);
+CREATE INDEX IF NOT EXISTS idx_exercise_history_user_created ON exercise_history(user_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_cardio_student_created ON cardio(student_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_cardio_user_created ON cardio(user_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_evolution_student_date ON evolution(student_id, date, id);
+CREATE INDEX IF NOT EXISTS idx_evolution_user_created ON evolution(user_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_weekly_routine_student_day ON weekly_routine(student_id, day_of_week);
+CREATE INDEX IF NOT EXISTS idx_weekly_routine_user_created ON weekly_routine(user_id, created_at, id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_purchase_tokens_session ON purchase_tokens(stripe_session_id);
+CREATE INDEX IF NOT EXISTS idx_purchase_tokens_expires ON purchase_tokens(expires_at) WHERE used = false;
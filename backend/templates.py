@@ -0,0 +1,74 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+EXERCISE_COLUMNS = ("name", "sets", "reps", "weight", "rest")
+ROUTINE_COLUMNS = ("day_of_week", "workout_name", "exercises")
+
+# Máximo de ids por filtro IN, para a URL do PostgREST não crescer sem limite
+ID_CHUNK_SIZE = 100
+
+
+def chunks(items: Sequence, size: int) -> Iterator[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def unique(ids: Sequence[str]) -> List[str]:
+    return list(dict.fromkeys(ids))
+
+
+def timestamps(count: int) -> List[str]:
+    # Um INSERT multi-linha daria o mesmo created_at a todas as linhas; espaçar
+    # por 1 µs mantém a ordem original nas listas ordenadas por created_at
+    start = datetime.now(timezone.utc)
+    return [(start + timedelta(microseconds=i)).isoformat() for i in range(count)]
+
+
+def clone_workout(
+    workout: dict,
+    exercises: List[dict],
+    student_ids: List[str],
+    user_id: str,
+    name: Optional[str] = None,
+    date: Optional[str] = None,
+) -> Tuple[List[dict], List[dict]]:
+    """Linhas de treinos e exercícios para copiar `workout` para cada aluno.
+
+    Os ids são gerados aqui para que os exercícios de todos os alunos entrem
+    num único INSERT, sem esperar o retorno dos treinos.
+    """
+    created_at = timestamps(len(exercises))
+    workouts, copies = [], []
+    for student_id in student_ids:
+        workout_id = str(uuid.uuid4())
+        workouts.append({
+            "id": workout_id,
+            "user_id": user_id,
+            "student_id": student_id,
+            "name": name or workout["name"],
+            "date": date if date is not None else workout.get("date"),
+        })
+        for exercise, stamp in zip(exercises, created_at):
+            copies.append({
+                "id": str(uuid.uuid4()),
+                "user_id": user_id,
+                "workout_id": workout_id,
+                "created_at": stamp,
+                **{column: exercise.get(column) for column in EXERCISE_COLUMNS},
+            })
+    return workouts, copies
+
+
+def clone_routine(routine: List[dict], student_ids: List[str], user_id: str) -> List[dict]:
+    """Linhas da rotina semanal (com o JSON de exercícios de cada dia) para cada aluno."""
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "student_id": student_id,
+            **{column: day.get(column) for column in ROUTINE_COLUMNS},
+        }
+        for student_id in student_ids
+        for day in routine
+    ]
@@ -0,0 +1,189 @@
+import codecs
+import csv
+import io
+import json
+import uuid
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Type
+
+from pydantic import BaseModel, ValidationError
+
+# Ordem de exportação/importação: pais antes dos filhos
+TABLES = ["students", "workouts", "exercises", "exercise_history", "cardio", "evolution", "weekly_routine"]
+
+# Tabela -> {coluna de FK: tabela referenciada}
+FOREIGN_KEYS = {
+    "workouts": {"student_id": "students"},
+    "exercises": {"workout_id": "workouts"},
+    "exercise_history": {"exercise_id": "exercises"},
+    "cardio": {"student_id": "students"},
+    "evolution": {"student_id": "students"},
+    "weekly_routine": {"student_id": "students"},
+}
+
+MAX_REPORTED_ERRORS = 100
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Quebra o corpo da requisição em linhas à medida que os bytes chegam."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def iter_csv_records(lines: AsyncIterator[str]) -> AsyncIterator[List[str]]:
+    """Registros CSV; um campo entre aspas pode atravessar várias linhas."""
+    pending = ""
+    async for line in lines:
+        pending += line
+        if pending.count('"') % 2:
+            continue
+        record = next(csv.reader([pending]), None)
+        pending = ""
+        if record:
+            yield record
+    if pending:
+        record = next(csv.reader([pending]), None)
+        if record:
+            yield record
+
+
+def csv_value(value: str) -> Any:
+    if value == "":
+        return None
+    if value[:1] in "[{":
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return value
+
+
+def ndjson_line(table: str, row: dict) -> str:
+    return json.dumps({"table": table, "row": row}, ensure_ascii=False, default=str) + "\n"
+
+
+def csv_line(values: List[Any]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(
+        json.dumps(v, ensure_ascii=False) if isinstance(v, (list, dict)) else ("" if v is None else v)
+        for v in values
+    )
+    return buffer.getvalue()
+
+
+class ImportReport:
+    def __init__(self, dry_run: bool):
+        self.dry_run = dry_run
+        self.received: Dict[str, int] = {table: 0 for table in TABLES}
+        self.imported: Dict[str, int] = {table: 0 for table in TABLES}
+        self.errors: List[dict] = []
+        self.error_count = 0
+
+    def error(self, line: int, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def to_dict(self) -> dict:
+        return {
+            "dry_run": self.dry_run,
+            "received": self.received,
+            "imported": self.imported,
+            "error_count": self.error_count,
+            "errors": self.errors,
+        }
+
+
+class Importer:
+    """Valida linhas exportadas e as grava em lotes multi-linha.
+
+    Cada linha recebe um id novo; as FKs são reescritas para os ids gerados,
+    então importar o mesmo arquivo duas vezes cria uma cópia em vez de colidir.
+    """
+
+    def __init__(
+        self,
+        user_id: str,
+        models: Dict[str, Type[BaseModel]],
+        insert: Callable[[str, List[dict]], Awaitable[List[dict]]],
+        prepare: Optional[Callable[[str, dict], dict]] = None,
+        batch_size: int = 500,
+        dry_run: bool = False,
+    ):
+        self.user_id = user_id
+        self.models = models
+        self.insert = insert
+        self.prepare = prepare
+        self.batch_size = batch_size
+        self.report = ImportReport(dry_run)
+        self._id_map: Dict[str, Dict[str, str]] = {table: {} for table in TABLES}
+        self._buffers: Dict[str, List[dict]] = {table: [] for table in TABLES}
+        self._rejected: Dict[str, set] = {table: set() for table in TABLES}
+
+    async def add(self, line_number: int, table: str, row: dict) -> None:
+        if table not in self.models:
+            self.report.error(line_number, f"Tabela desconhecida: {table}")
+            return
+        self.report.received[table] += 1
+        try:
+            data = self.models[table](**row).model_dump()
+        except ValidationError as e:
+            first = e.errors()[0]
+            self.report.error(line_number, f"{table}.{'.'.join(map(str, first['loc']))}: {first['msg']}")
+            self._reject(table, row)
+            return
+
+        for column, parent in FOREIGN_KEYS.get(table, {}).items():
+            old = data.get(column)
+            if old in self._rejected[parent]:
+                self.report.error(line_number, f"{table}: {column} aponta para um registro rejeitado")
+                self._reject(table, row)
+                return
+            # Referências fora do arquivo são mantidas como estão
+            data[column] = self._id_map[parent].get(old, old)
+
+        new_id = str(uuid.uuid4())
+        if row.get("id"):
+            self._id_map[table][row["id"]] = new_id
+        data["id"] = new_id
+        data["user_id"] = self.user_id
+        # Todas as linhas do lote precisam das mesmas colunas no INSERT multi-linha
+        data["created_at"] = row.get("created_at") or datetime.now(timezone.utc).isoformat()
+        if self.prepare is not None:
+            data = self.prepare(table, data)
+
+        if self.report.dry_run:
+            self.report.imported[table] += 1
+            return
+        self._buffers[table].append(data)
+        if len(self._buffers[table]) >= self.batch_size:
+            await self.flush(table)
+
+    def _reject(self, table: str, row: dict) -> None:
+        if row.get("id"):
+            self._rejected[table].add(row["id"])
+
+    async def flush(self, table: str) -> None:
+        # Os pais precisam existir antes do INSERT dos filhos
+        for parent in FOREIGN_KEYS.get(table, {}).values():
+            await self.flush(parent)
+        rows = self._buffers[table]
+        if not rows:
+            return
+        self._buffers[table] = []
+        inserted = await self.insert(table, rows)
+        self.report.imported[table] += len(inserted)
+
+    async def finish(self) -> dict:
+        if not self.report.dry_run:
+            for table in TABLES:
+                await self.flush(table)
+        return self.report.to_dict()
@@ -6,10 +6,13 @@ import { Input } from '@/components/ui/input'
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@/components/ui/select'
 import { toast } from 'sonner'
 import { Plus, Dumbbell, Trash2 } from 'lucide-react'
+import { applyRowChange, useChangeFeed } from '@/hooks/use-change-feed'
 import axios from 'axios'
 
 const API = `${process.env.REACT_APP_BACKEND_URL}/api`
 
+const BY_DAY = { key: 'day_of_week', desc: false }
+
 const DAYS = [
   { value: 0, label: 'Domingo', short: 'DOM' },
   { value: 1, label: 'Segunda', short: 'SEG' },
@@ -20,17 +23,34 @@ const DAYS = [
   { value: 6, label: 'Sábado', short: 'SÁB' },
 ]
 
-export function WeeklyRoutine({ studentId, workouts, onExerciseClick }) {
+// `initialRoutine` é a rotina que já veio em GET /students/{id}/profile: com ela, o
+// componente não busca /weekly-routine; sem ela (aberto sozinho), carrega por conta própria
+export function WeeklyRoutine({ studentId, workouts, onExerciseClick, initialRoutine }) {
   const { session } = useAuth()
-  const [routine, setRoutine] = useState([])
+  const [routine, setRoutine] = useState(initialRoutine ?? [])
   const [showAddRoutine, setShowAddRoutine] = useState(false)
   const [selectedDay, setSelectedDay] = useState(null)
   const [newRoutine, setNewRoutine] = useState({ workout_name: '', day_of_week: 1 })
-  const [loading, setLoading] = useState(true)
+  const [loading, setLoading] = useState(!initialRoutine)
 
   useEffect(() => {
-    loadRoutine()
-  }, [studentId])
+    if (initialRoutine) {
+      setRoutine(initialRoutine)
+      setLoading(false)
+    } else {
+      loadRoutine()
+    }
+  }, [studentId, initialRoutine])
+
+  // Com a rotina do perfil, um reset do stream recarrega o perfil, que traz a rotina nova
+  useChangeFeed(session?.access_token, applyChange, initialRoutine ? undefined : loadRoutine)
+
+  function applyChange({ table, op, row }) {
+    if (table !== 'weekly_routine') return
+    // Num update o item pode ter mudado de aluno: sai desta rotina
+    const change = row.student_id === studentId ? op : 'delete'
+    setRoutine((prev) => applyRowChange(prev, change, row, BY_DAY))
+  }
 
   async function loadRoutine() {
     try {
@@ -48,7 +68,7 @@ export function WeeklyRoutine({ studentId, workouts, onExerciseClick }) {
   async function handleAddRoutine(e) {
     e.preventDefault()
     try {
-      await axios.post(
+      const response = await axios.post(
         `${API}/weekly-routine`,
         {
           student_id: studentId,
@@ -60,7 +80,7 @@ export function WeeklyRoutine({ studentId, workouts, onExerciseClick }) {
       toast.success('Treino adicionado à rotina!')
       setShowAddRoutine(false)
       setNewRoutine({ workout_name: '', day_of_week: 1 })
-      loadRoutine()
+      applyChange({ table: 'weekly_routine', op: 'insert', row: response.data })
     } catch (error) {
       console.error('Erro ao adicionar rotina:', error)
       toast.error('Erro ao adicionar rotina')
@@ -73,7 +93,7 @@ export function WeeklyRoutine({ studentId, workouts, onExerciseClick }) {
         headers: { Authorization: `Bearer ${session?.access_token}` },
       })
       toast.success('Treino removido da rotina!')
-      loadRoutine()
+      applyChange({ table: 'weekly_routine', op: 'delete', row: { id: routineId, student_id: studentId } })
     } catch (error) {
       console.error('Erro ao excluir rotina:', error)
       toast.error('Erro ao excluir rotina')
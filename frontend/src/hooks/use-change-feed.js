@@ -0,0 +1,112 @@
+import { useEffect, useRef } from 'react'
+
+const API = `${process.env.REACT_APP_BACKEND_URL}/api`
+const MAX_RETRY_DELAY = 30000
+
+// Aplica um evento {op, row} a uma lista ordenada; repetir o mesmo evento não muda nada
+export function applyRowChange(list, op, row, { key = 'created_at', desc = true } = {}) {
+  const rest = list.filter((item) => item.id !== row.id)
+  if (op === 'delete') return rest.length === list.length ? list : rest
+  const previous = list.find((item) => item.id === row.id)
+  const next = [...rest, previous ? { ...previous, ...row } : row]
+  return next.sort((a, b) => {
+    const x = a[key] ?? ''
+    const y = b[key] ?? ''
+    if (x === y) return 0
+    return (x < y ? -1 : 1) * (desc ? -1 : 1)
+  })
+}
+
+function parseEvent(block) {
+  const event = { type: 'message', id: null, data: '' }
+  for (const line of block.split('\n')) {
+    if (!line || line.startsWith(':')) continue
+    const index = line.indexOf(':')
+    const field = index === -1 ? line : line.slice(0, index)
+    const value = index === -1 ? '' : line.slice(index + 1).replace(/^ /, '')
+    if (field === 'event') event.type = value
+    else if (field === 'id') event.id = value
+    else if (field === 'data') event.data += value
+  }
+  return event
+}
+
+// Uma conexão por token, compartilhada por todos os componentes montados
+const feeds = new Map()
+
+function openFeed(token, listeners) {
+  const controller = new AbortController()
+  let cursor = null
+  let delay = 1000
+  let timer = null
+
+  async function connect() {
+    try {
+      const query = cursor ? `?since=${encodeURIComponent(cursor)}` : ''
+      const response = await fetch(`${API}/changes/stream${query}`, {
+        headers: { Authorization: `Bearer ${token}`, Accept: 'text/event-stream' },
+        signal: controller.signal,
+      })
+      if (!response.ok) throw new Error(`HTTP ${response.status}`)
+      const reader = response.body.pipeThrough(new TextDecoderStream()).getReader()
+      let buffer = ''
+      for (;;) {
+        const { value, done } = await reader.read()
+        if (done) break
+        buffer += value
+        let end
+        while ((end = buffer.indexOf('\n\n')) !== -1) {
+          const event = parseEvent(buffer.slice(0, end))
+          buffer = buffer.slice(end + 2)
+          if (event.type === 'reset') {
+            cursor = null
+            listeners.forEach((handlers) => handlers.current.onReset?.())
+            continue
+          }
+          if (event.id) cursor = event.id
+          if (event.type === 'ready') delay = 1000
+          if (event.type === 'change') {
+            const change = JSON.parse(event.data)
+            listeners.forEach((handlers) => handlers.current.onChange(change))
+          }
+        }
+      }
+    } catch (error) {
+      if (controller.signal.aborted) return
+      console.error('Erro no stream de alterações:', error)
+    }
+    if (controller.signal.aborted) return
+    timer = setTimeout(connect, delay)
+    delay = Math.min(delay * 2, MAX_RETRY_DELAY)
+  }
+
+  connect()
+  return () => {
+    controller.abort()
+    clearTimeout(timer)
+  }
+}
+
+// Assina /api/changes/stream; onChange recebe {table, op, row} e onReset pede um recarregamento completo
+export function useChangeFeed(token, onChange, onReset) {
+  const handlers = useRef({ onChange, onReset })
+  handlers.current = { onChange, onReset }
+
+  useEffect(() => {
+    if (!token) return undefined
+    let feed = feeds.get(token)
+    if (!feed) {
+      const listeners = new Set()
+      feed = { listeners, close: openFeed(token, listeners) }
+      feeds.set(token, feed)
+    }
+    feed.listeners.add(handlers)
+    return () => {
+      feed.listeners.delete(handlers)
+      if (feed.listeners.size === 0) {
+        feed.close()
+        feeds.delete(token)
+      }
+    }
+  }, [token])
+}
@@ -10,10 +10,16 @@ import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@
 import { toast } from 'sonner'
 import { ArrowLeft, Plus, Dumbbell, Activity, TrendingUp, Trash2, Calendar } from 'lucide-react'
 import { WeeklyRoutine } from '@/components/WeeklyRoutine'
+import { applyRowChange, useChangeFeed } from '@/hooks/use-change-feed'
 import axios from 'axios'
 
 const API = `${process.env.REACT_APP_BACKEND_URL}/api`
 
+// Mesma ordenação das listas devolvidas pela API
+const NEWEST_FIRST = { key: 'created_at', desc: true }
+const BY_DATE = { key: 'date', desc: true }
+const OLDEST_FIRST = { key: 'created_at', desc: false }
+
 export function StudentProfile() {
   const { id } = useParams()
   const navigate = useNavigate()
@@ -22,6 +28,7 @@ export function StudentProfile() {
   const [workouts, setWorkouts] = useState([])
   const [cardios, setCardios] = useState([])
   const [evolutions, setEvolutions] = useState([])
+  const [weeklyRoutine, setWeeklyRoutine] = useState(null)
   const [loading, setLoading] = useState(true)
 
   const [showAddWorkout, setShowAddWorkout] = useState(false)
@@ -49,19 +56,60 @@ export function StudentProfile() {
   const [newHistory, setNewHistory] = useState({ date: new Date().toISOString().split('T')[0], weight: '', sets: '', reps: '', observations: '' })
 
   useEffect(() => {
-    loadStudent()
-    loadWorkouts()
-    loadCardios()
-    loadEvolutions()
+    loadProfile()
   }, [id])
 
-  async function loadStudent() {
+  // Alterações feitas aqui ou em outra aba chegam pelo stream; um reset recarrega o perfil
+  useChangeFeed(session?.access_token, applyChange, loadProfile)
+
+  function applyChange({ table, op, row }) {
+    if (table === 'students') {
+      if (row.id !== id) return
+      if (op === 'delete') {
+        navigate('/dashboard')
+        return
+      }
+      setStudent((prev) => ({ ...prev, ...row }))
+    } else if (table === 'workouts') {
+      if (row.student_id !== id) return
+      setWorkouts((prev) => applyRowChange(prev, op, op === 'insert' ? { exercises: [], ...row } : row, NEWEST_FIRST))
+    } else if (table === 'cardio') {
+      if (row.student_id !== id) return
+      setCardios((prev) => applyRowChange(prev, op, row, NEWEST_FIRST))
+    } else if (table === 'evolution') {
+      if (row.student_id !== id) return
+      setEvolutions((prev) => applyRowChange(prev, op, row, BY_DATE))
+    } else if (table === 'exercises') {
+      setWorkouts((prev) =>
+        prev.map((w) => {
+          if (!w.exercises) return w
+          // Num update o exercício pode ter mudado de treino: sai dos outros
+          const change = w.id === row.workout_id ? op : 'delete'
+          const exercises = applyRowChange(w.exercises, change, row, OLDEST_FIRST)
+          return exercises === w.exercises ? w : { ...w, exercises }
+        })
+      )
+      if (row.workout_id === selectedWorkout) {
+        setExercises((prev) => applyRowChange(prev, op, row, OLDEST_FIRST))
+      } else if (op !== 'insert') {
+        setExercises((prev) => applyRowChange(prev, 'delete', row, OLDEST_FIRST))
+      }
+    } else if (table === 'exercise_history') {
+      if (row.exercise_id !== selectedExercise) return
+      setExerciseHistory((prev) => applyRowChange(prev, op, row, BY_DATE))
+    }
+  }
+
+  async function loadProfile() {
     try {
-      const response = await axios.get(`${API}/students`, {
+      const response = await axios.get(`${API}/students/${id}/profile`, {
         headers: { Authorization: `Bearer ${session?.access_token}` },
       })
-      const foundStudent = response.data.find((s) => s.id === id)
-      setStudent(foundStudent)
+      setStudent(response.data.student)
+      setWorkouts(response.data.workouts)
+      setCardios(response.data.cardio)
+      setEvolutions(response.data.evolution)
+      setWeeklyRoutine(response.data.weekly_routine)
     } catch (error) {
       console.error('Erro ao carregar aluno:', error)
       toast.error('Erro ao carregar dados do aluno')
@@ -70,45 +118,13 @@ export function StudentProfile() {
     }
   }
 
-  async function loadWorkouts() {
-    try {
-      const response = await axios.get(`${API}/workouts?student_id=${id}`, {
-        headers: { Authorization: `Bearer ${session?.access_token}` },
-      })
-      setWorkouts(response.data)
-    } catch (error) {
-      console.error('Erro ao carregar treinos:', error)
-    }
-  }
-
-  async function loadCardios() {
-    try {
-      const response = await axios.get(`${API}/cardio?student_id=${id}`, {
-        headers: { Authorization: `Bearer ${session?.access_token}` },
-      })
-      setCardios(response.data)
-    } catch (error) {
-      console.error('Erro ao carregar cardios:', error)
-    }
-  }
-
-  async function loadEvolutions() {
-    try {
-      const response = await axios.get(`${API}/evolution?student_id=${id}`, {
-        headers: { Authorization: `Bearer ${session?.access_token}` },
-      })
-      setEvolutions(response.data)
-    } catch (error) {
-      console.error('Erro ao carregar evoluções:', error)
-    }
-  }
-
   async function loadExercises(workoutId) {
     try {
       const response = await axios.get(`${API}/exercises?workout_id=${workoutId}`, {
         headers: { Authorization: `Bearer ${session?.access_token}` },
       })
       setExercises(response.data)
+      setWorkouts((prev) => prev.map((w) => (w.id === workoutId ? { ...w, exercises: response.data } : w)))
     } catch (error) {
       console.error('Erro ao carregar exercícios:', error)
     }
@@ -128,7 +144,7 @@ export function StudentProfile() {
   async function handleAddWorkout(e) {
     e.preventDefault()
     try {
-      await axios.post(
+      const response = await axios.post(
         `${API}/workouts`,
         { ...newWorkout, student_id: id },
         { headers: { Authorization: `Bearer ${session?.access_token}` } }
@@ -136,7 +152,7 @@ export function StudentProfile() {
       toast.success('Treino adicionado ao histórico!')
       setShowAddWorkout(false)
       setNewWorkout({ name: '', date: new Date().toISOString().split('T')[0] })
-      loadWorkouts()
+      applyChange({ table: 'workouts', op: 'insert', row: response.data })
     } catch (error) {
       console.error('Erro ao adicionar treino:', error)
       toast.error('Erro ao adicionar treino')
@@ -146,7 +162,7 @@ export function StudentProfile() {
   async function handleAddExercise(e) {
     e.preventDefault()
     try {
-      await axios.post(
+      const response = await axios.post(
         `${API}/exercises`,
         {
           ...newExercise,
@@ -157,7 +173,7 @@ export function StudentProfile() {
       )
       toast.success('Exercício adicionado!')
       setNewExercise({ name: '', sets: '', reps: '', weight: '', rest: '' })
-      loadExercises(selectedWorkout)
+      applyChange({ table: 'exercises', op: 'insert', row: response.data })
     } catch (error) {
       console.error('Erro ao adicionar exercício:', error)
       toast.error('Erro ao adicionar exercício')
@@ -170,7 +186,7 @@ export function StudentProfile() {
         headers: { Authorization: `Bearer ${session?.access_token}` },
       })
       toast.success('Exercício excluído!')
-      loadExercises(selectedWorkout)
+      applyChange({ table: 'exercises', op: 'delete', row: { id: exerciseId, workout_id: selectedWorkout } })
     } catch (error) {
       console.error('Erro ao excluir exercício:', error)
       toast.error('Erro ao excluir exercício')
@@ -180,7 +196,7 @@ export function StudentProfile() {
   async function handleAddCardio(e) {
     e.preventDefault()
     try {
-      await axios.post(
+      const response = await axios.post(
         `${API}/cardio`,
         {
           ...newCardio,
@@ -198,7 +214,7 @@ export function StudentProfile() {
         observations: '',
         date: new Date().toISOString().split('T')[0]
       })
-      loadCardios()
+      applyChange({ table: 'cardio', op: 'insert', row: response.data })
     } catch (error) {
       console.error('Erro ao adicionar cardio:', error)
       toast.error('Erro ao adicionar cardio')
@@ -211,7 +227,7 @@ export function StudentProfile() {
         headers: { Authorization: `Bearer ${session?.access_token}` },
       })
       toast.success('Cardio excluído!')
-      loadCardios()
+      applyChange({ table: 'cardio', op: 'delete', row: { id: cardioId, student_id: id } })
     } catch (error) {
       console.error('Erro ao excluir cardio:', error)
       toast.error('Erro ao excluir cardio')
@@ -221,7 +237,7 @@ export function StudentProfile() {
   async function handleAddEvolution(e) {
     e.preventDefault()
     try {
-      await axios.post(
+      const response = await axios.post(
         `${API}/evolution`,
         {
           ...newEvolution,
@@ -233,7 +249,7 @@ export function StudentProfile() {
       toast.success('Evolução registrada!')
       setShowAddEvolution(false)
       setNewEvolution({ date: new Date().toISOString().split('T')[0], current_weight: '', observations: '', performance: '' })
-      loadEvolutions()
+      applyChange({ table: 'evolution', op: 'insert', row: response.data })
     } catch (error) {
       console.error('Erro ao registrar evolução:', error)
       toast.error('Erro ao registrar evolução')
@@ -243,7 +259,7 @@ export function StudentProfile() {
   async function handleAddHistory(e) {
     e.preventDefault()
     try {
-      await axios.post(
+      const response = await axios.post(
         `${API}/exercise-history`,
         {
           ...newHistory,
@@ -254,7 +270,7 @@ export function StudentProfile() {
       )
       toast.success('Registro adicionado ao histórico!')
       setNewHistory({ date: new Date().toISOString().split('T')[0], weight: '', sets: '', reps: '', observations: '' })
-      loadExerciseHistory(selectedExercise)
+      applyChange({ table: 'exercise_history', op: 'insert', row: response.data })
     } catch (error) {
       console.error('Erro ao adicionar histórico:', error)
       toast.error('Erro ao adicionar histórico')
@@ -263,7 +279,12 @@ export function StudentProfile() {
 
   function openExercises(workoutId) {
     setSelectedWorkout(workoutId)
-    loadExercises(workoutId)
+    const workout = workouts.find((w) => w.id === workoutId)
+    if (workout?.exercises) {
+      setExercises(workout.exercises)
+    } else {
+      loadExercises(workoutId)
+    }
     setShowExercises(true)
   }
 
@@ -378,6 +399,7 @@ export function StudentProfile() {
               <WeeklyRoutine 
                 studentId={id} 
                 workouts={workouts}
+                initialRoutine={weeklyRoutine}
                 onExerciseClick={openExercises}
               />
             </div>
@@ -0,0 +1,7 @@
+-- COLE NO SUPABASE SQL EDITOR
+-- Valores numéricos extraídos de weight/reps na escrita (os textos originais são mantidos).
+-- Registros antigos, com essas colunas nulas, são normalizados pela API na leitura.
+
+ALTER TABLE exercise_history ADD COLUMN IF NOT EXISTS load_kg NUMERIC(7,2);
+ALTER TABLE exercise_history ADD COLUMN IF NOT EXISTS set_count INTEGER;
+ALTER TABLE exercise_history ADD COLUMN IF NOT EXISTS rep_count NUMERIC(6,2);
@@ -0,0 +1,49 @@
+-- COLE NO SUPABASE SQL EDITOR
+-- Agenda do dia: a rotina de todos os alunos para um dia da semana numa única consulta,
+-- usada por GET /api/schedule.
+
+CREATE INDEX IF NOT EXISTS idx_weekly_routine_user_day ON weekly_routine (user_id, day_of_week);
+CREATE INDEX IF NOT EXISTS idx_workouts_user_date ON workouts (user_id, date);
+CREATE INDEX IF NOT EXISTS idx_exercise_history_user_date ON exercise_history (user_id, date);
+
+CREATE OR REPLACE FUNCTION daily_schedule(p_user_id UUID, p_day INTEGER, p_date DATE)
+RETURNS TABLE (
+  routine_id UUID,
+  student_id UUID,
+  student_name TEXT,
+  day_of_week INTEGER,
+  workout_name TEXT,
+  exercises JSONB,
+  workout_id UUID,
+  has_history BOOLEAN
+)
+LANGUAGE sql STABLE
+AS $$
+  SELECT
+    r.id,
+    r.student_id,
+    s.name,
+    r.day_of_week,
+    r.workout_name,
+    r.exercises,
+    (
+      SELECT w.id FROM workouts w
+      WHERE w.user_id = p_user_id AND w.student_id = r.student_id AND w.date = p_date
+      ORDER BY w.created_at DESC
+      LIMIT 1
+    ),
+    EXISTS (
+      SELECT 1 FROM exercise_history h
+      JOIN exercises e ON e.id = h.exercise_id
+      JOIN workouts w ON w.id = e.workout_id
+      WHERE h.user_id = p_user_id AND h.date = p_date AND w.student_id = r.student_id
+    )
+  FROM weekly_routine r
+  JOIN students s ON s.id = r.student_id
+  WHERE r.user_id = p_user_id AND r.day_of_week = p_day
+  ORDER BY s.name, r.created_at;
+$$;
+
+-- Recebe o user_id como parâmetro: só o backend (service role) pode chamar
+REVOKE EXECUTE ON FUNCTION daily_schedule(UUID, INTEGER, DATE) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION daily_schedule(UUID, INTEGER, DATE) TO service_role;
@@ -0,0 +1,74 @@
+-- COLE NO SUPABASE SQL EDITOR
+-- Índices compostos no formato das consultas do backend: igualdade na chave do pai
+-- seguida da coluna de ordenação e do id (desempate do cursor keyset). Um índice
+-- btree é lido nos dois sentidos, então (a, created_at, id) atende tanto
+-- ORDER BY created_at DESC, id DESC quanto a ordem crescente da exportação.
+-- Os índices que começam pela FK também evitam a varredura da tabela filha
+-- a cada ON DELETE CASCADE.
+--
+-- Em tabelas já grandes, prefira rodar cada CREATE INDEX separadamente com
+-- CONCURRENTLY (não pode ser executado dentro de uma transação) para não
+-- bloquear escritas durante a criação.
+--
+-- Para conferir os planos: python -m tests.audit --dsn postgresql://... (ver README).
+
+-- Carteira do treinador (GET /api/students) e exportação
+CREATE INDEX IF NOT EXISTS idx_students_user_created ON students (user_id, created_at, id);
+
+-- Treinos do aluno (perfil, GET /api/workouts?student_id=) e cascata de students
+CREATE INDEX IF NOT EXISTS idx_workouts_student_created ON workouts (student_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_workouts_user_created ON workouts (user_id, created_at, id);
+
+-- Exercícios do treino (perfil, clonagem) e cascata de workouts
+CREATE INDEX IF NOT EXISTS idx_exercises_workout_created ON exercises (workout_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_exercises_user_created ON exercises (user_id, created_at, id);
+
+-- Histórico por exercício (GET /api/exercise-history/{id}, progresso) e cascata de exercises
+CREATE INDEX IF NOT EXISTS idx_exercise_history_exercise_date ON exercise_history (exercise_id, date, id);
+CREATE INDEX IF NOT EXISTS idx_exercise_history_user_created ON exercise_history (user_id, created_at, id);
+
+CREATE INDEX IF NOT EXISTS idx_cardio_student_created ON cardio (student_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_cardio_user_created ON cardio (user_id, created_at, id);
+
+CREATE INDEX IF NOT EXISTS idx_evolution_student_date ON evolution (student_id, date, id);
+CREATE INDEX IF NOT EXISTS idx_evolution_user_created ON evolution (user_id, created_at, id);
+
+CREATE INDEX IF NOT EXISTS idx_weekly_routine_student_day ON weekly_routine (student_id, day_of_week);
+CREATE INDEX IF NOT EXISTS idx_weekly_routine_user_created ON weekly_routine (user_id, created_at, id);
+
+-- Políticas RLS: `(select auth.uid())` é avaliado uma vez por consulta (InitPlan),
+-- enquanto `auth.uid()` direto é chamado para cada linha e impede o uso do índice em user_id.
+ALTER POLICY "Users can view own students" ON students USING ((select auth.uid()) = user_id);
+ALTER POLICY "Users can create students" ON students WITH CHECK ((select auth.uid()) = user_id);
+ALTER POLICY "Users can update own students" ON students USING ((select auth.uid()) = user_id);
+ALTER POLICY "Users can delete own students" ON students USING ((select auth.uid()) = user_id);
+
+ALTER POLICY "Users can view own workouts" ON workouts USING ((select auth.uid()) = user_id);
+ALTER POLICY "Users can create workouts" ON workouts WITH CHECK ((select auth.uid()) = user_id);
+ALTER POLICY "Users can update own workouts" ON workouts USING ((select auth.uid()) = user_id);
+ALTER POLICY "Users can delete own workouts" ON workouts USING ((select auth.uid()) = user_id);
+
+ALTER POLICY "Users can view own exercises" ON exercises USING ((select auth.uid()) = user_id);
+ALTER POLICY "Users can create exercises" ON exercises WITH CHECK ((select auth.uid()) = user_id);
+ALTER POLICY "Users can update own exercises" ON exercises USING ((select auth.uid()) = user_id);
+ALTER POLICY "Users can delete own exercises" ON exercises USING ((select auth.uid()) = user_id);
+
+ALTER POLICY "Users can view own exercise history" ON exercise_history USING ((select auth.uid()) = user_id);
+ALTER POLICY "Users can create exercise history" ON exercise_history WITH CHECK ((select auth.uid()) = user_id);
+ALTER POLICY "Users can update own exercise history" ON exercise_history USING ((select auth.uid()) = user_id);
+ALTER POLICY "Users can delete own exercise history" ON exercise_history USING ((select auth.uid()) = user_id);
+
+ALTER POLICY "Users can view own cardio" ON cardio USING ((select auth.uid()) = user_id);
+ALTER POLICY "Users can create cardio" ON cardio WITH CHECK ((select auth.uid()) = user_id);
+ALTER POLICY "Users can update own cardio" ON cardio USING ((select auth.uid()) = user_id);
+ALTER POLICY "Users can delete own cardio" ON cardio USING ((select auth.uid()) = user_id);
+
+ALTER POLICY "Users can view own evolution" ON evolution USING ((select auth.uid()) = user_id);
+ALTER POLICY "Users can create evolution" ON evolution WITH CHECK ((select auth.uid()) = user_id);
+ALTER POLICY "Users can update own evolution" ON evolution USING ((select auth.uid()) = user_id);
+ALTER POLICY "Users can delete own evolution" ON evolution USING ((select auth.uid()) = user_id);
+
+ALTER POLICY "Users can view own routine" ON weekly_routine USING ((select auth.uid()) = user_id);
+ALTER POLICY "Users can create routine" ON weekly_routine WITH CHECK ((select auth.uid()) = user_id);
+ALTER POLICY "Users can update own routine" ON weekly_routine USING ((select auth.uid()) = user_id);
+ALTER POLICY "Users can delete own routine" ON weekly_routine USING ((select auth.uid()) = user_id);
@@ -0,0 +1,20 @@
+-- COLE NO SUPABASE SQL EDITOR
+-- Um token de cadastro por sessão de checkout: o webhook do Stripe e o
+-- /api/verify-payment gravam com ON CONFLICT (stripe_session_id) DO NOTHING.
+
+-- Recarregar a página de sucesso criava um token novo a cada acesso: fica o já
+-- usado, ou o mais recente, de cada sessão
+DELETE FROM purchase_tokens p
+USING (
+  SELECT id, row_number() OVER (
+    PARTITION BY stripe_session_id ORDER BY used DESC, created_at DESC, id
+  ) AS position
+  FROM purchase_tokens
+  WHERE stripe_session_id IS NOT NULL
+) ranked
+WHERE p.id = ranked.id AND ranked.position > 1;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_purchase_tokens_session ON purchase_tokens (stripe_session_id);
+
+-- Limpeza periódica dos tokens vencidos que não foram usados
+CREATE INDEX IF NOT EXISTS idx_purchase_tokens_expires ON purchase_tokens (expires_at) WHERE used = false;
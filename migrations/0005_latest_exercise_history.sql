@@ -0,0 +1,25 @@
+-- COLE NO SUPABASE SQL EDITOR
+-- Últimos N registros de histórico de cada exercício numa única consulta, usada pelo
+-- perfil do aluno com `history_limit` (GET /api/students/{id}/profile): só as linhas
+-- pedidas saem do banco, em vez do histórico inteiro de todos os exercícios.
+
+-- Uma leitura por exercício no índice (exercise_id, date, id) da migração 0003, parando
+-- em p_limit linhas: equivale a row_number() OVER (PARTITION BY exercise_id ORDER BY date DESC) <= p_limit
+CREATE OR REPLACE FUNCTION latest_exercise_history(p_user_id UUID, p_exercise_ids UUID[], p_limit INTEGER)
+RETURNS SETOF exercise_history
+LANGUAGE sql STABLE
+AS $$
+  SELECT h.*
+  FROM unnest(p_exercise_ids) AS e(id)
+  CROSS JOIN LATERAL (
+    SELECT * FROM exercise_history h
+    WHERE h.exercise_id = e.id AND h.user_id = p_user_id
+    ORDER BY h.date DESC, h.id DESC
+    LIMIT p_limit
+  ) h
+  ORDER BY h.exercise_id, h.date DESC, h.id DESC;
+$$;
+
+-- Recebe o user_id como parâmetro: só o backend (service role) pode chamar
+REVOKE EXECUTE ON FUNCTION latest_exercise_history(UUID, UUID[], INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION latest_exercise_history(UUID, UUID[], INTEGER) TO service_role;
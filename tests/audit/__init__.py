@@ -0,0 +1,10 @@
+"""Auditoria dos planos de execução das consultas do backend.
+
+Uso: ``python -m tests.audit --help`` a partir da raiz do repositório.
+"""
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[2] / "backend"
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
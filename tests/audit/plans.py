@@ -0,0 +1,329 @@
+import json
+import sqlite3
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlite_db import FUNCTIONS, function_params
+
+from .recorder import Query
+
+ROOT = Path(__file__).resolve().parents[2]
+# Ordem de execução no Supabase (ver README)
+SETUP_SCRIPTS = ["SETUP_SUPABASE.sql", "UPDATE_DATABASE.sql", "LANDING_PAGE_DB.sql"]
+MIGRATIONS_DIR = ROOT / "migrations"
+
+PARENT_TABLES = {"student_id": "students", "workout_id": "workouts", "exercise_id": "exercises", "p_exercise_ids": "exercises"}
+
+
+@dataclass
+class Plan:
+    query: Query
+    sql: str
+    nodes: List[str]
+    scans: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "op": self.query.op,
+            "table": self.query.table,
+            "sources": sorted(self.query.sources),
+            "sql": self.sql,
+            "plan": self.nodes,
+            "seq_scans": self.scans,
+            "error": self.error,
+        }
+
+
+def quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def render(query: Query, values: Dict[str, Any], dialect: str) -> Tuple[str, List[Any]]:
+    """SQL equivalente ao que o backend do `dialect` executa para `query`.
+
+    No Postgres o cursor keyset sai no formato que o PostgREST gera a partir do
+    filtro `or` do SupabaseDatabase; no SQLite, como comparação de tuplas.
+    """
+    mark = "?" if dialect == "sqlite" else "%s"
+    clauses, params = [], []
+    for column, kind in query.filters:
+        value = values["filters"][column]
+        if kind == "in":
+            items = list(value)
+            clauses.append(f"{quote(column)} IN ({', '.join([mark] * len(items))})" if items else "1 = 0")
+            params.extend(items)
+        elif kind == "null":
+            clauses.append(f"{quote(column)} IS NULL")
+        else:
+            clauses.append(f"{quote(column)} = {mark}")
+            params.append(value)
+    for column in query.ranges:
+        low, high = values["ranges"][column]
+        if low is not None:
+            clauses.append(f"{quote(column)} >= {mark}")
+            params.append(low)
+        if high is not None:
+            clauses.append(f"{quote(column)} <= {mark}")
+            params.append(high)
+    if query.after:
+        column, desc = query.order[0]
+        op = "<" if desc else ">"
+        value, row_id = values["after"]
+        if dialect == "sqlite":
+            clauses.append(f"({quote(column)}, id) {op} (?, ?)")
+            params.extend([value, row_id])
+        else:
+            clauses.append(f"({quote(column)} {op} %s OR ({quote(column)} = %s AND id {op} %s))")
+            params.extend([value, value, row_id])
+    where = " WHERE " + " AND ".join(clauses) if clauses else ""
+
+    if query.op == "update":
+        assignments = ", ".join(f"{quote(c)} = {mark}" for c in values["set"])
+        return f"UPDATE {quote(query.table)} SET {assignments}{where}", list(values["set"].values()) + params
+    if query.op == "delete":
+        return f"DELETE FROM {quote(query.table)}{where}", params
+
+    columns = "*" if query.columns == "*" else ", ".join(quote(c.strip()) for c in query.columns.split(","))
+    sql = f"SELECT {columns} FROM {quote(query.table)}{where}"
+    if query.order:
+        sql += " ORDER BY " + ", ".join(f"{quote(c)} {'DESC' if desc else 'ASC'}" for c, desc in query.order)
+    if query.limit:
+        sql += f" LIMIT {mark}"
+        params.append(values["limit"])
+    return sql, params
+
+
+class SQLiteExplainer:
+    """EXPLAIN QUERY PLAN no próprio banco usado na gravação.
+
+    Confere só se cada filtro encontra um índice (SEARCH) em vez de percorrer a
+    tabela (SCAN). Sem ANALYZE o SQLite supõe que todo índice é seletivo, então
+    o volume pequeno da gravação não esconde índices faltando; custo real e
+    escolha do planner só valem no Postgres.
+    """
+
+    dialect = "sqlite"
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def explain(self, query: Query) -> Plan:
+        if query.op == "rpc":
+            sql, params = FUNCTIONS[query.table][0], function_params(query.values["params"])
+        else:
+            sql, params = render(query, query.values, self.dialect)
+        try:
+            rows = self.conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+        except sqlite3.Error as e:
+            return Plan(query, " ".join(sql.split()), [], error=str(e))
+        nodes = [row[3] for row in rows]
+        # Listas de parâmetros (json_each) e subconsultas também aparecem como SCAN, mas não são tabelas
+        scans = [
+            node.split()[1] for node in nodes
+            if node.startswith("SCAN ") and node.split()[1] != "CONSTANT"
+            and not node.split()[1].startswith("(") and "VIRTUAL TABLE" not in node
+        ]
+        return Plan(query, " ".join(sql.split()), nodes, scans)
+
+
+# Papéis e funções que o Supabase já traz; criados só quando não existem (Postgres puro)
+SUPABASE_STUBS = """
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN CREATE ROLE anon NOLOGIN; END IF;
+  IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'authenticated') THEN CREATE ROLE authenticated NOLOGIN; END IF;
+  IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'service_role') THEN CREATE ROLE service_role NOLOGIN BYPASSRLS; END IF;
+END $$;
+CREATE SCHEMA IF NOT EXISTS auth;
+CREATE TABLE IF NOT EXISTS auth.users (id UUID PRIMARY KEY DEFAULT gen_random_uuid(), email TEXT);
+DO $$
+BEGIN
+  IF to_regprocedure('auth.uid()') IS NULL THEN
+    CREATE FUNCTION auth.uid() RETURNS UUID LANGUAGE sql STABLE
+      AS 'SELECT nullif(current_setting(''request.jwt.claim.sub'', true), '''')::uuid';
+  END IF;
+END $$;
+GRANT USAGE ON SCHEMA auth TO anon, authenticated, service_role;
+"""
+
+AUDIT_SCHEMA = "personalhub_audit"
+AUDIT_EMAIL = "audit-%@personalhub.test"
+
+# Volume por treinador parecido com o de uma carteira grande; as proporções
+# entre tabelas seguem o uso do app (treinos por aluno, séries por exercício...)
+GENERATE = """
+INSERT INTO auth.users (id, email)
+  SELECT gen_random_uuid(), 'audit-' || g || '@personalhub.test' FROM generate_series(1, {trainers}) g;
+INSERT INTO students (user_id, name, goal, created_at)
+  SELECT u.id, 'Aluno ' || g, 'Hipertrofia', now() - g * interval '1 hour'
+  FROM auth.users u CROSS JOIN generate_series(1, {students}) g WHERE u.email LIKE '{email}';
+INSERT INTO workouts (user_id, student_id, name, date, created_at)
+  SELECT s.user_id, s.id, 'Treino ' || g, current_date - g * 7, s.created_at + g * interval '7 days'
+  FROM students s CROSS JOIN generate_series(1, {workouts}) g;
+INSERT INTO exercises (user_id, workout_id, name, sets, reps, created_at)
+  SELECT w.user_id, w.id, 'Exercício ' || g, 3, '10', w.created_at + g * interval '1 second'
+  FROM workouts w CROSS JOIN generate_series(1, {exercises}) g;
+INSERT INTO exercise_history (user_id, exercise_id, date, weight, sets, reps, load_kg, set_count, rep_count)
+  SELECT e.user_id, e.id, current_date - g * 7, (20 + g) || 'kg', 3, '3x10', 20 + g, 3, 10
+  FROM exercises e CROSS JOIN generate_series(1, {history}) g;
+INSERT INTO cardio (user_id, student_id, equipment, duration, date)
+  SELECT s.user_id, s.id, 'Esteira', 30, current_date - g FROM students s CROSS JOIN generate_series(1, {cardio}) g;
+INSERT INTO evolution (user_id, student_id, date, current_weight)
+  SELECT s.user_id, s.id, current_date - g * 14, 80 - g / 10.0 FROM students s CROSS JOIN generate_series(1, {evolution}) g;
+INSERT INTO weekly_routine (user_id, student_id, day_of_week, workout_name, exercises)
+  SELECT s.user_id, s.id, g, 'Treino A', '[]'::jsonb FROM students s CROSS JOIN generate_series(1, 5) g;
+INSERT INTO purchase_tokens (token, email, plan_type, stripe_session_id, used, expires_at)
+  SELECT md5(g::text), 'cliente-' || g || '@personalhub.test', 'monthly', 'cs_audit_' || g, g % 3 = 0, now() + interval '1 day'
+  FROM generate_series(1, {tokens}) g;
+ANALYZE;
+"""
+
+
+class PostgresExplainer:
+    """EXPLAIN (FORMAT JSON) num Postgres local com dados gerados.
+
+    Monta o esquema num schema próprio (`personalhub_audit`, recriado a cada
+    execução) a partir dos mesmos scripts colados no Supabase. Use um banco
+    descartável: os treinadores fictícios são gravados em auth.users.
+    """
+
+    dialect = "postgres"
+
+    def __init__(self, dsn: str, before: Optional[str] = None, scale: Optional[Dict[str, int]] = None,
+                 rls: bool = False, min_rows: int = 1000):
+        try:
+            import psycopg
+        except ImportError:
+            raise SystemExit("O modo --dsn precisa do psycopg: pip install 'psycopg[binary]'")
+        self.conn = psycopg.connect(dsn, autocommit=True)
+        self.rls = rls
+        self.min_rows = min_rows
+        self.setup(before)
+        self.generate(scale or {})
+        self.samples = self.load_samples()
+        self.row_counts = dict(self.fetch(
+            "SELECT c.relname, c.reltuples::bigint FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE n.nspname = %s AND c.relkind = 'r'", [AUDIT_SCHEMA],
+        ))
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def fetch(self, sql: str, params: Any = None) -> List[tuple]:
+        with self.conn.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall() if cursor.description else []
+
+    def setup(self, before: Optional[str]) -> None:
+        self.fetch(f"DROP SCHEMA IF EXISTS {AUDIT_SCHEMA} CASCADE")
+        self.fetch(SUPABASE_STUBS)
+        self.fetch("DELETE FROM auth.users WHERE email LIKE %s", [AUDIT_EMAIL])
+        self.fetch(f"CREATE SCHEMA {AUDIT_SCHEMA}")
+        self.fetch(f"SET search_path TO {AUDIT_SCHEMA}, public")
+        scripts = [ROOT / name for name in SETUP_SCRIPTS]
+        # `before` deixa de fora uma migração e as seguintes, para comparar os planos sem ela
+        scripts += [path for path in sorted(MIGRATIONS_DIR.glob("*.sql")) if before is None or path.name < before]
+        for script in scripts:
+            self.fetch(script.read_text())
+        self.fetch(f"GRANT USAGE ON SCHEMA {AUDIT_SCHEMA} TO anon, authenticated, service_role")
+        self.fetch(f"GRANT ALL ON ALL TABLES IN SCHEMA {AUDIT_SCHEMA} TO anon, authenticated, service_role")
+
+    def generate(self, scale: Dict[str, int]) -> None:
+        sizes = {"trainers": 20, "students": 100, "workouts": 6, "exercises": 6, "history": 8,
+                 "cardio": 30, "evolution": 12, "tokens": 5000, **scale}
+        self.fetch(GENERATE.format(email=AUDIT_EMAIL, **{k: int(v) for k, v in sizes.items()}))
+
+    def load_samples(self) -> Dict[str, Any]:
+        (user_id, student_id), = self.fetch(
+            "SELECT user_id, id FROM students WHERE user_id = (SELECT min(user_id::text)::uuid FROM students) "
+            "ORDER BY created_at LIMIT 1"
+        )
+        ids = {"students": [student_id] + [r[0] for r in self.fetch(
+            "SELECT id FROM students WHERE user_id = %s AND id <> %s ORDER BY created_at LIMIT 200", [user_id, student_id])]}
+        for table in ("workouts", "cardio", "evolution", "weekly_routine"):
+            ids[table] = [r[0] for r in self.fetch(f"SELECT id FROM {table} WHERE student_id = %s", [student_id])]
+        ids["exercises"] = [r[0] for r in self.fetch("SELECT id FROM exercises WHERE workout_id = ANY(%s)", [ids["workouts"]])]
+        ids["exercise_history"] = [r[0] for r in self.fetch(
+            "SELECT id FROM exercise_history WHERE exercise_id = ANY(%s)", [ids["exercises"]])]
+        (token, email), = self.fetch("SELECT token, email FROM purchase_tokens WHERE NOT used LIMIT 1")
+        return {"user_id": user_id, "ids": ids, "token": token, "email": email}
+
+    def sample(self, table: str, column: str, recorded: Any, many: bool) -> Any:
+        """Troca um valor gravado no SQLite pelo equivalente nos dados gerados."""
+        if column == "user_id" or column == "p_user_id":
+            return self.samples["user_id"]
+        if column in ("token", "email") and table == "purchase_tokens":
+            return self.samples[column]
+        source = table if column == "id" else PARENT_TABLES.get(column)
+        if source is None or source not in self.samples["ids"]:
+            return recorded
+        ids = self.samples["ids"][source]
+        return ids[:max(1, len(recorded))] if many else ids[0]
+
+    def values(self, query: Query) -> Dict[str, Any]:
+        recorded = query.values
+        if query.op == "rpc":
+            return {
+                name: self.sample(query.table, name, value, isinstance(value, list))
+                for name, value in recorded["params"].items()
+            }
+        values = dict(recorded)
+        values["filters"] = {
+            column: self.sample(query.table, column, recorded["filters"][column], kind == "in")
+            for column, kind in query.filters
+        }
+        if query.after:
+            order_value, row_id = recorded["after"]
+            values["after"] = (order_value, self.sample(query.table, "id", row_id, False))
+        return values
+
+    def explain(self, query: Query) -> Plan:
+        values = self.values(query)
+        if query.op == "rpc":
+            # Funções SQL STABLE que devolvem TABLE são expandidas na consulta, então o plano mostra o corpo
+            arguments = ", ".join(
+                f"{name} => %({name})s" + ("::uuid[]" if isinstance(value, list) else "") for name, value in values.items()
+            )
+            sql, params = f"SELECT * FROM {query.table}({arguments})", values
+        else:
+            sql, params = render(query, values, self.dialect)
+        try:
+            if self.rls:
+                # Como o PostgREST faz para o papel authenticated: as políticas RLS entram no plano
+                self.fetch("SET ROLE authenticated")
+                self.fetch("SELECT set_config('request.jwt.claim.sub', %s, false), set_config('request.jwt.claims', %s, false)",
+                           [str(self.samples["user_id"]), json.dumps({"sub": str(self.samples["user_id"]), "role": "authenticated"})])
+            (plan,), = self.fetch("EXPLAIN (FORMAT JSON) " + sql, params)
+        except Exception as e:
+            return Plan(query, sql, [], error=str(e).strip())
+        finally:
+            if self.rls:
+                self.fetch("RESET ROLE")
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        nodes, scans = [], []
+        self.walk(plan[0]["Plan"], 0, nodes, scans)
+        return Plan(query, sql, nodes, scans)
+
+    def walk(self, node: dict, depth: int, nodes: List[str], scans: List[str]) -> None:
+        kind = node["Node Type"]
+        relation = node.get("Relation Name")
+        detail = kind
+        if relation:
+            detail += f" on {relation}"
+        if node.get("Index Name"):
+            detail += f" using {node['Index Name']}"
+        for key in ("Index Cond", "Filter", "Sort Key"):
+            if node.get(key):
+                detail += f" [{key}: {node[key]}]"
+        nodes.append("  " * depth + detail)
+        # Tabelas pequenas são lidas inteiras pelo planner de propósito
+        if kind == "Seq Scan" and self.row_counts.get(relation, 0) >= self.min_rows:
+            scans.append(relation)
+        for child in node.get("Plans", ()):
+            self.walk(child, depth + 1, nodes, scans)
@@ -0,0 +1,229 @@
+import asyncio
+import tempfile
+from dataclasses import dataclass, field
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from db import Database
+
+# Filhas de cada tabela com ON DELETE CASCADE (coluna da FK): o Postgres não mostra
+# essas buscas no EXPLAIN do DELETE do pai, então elas entram como consultas próprias
+CASCADES = {
+    "students": [("workouts", "student_id"), ("cardio", "student_id"), ("evolution", "student_id"), ("weekly_routine", "student_id")],
+    "workouts": [("exercises", "workout_id")],
+    "exercises": [("exercise_history", "exercise_id")],
+}
+
+
+@dataclass
+class Query:
+    """Formato de uma consulta emitida pelo backend, sem os valores.
+
+    `values` guarda os parâmetros da primeira ocorrência, usados no EXPLAIN.
+    """
+
+    op: str
+    table: str
+    filters: Tuple[Tuple[str, str], ...] = ()
+    order: Tuple[Tuple[str, bool], ...] = ()
+    columns: str = "*"
+    limit: bool = False
+    after: bool = False
+    ranges: Tuple[str, ...] = ()
+    values: Dict[str, Any] = field(default_factory=dict, compare=False)
+    sources: Set[str] = field(default_factory=set, compare=False)
+
+    @property
+    def key(self) -> tuple:
+        return (self.op, self.table, self.filters, self.order, self.columns, self.limit, self.after, self.ranges)
+
+
+def filter_shape(filters: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+    shape = []
+    for column, value in filters.items():
+        if isinstance(value, (list, tuple, set)):
+            shape.append((column, "in"))
+        elif value is None:
+            shape.append((column, "null"))
+        else:
+            shape.append((column, "eq"))
+    return tuple(shape)
+
+
+class RecordingDatabase(Database):
+    """Repositório que anota o formato de cada leitura/escrita antes de delegar ao real."""
+
+    def __init__(self, inner: Database):
+        self.inner = inner
+        self.endpoint = "setup"
+        self.queries: Dict[tuple, Query] = {}
+
+    def record(self, query: Query) -> None:
+        existing = self.queries.setdefault(query.key, query)
+        existing.sources.add(self.endpoint)
+
+    def start(self) -> None:
+        self.inner.start()
+
+    def close(self) -> None:
+        self.inner.close()
+
+    async def run(self, fn, *args, **kwargs) -> Any:
+        return await self.inner.run(fn, *args, **kwargs)
+
+    async def select(self, table, filters, order=(), columns="*", limit=None, after=None, ranges=None):
+        self.record(Query(
+            "select", table, filter_shape(filters), tuple(order), columns, limit is not None, after is not None,
+            tuple(ranges or ()), {"filters": dict(filters), "limit": limit, "after": after, "ranges": dict(ranges or {})},
+        ))
+        return await self.inner.select(table, filters, order=order, columns=columns, limit=limit, after=after, ranges=ranges)
+
+    async def insert(self, table, rows):
+        return await self.inner.insert(table, rows)
+
+    async def upsert(self, table, rows, on_conflict="id", ignore_duplicates=False):
+        return await self.inner.upsert(table, rows, on_conflict=on_conflict, ignore_duplicates=ignore_duplicates)
+
+    async def update(self, table, values, filters):
+        self.record(Query("update", table, filter_shape(filters), columns=",".join(values), values={"filters": dict(filters), "set": dict(values)}))
+        return await self.inner.update(table, values, filters)
+
+    async def delete(self, table, filters):
+        self.record(Query("delete", table, filter_shape(filters), values={"filters": dict(filters)}))
+        return await self.inner.delete(table, filters)
+
+    async def rpc(self, function, params):
+        self.record(Query("rpc", function, tuple((name, "eq") for name in params), values={"params": dict(params)}))
+        return await self.inner.rpc(function, params)
+
+    async def ping(self):
+        return await self.inner.ping()
+
+    async def sign_in(self, email, password):
+        return await self.inner.sign_in(email, password)
+
+    async def sign_out(self):
+        return await self.inner.sign_out()
+
+    def get_user_id(self, token):
+        return self.inner.get_user_id(token)
+
+    async def create_user(self, email, password):
+        return await self.inner.create_user(email, password)
+
+
+class Session:
+    def __init__(self, client, recorder: RecordingDatabase):
+        self.client = client
+        self.recorder = recorder
+        self.headers: Dict[str, str] = {}
+
+    def call(self, method: str, route: str, path: Optional[str] = None, **kwargs) -> Any:
+        """Chama `path` (ou a própria rota) e atribui as consultas a `METHOD rota`."""
+        self.recorder.endpoint = f"{method} {route}"
+        response = self.client.request(method, path or route, headers=self.headers, **kwargs)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{method} {path or route}: HTTP {response.status_code} {response.text[:200]}")
+        return response.json() if response.headers.get("content-type", "").startswith("application/json") else None
+
+
+def exercise_endpoints(session: Session, student_id: str) -> None:
+    """Percorre as rotas do app com dados reais, de leituras a remoções."""
+    from tests.bench.scenarios import EMAIL, PASSWORD
+
+    login = session.call("POST", "/api/auth/login", json={"email": EMAIL, "password": PASSWORD})
+    session.headers = {"Authorization": f"Bearer {login['access_token']}"}
+    s = f"/api/students/{student_id}"
+
+    page = session.client.get("/api/students", params={"limit": 50}, headers=session.headers)
+    session.call("GET", "/api/students", params={"limit": 50, "cursor": page.headers["X-Next-Cursor"]})
+    profile = session.call("GET", "/api/students/{id}/profile", f"{s}/profile", params={"history_limit": 5})
+    workout_id = profile["workouts"][0]["id"]
+    exercise_id = profile["workouts"][0]["exercises"][0]["id"]
+    session.call("GET", "/api/students/{id}/progress", f"{s}/progress")
+    session.call("GET", "/api/students/{id}/timeseries", f"{s}/timeseries",
+                 params={"start": date(date.today().year - 1, 1, 1).isoformat(), "end": date.today().isoformat()})
+    session.call("GET", "/api/workouts", params={"student_id": student_id, "limit": 20})
+    session.call("GET", "/api/workouts", params={"limit": 20})
+    session.call("GET", "/api/exercises", params={"workout_id": workout_id})
+    session.call("GET", "/api/exercises", params={"limit": 20})
+    session.call("GET", "/api/exercise-history", params={"exercise_id": exercise_id, "limit": 20})
+    session.call("GET", "/api/cardio", params={"student_id": student_id, "limit": 20})
+    session.call("GET", "/api/evolution", params={"student_id": student_id, "limit": 20})
+    session.call("GET", "/api/weekly-routine", params={"student_id": student_id})
+    session.call("GET", "/api/schedule", params={"day_of_week": 1})
+    session.call("GET", "/api/search", params={"q": "agachamento"})
+    session.call("GET", "/api/export")
+
+    created = session.call("POST", "/api/students", json={"name": "Aluno Auditoria", "goal": "Força"})
+    target = created["id"]
+    t = f"/api/students/{target}"
+    session.call("PUT", "/api/students/{id}", t, json={"name": "Aluno Auditoria", "goal": "Hipertrofia"})
+    full = session.call("POST", "/api/workouts/full", json={
+        "student_id": target, "name": "Treino A", "exercises": [{"name": "Supino", "sets": 4, "reps": "8"}],
+    })
+    exercise = session.call("POST", "/api/exercises", json={"workout_id": full["id"], "name": "Remada", "sets": 3})
+    session.call("PUT", "/api/exercises/{id}", f"/api/exercises/{exercise['id']}", json={"workout_id": full["id"], "name": "Remada curvada"})
+    session.call("POST", "/api/exercise-history/bulk", json=[
+        {"exercise_id": exercise["id"], "date": date.today().isoformat(), "weight": "40kg", "sets": 3, "reps": "3x10"},
+    ])
+    session.call("DELETE", "/api/exercises/{id}", f"/api/exercises/{exercise['id']}")
+    cardio = session.call("POST", "/api/cardio", json={"student_id": target, "equipment": "Bike", "duration": 20})
+    session.call("DELETE", "/api/cardio/{id}", f"/api/cardio/{cardio['id']}")
+    session.call("POST", "/api/evolution", json={"student_id": target, "date": date.today().isoformat(), "current_weight": 80})
+    day = session.call("POST", "/api/weekly-routine", json={"student_id": target, "day_of_week": 2, "workout_name": "Treino A"})
+    session.call("PUT", "/api/weekly-routine/{id}", f"/api/weekly-routine/{day['id']}",
+                 json={"student_id": target, "day_of_week": 2, "workout_name": "Treino B"})
+    session.call("DELETE", "/api/weekly-routine/{id}", f"/api/weekly-routine/{day['id']}")
+    session.call("PUT", "/api/students/{id}/weekly-routine", f"{t}/weekly-routine",
+                 json={"days": [{"day_of_week": 1, "workout_name": "Treino A"}]})
+    session.call("POST", "/api/workouts/{id}/clone", f"/api/workouts/{workout_id}/clone", json={"student_ids": [target]})
+    session.call("POST", "/api/students/{id}/weekly-routine/clone", f"{s}/weekly-routine/clone", json={"student_ids": [target]})
+    session.call("DELETE", "/api/workouts/{id}", f"/api/workouts/{full['id']}")
+
+    checkout = session.call("POST", "/api/create-checkout", json={"plan_type": "monthly", "email": "auditoria@personalhub.test"})
+    payment = session.call("GET", "/api/verify-payment/{session_id}", f"/api/verify-payment/{checkout['session_id']}")
+    session.call("POST", "/api/signup", json={"email": payment["email"], "password": "auditoria", "token": payment["token"]})
+
+    session.call("DELETE", "/api/students/{id}", t)
+
+
+def add_cascades(queries: Dict[tuple, Query], samples: Dict[str, Any]) -> None:
+    for parent, children in CASCADES.items():
+        for child, column in children:
+            query = Query("delete", child, ((column, "eq"),), values={"filters": {column: samples[column]}})
+            queries.setdefault(query.key, query).sources.add(f"ON DELETE CASCADE de {parent}")
+
+
+def record(roster: int) -> Tuple[List[Query], str]:
+    """Roda as rotas contra um SQLite temporário e devolve (consultas, caminho do banco)."""
+    from tests.bench.runner import install_stubs, load_server
+    from tests.bench.scenarios import seed
+
+    db_path = str(Path(tempfile.mkdtemp(prefix="personalhub-audit-")) / "audit.db")
+    server = load_server(db_path, pool_size=4)
+    from fastapi.testclient import TestClient
+
+    upstream, stripe_stub = install_stubs(server, latency=0.0, pool_size=4)
+    recorder = RecordingDatabase(upstream)
+    server.db.inner = recorder
+    # Sem cache, toda leitura chega ao banco
+    server.CACHE_ENABLED = False
+    server.db.start()
+    student_id = asyncio.run(seed(upstream.inner, roster))
+    try:
+        with TestClient(server.app) as client:
+            exercise_endpoints(Session(client, recorder), student_id)
+    finally:
+        stripe_stub.uninstall()
+        server.db.close()
+
+    samples = {"student_id": student_id}
+    for query in recorder.queries.values():
+        for column in ("workout_id", "exercise_id"):
+            value = query.values.get("filters", {}).get(column)
+            if isinstance(value, str):
+                samples.setdefault(column, value)
+    add_cascades(recorder.queries, samples)
+    return list(recorder.queries.values()), db_path
@@ -0,0 +1,10 @@
+"""Testes de carga e micro-benchmarks do backend.
+
+Uso: ``python -m tests.bench --help`` a partir da raiz do repositório.
+"""
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[2] / "backend"
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
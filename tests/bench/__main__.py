@@ -0,0 +1,30 @@
+import argparse
+import sys
+
+from .runner import BASELINE_PATH, run
+
+SCENARIOS = ["student_profile", "log_session", "list_roster", "verify_payment", "slow_upstream"]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m tests.bench", description="Benchmarks do backend com upstream simulado")
+    parser.add_argument("--driver", choices=["asgi", "uvicorn", "both"], default="both",
+                        help="asgi: app em processo via httpx.ASGITransport; uvicorn: servidor HTTP real em outra thread")
+    parser.add_argument("--scenarios", nargs="*", choices=SCENARIOS, help="cenários a rodar (padrão: todos)")
+    parser.add_argument("--requests", type=int, default=1000, help="requisições medidas por cenário")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.005, help="latência simulada de cada chamada ao upstream, em segundos")
+    parser.add_argument("--slow-latency", type=float, default=0.05, help="latência do cenário slow_upstream")
+    parser.add_argument("--pool-size", type=int, default=16, help="UPSTREAM_POOL_SIZE")
+    parser.add_argument("--roster", type=int, default=5000, help="alunos na carteira do treinador")
+    parser.add_argument("--roster-page", type=int, default=100, help="tamanho da página em list_roster")
+    parser.add_argument("--no-cache", dest="cache", action="store_false", help="desliga o cache de respostas")
+    parser.add_argument("--alloc-samples", type=int, default=50, help="requisições sequenciais medidas com tracemalloc (0 desliga)")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--update-baseline", action="store_true", help="grava os resultados como novo baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="piora relativa aceita antes de falhar")
+    return run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
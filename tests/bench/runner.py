@@ -0,0 +1,268 @@
+import asyncio
+import json
+import logging
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from .scenarios import Context, Scenario, build_scenarios, prepare, seed
+from .stubs import LatencyDatabase, StripeStub
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+JWT_SECRET = "bench-secret"
+CONTROL_PATH = "/__bench/config"
+
+
+@dataclass
+class Result:
+    requests: int
+    errors: int
+    rps: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    alloc_kib: Optional[float] = None
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def load_server(db_path: str, pool_size: int):
+    """Importa o app apontando para o SQLite local; precisa rodar antes de qualquer import de `server`."""
+    os.environ.update(
+        DB_BACKEND="sqlite",
+        SQLITE_PATH=db_path,
+        SUPABASE_URL="http://bench.local",
+        SUPABASE_JWT_SECRET=JWT_SECRET,
+        UPSTREAM_POOL_SIZE=str(pool_size),
+        STRIPE_PRICE_MONTHLY="price_bench",
+    )
+    import server
+    logging.getLogger("server").setLevel(logging.CRITICAL)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    return server
+
+
+async def drive(client: httpx.AsyncClient, scenario: Scenario, ctx: Context, requests: int, concurrency: int) -> Result:
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            response = await scenario.request(client, ctx, i)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return Result(
+        requests=requests,
+        errors=errors,
+        rps=round(requests / elapsed, 1),
+        p50_ms=round(percentile(latencies, 50) * 1000, 2),
+        p95_ms=round(percentile(latencies, 95) * 1000, 2),
+        p99_ms=round(percentile(latencies, 99) * 1000, 2),
+    )
+
+
+async def measure_allocations(client: httpx.AsyncClient, scenario: Scenario, ctx: Context, samples: int) -> float:
+    """Pico médio de memória alocada por requisição (KiB), em execução sequencial com tracemalloc."""
+    tracemalloc.start()
+    try:
+        total = 0
+        for i in range(samples):
+            tracemalloc.reset_peak()
+            before, _peak = tracemalloc.get_traced_memory()
+            await scenario.request(client, ctx, i)
+            _current, peak = tracemalloc.get_traced_memory()
+            total += peak - before
+    finally:
+        tracemalloc.stop()
+    return round(total / samples / 1024, 1)
+
+
+def install_stubs(server, latency: float, pool_size: int) -> Tuple[LatencyDatabase, StripeStub]:
+    """Põe a latência simulada sob a instrumentação do repositório, como a rede real estaria."""
+    import stripe
+
+    upstream = LatencyDatabase(server.db.inner, latency=latency, pool_size=pool_size)
+    server.db.inner = upstream
+    stripe_stub = StripeStub(stripe, upstream)
+    stripe_stub.install()
+    return upstream, stripe_stub
+
+
+def configure(server, upstream: LatencyDatabase, latency: float, cache: bool) -> None:
+    upstream.latency = latency
+    server.CACHE_ENABLED = cache
+    server.response_cache.clear()
+
+
+class UvicornProcess:
+    """Sobe o app num uvicorn real em outro processo, para o cliente não disputar o GIL com o servidor."""
+
+    def __init__(self, options):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self.command = [
+            sys.executable, "-m", "tests.bench.serve",
+            "--db", options.db_path,
+            "--port", str(self.port),
+            "--pool-size", str(options.pool_size),
+            "--latency", str(options.latency),
+        ]
+        self.process: Optional[subprocess.Popen] = None
+
+    def __enter__(self) -> str:
+        self.process = subprocess.Popen(self.command, cwd=Path(__file__).resolve().parents[2])
+        deadline = time.monotonic() + 30
+        while True:
+            if self.process.poll() is not None:
+                raise RuntimeError("uvicorn terminou antes de aceitar conexões")
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=0.1).close()
+                return f"http://127.0.0.1:{self.port}"
+            except OSError:
+                if time.monotonic() > deadline:
+                    self.process.kill()
+                    raise
+                time.sleep(0.05)
+
+    def __exit__(self, *exc) -> None:
+        self.process.terminate()
+        self.process.wait(timeout=30)
+
+
+async def run_driver(driver: str, server, upstream: LatencyDatabase, scenarios: List[Scenario], options) -> Dict[str, Result]:
+    limits = httpx.Limits(max_connections=options.concurrency, max_keepalive_connections=options.concurrency)
+    if driver == "asgi":
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://bench", limits=limits)
+    else:
+        client = httpx.AsyncClient(base_url=options.base_url, limits=limits, timeout=60)
+
+    results = {}
+    async with client:
+        ctx = await prepare(client, options.student_id, options.roster_page)
+        for scenario in scenarios:
+            latency = options.latency if scenario.latency is None else scenario.latency
+            cache = options.cache if scenario.cache is None else scenario.cache
+            if driver == "asgi":
+                configure(server, upstream, latency, cache)
+            else:
+                response = await client.post(CONTROL_PATH, json={"latency": latency, "cache": cache})
+                response.raise_for_status()
+            await drive(client, scenario, ctx, max(1, options.requests // 10), options.concurrency)
+            result = await drive(client, scenario, ctx, options.requests, options.concurrency)
+            if driver == "asgi" and options.alloc_samples:
+                result.alloc_kib = await measure_allocations(client, scenario, ctx, options.alloc_samples)
+            results[f"{driver}/{scenario.name}"] = result
+            print(format_row(f"{driver}/{scenario.name}", result), flush=True)
+    return results
+
+
+def format_row(name: str, result: Result) -> str:
+    alloc = "-" if result.alloc_kib is None else f"{result.alloc_kib:.1f}"
+    return (
+        f"{name:<28} {result.rps:>9.1f} req/s  p50 {result.p50_ms:>8.2f} ms  p95 {result.p95_ms:>8.2f} ms  "
+        f"p99 {result.p99_ms:>8.2f} ms  alloc {alloc:>7} KiB  erros {result.errors}"
+    )
+
+
+def compare(results: Dict[str, Result], baseline: dict, tolerance: float, ungated: Tuple[str, ...] = ()) -> List[str]:
+    """Regressões em relação ao baseline.
+
+    Compara req/s, p95 e alocação; o p99 é registrado mas oscila demais entre
+    execuções para reprovar o run. Diferenças de latência abaixo de 1 ms são ruído.
+    Nos drivers de `ungated` só erros reprovam.
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get("results", {}).get(name)
+        if result.errors:
+            regressions.append(f"{name}: {result.errors} requisições com erro")
+        if base is None or name.split("/")[0] in ungated:
+            continue
+        if result.rps < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: {result.rps} req/s < baseline {base['rps']}")
+        if result.p95_ms > base["p95_ms"] * (1 + tolerance) and result.p95_ms - base["p95_ms"] > 1.0:
+            regressions.append(f"{name}: p95 {result.p95_ms} ms > baseline {base['p95_ms']} ms")
+        if result.alloc_kib is not None and base.get("alloc_kib") is not None:
+            if result.alloc_kib > base["alloc_kib"] * (1 + tolerance):
+                regressions.append(f"{name}: alloc {result.alloc_kib} KiB > baseline {base['alloc_kib']}")
+    return regressions
+
+
+def run(options) -> int:
+    options.db_path = str(Path(tempfile.mkdtemp(prefix="personalhub-bench-")) / "bench.db")
+    server = load_server(options.db_path, options.pool_size)
+    upstream, stripe_stub = install_stubs(server, options.latency, options.pool_size)
+    scenarios = build_scenarios(options.roster_page, options.slow_latency)
+    selected = [scenarios[name] for name in options.scenarios] if options.scenarios else list(scenarios.values())
+
+    async def setup():
+        server.db.start()
+        options.student_id = await seed(upstream.inner, options.roster)
+
+    asyncio.run(setup())
+    results: Dict[str, Result] = {}
+    try:
+        if options.driver in ("asgi", "both"):
+            configure(server, upstream, options.latency, options.cache)
+            results.update(asyncio.run(run_driver("asgi", server, upstream, selected, options)))
+        if options.driver in ("uvicorn", "both"):
+            with UvicornProcess(options) as options.base_url:
+                results.update(asyncio.run(run_driver("uvicorn", server, upstream, selected, options)))
+    finally:
+        stripe_stub.uninstall()
+        server.db.close()
+
+    baseline_path = Path(options.baseline)
+    if options.update_baseline:
+        baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else {"results": {}}
+        baseline["meta"] = {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "requests": options.requests,
+            "concurrency": options.concurrency,
+            "latency": options.latency,
+            "roster": options.roster,
+        }
+        baseline["results"].update({name: asdict(result) for name, result in results.items()})
+        baseline_path.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline gravado em {baseline_path}")
+        return 0
+
+    if not baseline_path.exists():
+        print("Sem baseline; rode com --update-baseline para gravar um.")
+        return 0
+    # Com uma CPU só, cliente e uvicorn disputam o mesmo núcleo: o resultado depende do
+    # escalonador (±30% entre execuções idênticas) e não serve para reprovar o run
+    ungated = ("uvicorn",) if os.cpu_count() == 1 else ()
+    if ungated and options.driver != "asgi":
+        print("Uma CPU só: resultados do driver uvicorn são só informativos")
+    regressions = compare(results, json.loads(baseline_path.read_text()), options.tolerance, ungated)
+    for regression in regressions:
+        print(f"REGRESSÃO {regression}")
+    return 1 if regressions else 0
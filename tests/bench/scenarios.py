@@ -0,0 +1,145 @@
+import random
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+EMAIL = "bench@personalhub.test"
+PASSWORD = "bench-password"
+
+
+@dataclass
+class Context:
+    token: str
+    user_id: str
+    student_id: str
+    exercise_ids: List[str]
+    roster_cursors: List[Optional[str]]
+    stripe_session_id: str = ""
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}"}
+
+
+@dataclass
+class Scenario:
+    name: str
+    description: str
+    request: Callable[[httpx.AsyncClient, Context, int], Awaitable[httpx.Response]]
+    # Sobrescrevem as opções da linha de comando quando definidos
+    latency: Optional[float] = None
+    cache: Optional[bool] = None
+
+
+async def seed(db, roster_size: int, workouts: int = 4, exercises: int = 6, history: int = 20) -> str:
+    """Cria o treinador, a carteira de alunos e um aluno com histórico completo. Devolve o id do aluno."""
+    user_id = await db.create_user(EMAIL, PASSWORD)
+    rng = random.Random(42)
+    students = [
+        {"user_id": user_id, "name": f"Aluno {i:05d}", "age": rng.randint(16, 70), "goal": "Hipertrofia",
+         "initial_weight": rng.randint(55, 110), "height": rng.randint(150, 200)}
+        for i in range(roster_size)
+    ]
+    inserted = []
+    for start in range(0, len(students), 500):
+        inserted += await db.insert("students", students[start:start + 500])
+    student_id = inserted[0]["id"]
+
+    today = date.today()
+    for w in range(workouts):
+        workout = (await db.insert("workouts", {"user_id": user_id, "student_id": student_id, "name": f"Treino {'ABCD'[w % 4]}"}))[0]
+        rows = await db.insert("exercises", [
+            {"user_id": user_id, "workout_id": workout["id"], "name": f"Exercício {w}.{e}", "sets": 3, "reps": "10", "weight": "20kg"}
+            for e in range(exercises)
+        ])
+        await db.insert("exercise_history", [
+            {"user_id": user_id, "exercise_id": ex["id"], "date": (today - timedelta(days=7 * h)).isoformat(),
+             "weight": f"{20 + h}kg", "sets": 3, "reps": "3x10", "load_kg": 20 + h, "set_count": 3, "rep_count": 10}
+            for ex in rows for h in range(history)
+        ])
+    await db.insert("cardio", [
+        {"user_id": user_id, "student_id": student_id, "equipment": "Esteira", "duration": 20 + d % 15,
+         "date": (today - timedelta(days=d)).isoformat()}
+        for d in range(0, 180, 2)
+    ])
+    await db.insert("evolution", [
+        {"user_id": user_id, "student_id": student_id, "date": (today - timedelta(days=d)).isoformat(),
+         "current_weight": 80 - d / 30}
+        for d in range(0, 180, 7)
+    ])
+    await db.upsert("weekly_routine", [
+        {"user_id": user_id, "student_id": student_id, "day_of_week": d, "workout_name": f"Treino {'ABCD'[d % 4]}",
+         "exercises": [{"name": "Agachamento", "sets": 4, "reps": "8"}]}
+        for d in range(1, 6)
+    ])
+    return student_id
+
+
+async def prepare(client: httpx.AsyncClient, student_id: str, roster_page: int) -> Context:
+    response = await client.post("/api/auth/login", json={"email": EMAIL, "password": PASSWORD})
+    response.raise_for_status()
+    login = response.json()
+    ctx = Context(login["access_token"], login["user_id"], student_id, [], [None])
+
+    response = await client.get(f"/api/students/{student_id}/profile", headers=ctx.headers)
+    response.raise_for_status()
+    ctx.exercise_ids = [ex["id"] for w in response.json()["workouts"] for ex in w["exercises"]]
+
+    # Cursores de todas as páginas, para cada requisição pedir uma página diferente
+    while True:
+        params = {"limit": roster_page, "fields": "id,name,goal"}
+        if ctx.roster_cursors[-1]:
+            params["cursor"] = ctx.roster_cursors[-1]
+        response = await client.get("/api/students", params=params, headers=ctx.headers)
+        response.raise_for_status()
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+        ctx.roster_cursors.append(cursor)
+
+    response = await client.post("/api/create-checkout", json={"plan_type": "monthly", "email": "novo@personalhub.test"})
+    response.raise_for_status()
+    ctx.stripe_session_id = response.json()["session_id"]
+    return ctx
+
+
+async def student_profile(client: httpx.AsyncClient, ctx: Context, i: int) -> httpx.Response:
+    return await client.get(f"/api/students/{ctx.student_id}/profile", headers=ctx.headers)
+
+
+async def log_session(client: httpx.AsyncClient, ctx: Context, i: int) -> httpx.Response:
+    day = (date.today() - timedelta(days=i % 365)).isoformat()
+    entries = [
+        {"exercise_id": ex, "date": day, "weight": f"{30 + i % 20}kg", "sets": 3, "reps": "3x10"}
+        for ex in ctx.exercise_ids[:6]
+    ]
+    return await client.post("/api/exercise-history/bulk", json=entries, headers=ctx.headers)
+
+
+def list_roster(page_size: int):
+    async def request(client: httpx.AsyncClient, ctx: Context, i: int) -> httpx.Response:
+        params = {"limit": page_size}
+        cursor = ctx.roster_cursors[i % len(ctx.roster_cursors)]
+        if cursor:
+            params["cursor"] = cursor
+        return await client.get("/api/students", params=params, headers=ctx.headers)
+    return request
+
+
+async def verify_payment(client: httpx.AsyncClient, ctx: Context, i: int) -> httpx.Response:
+    return await client.get(f"/api/verify-payment/{ctx.stripe_session_id}")
+
+
+def build_scenarios(roster_page: int, slow_latency: float) -> Dict[str, Scenario]:
+    scenarios = [
+        Scenario("student_profile", "GET /students/{id}/profile de um aluno com histórico", student_profile),
+        Scenario("log_session", "POST /exercise-history/bulk com uma sessão de 6 exercícios", log_session),
+        Scenario("list_roster", f"GET /students paginado ({roster_page} por página)", list_roster(roster_page)),
+        Scenario("verify_payment", "GET /verify-payment: leitura local, Stripe simulado só na primeira", verify_payment),
+        # Sem cache, com upstream lento e concorrência acima do pool de threads
+        Scenario("slow_upstream", f"list_roster sem cache com {slow_latency * 1000:.0f} ms de upstream",
+                 list_roster(roster_page), latency=slow_latency, cache=False),
+    ]
+    return {s.name: s for s in scenarios}
@@ -0,0 +1,139 @@
+"""CPU por requisição no caminho de resposta das listas grandes.
+
+Uso: ``python -m tests.bench.serialization --help`` a partir da raiz do repositório.
+
+Compara o caminho atual (response_model validando e serializando cada resposta
+com o json da stdlib) com as linhas validadas uma vez na carga ou não validadas,
+serializadas com orjson, com e sem streaming.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Tuple
+
+import httpx
+
+from .runner import configure, install_stubs, load_server
+from .scenarios import EMAIL, PASSWORD, seed
+
+# nome -> (RESPONSE_VALIDATION, RESPONSE_STREAM_ROWS)
+VARIANTS = {
+    "full": ("full", 0),
+    "once": ("once", 0),
+    "once+stream": ("once", 5000),
+    "off": ("off", 0),
+    "off+stream": ("off", 5000),
+}
+
+
+@dataclass
+class Measurement:
+    cpu_ms: float
+    wall_ms: float
+    kib: float
+
+
+async def seed_lists(db, rows: int) -> Tuple[str, str]:
+    """Um exercício e um aluno com `rows` registros de histórico e de evolução. Devolve os ids."""
+    student_id = await seed(db, roster_size=1, workouts=1, exercises=1, history=0)
+    user_id = (await db.select("students", {"id": student_id}, columns="user_id"))[0]["user_id"]
+    exercise_id = (await db.select("exercises", {"user_id": user_id}, columns="id"))[0]["id"]
+    today = date.today()
+    history = [
+        {"user_id": user_id, "exercise_id": exercise_id, "date": (today - timedelta(days=i)).isoformat(),
+         "weight": f"{20 + i % 40}kg", "sets": 3, "reps": "3x10", "observations": "Boa execução",
+         "load_kg": 20 + i % 40, "set_count": 3, "rep_count": 10}
+        for i in range(rows)
+    ]
+    evolution = [
+        {"user_id": user_id, "student_id": student_id, "date": (today - timedelta(days=i)).isoformat(),
+         "current_weight": 80 - (i % 100) / 10, "observations": "Semana regular", "performance": "Boa"}
+        for i in range(rows)
+    ]
+    for start in range(0, rows, 1000):
+        await db.insert("exercise_history", history[start:start + 1000])
+        await db.insert("evolution", evolution[start:start + 1000])
+    return exercise_id, student_id
+
+
+async def measure(client: httpx.AsyncClient, path: str, params: dict, headers: dict, requests: int) -> Tuple[Measurement, bytes]:
+    response = await client.get(path, params=params, headers=headers)
+    response.raise_for_status()
+    body = response.content
+    cpu, wall = time.process_time(), time.perf_counter()
+    for _ in range(requests):
+        response = await client.get(path, params=params, headers=headers)
+        response.raise_for_status()
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    return Measurement(round(cpu / requests * 1000, 2), round(wall / requests * 1000, 2), round(len(body) / 1024, 1)), body
+
+
+def run(options) -> Dict[str, Dict[str, Measurement]]:
+    db_path = str(Path(tempfile.mkdtemp(prefix="personalhub-bench-")) / "bench.db")
+    server = load_server(db_path, pool_size=4)
+    upstream, stripe_stub = install_stubs(server, latency=0.0, pool_size=4)
+    server.db.start()
+    exercise_id, student_id = asyncio.run(seed_lists(upstream.inner, options.rows))
+    endpoints = {
+        "exercise-history": ("/api/exercise-history", {"exercise_id": exercise_id}),
+        "evolution": ("/api/evolution", {"student_id": student_id}),
+    }
+
+    async def bench() -> Dict[str, Dict[str, Measurement]]:
+        results: Dict[str, Dict[str, Measurement]] = {}
+        # Corpo do caminho atual por endpoint: com validação, as outras variantes devem devolver o mesmo JSON
+        references: Dict[str, list] = {}
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            login = (await client.post("/api/auth/login", json={"email": EMAIL, "password": PASSWORD})).json()
+            headers = {"Authorization": f"Bearer {login['access_token']}"}
+            for cache in (True, False):
+                for name, (validation, stream_rows) in VARIANTS.items():
+                    configure(server, upstream, 0.0, cache)
+                    server.RESPONSE_VALIDATION = validation
+                    server.RESPONSE_STREAM_ROWS = stream_rows
+                    for endpoint, (path, params) in endpoints.items():
+                        measurement, body = await measure(client, path, params, headers, options.requests)
+                        if validation != "off":
+                            parsed = json.loads(body)
+                            if references.setdefault(endpoint, parsed) != parsed:
+                                raise AssertionError(f"{name}: resposta de {endpoint} difere do caminho atual")
+                        group = f"{endpoint}/{'cache' if cache else 'sem-cache'}"
+                        results.setdefault(group, {})[name] = measurement
+        return results
+
+    try:
+        return asyncio.run(bench())
+    finally:
+        stripe_stub.uninstall()
+        server.db.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m tests.bench.serialization", description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000, help="linhas em cada lista")
+    parser.add_argument("--requests", type=int, default=30, help="requisições sequenciais medidas por variante")
+    parser.add_argument("--json", action="store_true", help="saída em JSON")
+    options = parser.parse_args()
+
+    results = run(options)
+    if options.json:
+        print(json.dumps({k: {n: asdict(m) for n, m in v.items()} for k, v in results.items()}, indent=2))
+        return 0
+    for group, measurements in results.items():
+        base = measurements["full"].cpu_ms
+        print(f"\n{group} ({options.rows} linhas)")
+        for name, m in measurements.items():
+            print(f"  {name:<12} CPU {m.cpu_ms:>8.2f} ms/req  ({m.cpu_ms / base:>5.0%} do atual)  "
+                  f"tempo {m.wall_ms:>8.2f} ms/req  {m.kib:>8.1f} KiB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,32 @@
+"""Processo do driver uvicorn: o app com os stubs, mais uma rota para trocar latência e cache entre cenários."""
+import argparse
+
+import uvicorn
+from fastapi import Body
+
+from .runner import CONTROL_PATH, configure, install_stubs, load_server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", required=True)
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--pool-size", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.0)
+    options = parser.parse_args()
+
+    server = load_server(options.db, options.pool_size)
+    upstream, _stripe_stub = install_stubs(server, options.latency, options.pool_size)
+
+    @server.app.post(CONTROL_PATH)
+    async def bench_config(latency: float = Body(...), cache: bool = Body(...)):
+        configure(server, upstream, latency, cache)
+        return {"latency": latency, "cache": cache}
+
+    # Keep-alive acima do padrão (5 s): o cliente reaproveita as conexões do pool entre cenários, e
+    # uma fechada pelo servidor no meio do caminho vira httpx.ReadError em vez de uma medição
+    uvicorn.run(server.app, host="127.0.0.1", port=options.port, log_level="warning", timeout_keep_alive=120)
+
+
+if __name__ == "__main__":
+    main()
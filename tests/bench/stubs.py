@@ -0,0 +1,127 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+
+from db import Database
+
+
+class LatencyDatabase(Database):
+    """Repositório que simula a latência de rede do Supabase/PostgREST e do Auth.
+
+    Delega ao repositório real (SQLite em memória nos benchmarks) e, antes de
+    cada chamada, bloqueia uma thread de um pool do tamanho de
+    UPSTREAM_POOL_SIZE por `latency` segundos, como o client síncrono faz
+    enquanto espera a resposta HTTP. Com concorrência acima do pool, as
+    requisições passam a enfileirar, que é o cenário de upstream lento.
+    """
+
+    def __init__(self, inner: Database, latency: float = 0.0, pool_size: int = 16):
+        self.inner = inner
+        self.latency = latency
+        self.pool_size = pool_size
+        self.calls = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def start(self) -> None:
+        self.inner.start()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="stub-upstream")
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.inner.close()
+
+    async def _wait(self) -> None:
+        self.calls += 1
+        if self.latency <= 0:
+            return
+        if self._executor is None:
+            self.start()
+        await asyncio.get_running_loop().run_in_executor(self._executor, time.sleep, self.latency)
+
+    async def run(self, fn, *args, **kwargs) -> Any:
+        return await self.inner.run(fn, *args, **kwargs)
+
+    async def select(self, table, filters, **kwargs):
+        await self._wait()
+        return await self.inner.select(table, filters, **kwargs)
+
+    async def insert(self, table, rows):
+        await self._wait()
+        return await self.inner.insert(table, rows)
+
+    async def upsert(self, table, rows, on_conflict="id", ignore_duplicates=False):
+        await self._wait()
+        return await self.inner.upsert(table, rows, on_conflict=on_conflict, ignore_duplicates=ignore_duplicates)
+
+    async def update(self, table, values, filters):
+        await self._wait()
+        return await self.inner.update(table, values, filters)
+
+    async def delete(self, table, filters):
+        await self._wait()
+        return await self.inner.delete(table, filters)
+
+    async def rpc(self, function, params):
+        await self._wait()
+        return await self.inner.rpc(function, params)
+
+    async def ping(self):
+        await self._wait()
+        return await self.inner.ping()
+
+    async def sign_in(self, email, password):
+        await self._wait()
+        return await self.inner.sign_in(email, password)
+
+    async def sign_out(self):
+        await self._wait()
+        return await self.inner.sign_out()
+
+    def get_user_id(self, token):
+        time.sleep(self.latency)
+        return self.inner.get_user_id(token)
+
+    async def create_user(self, email, password):
+        await self._wait()
+        return await self.inner.create_user(email, password)
+
+
+class StripeStub:
+    """Substitui `stripe.checkout.Session` por sessões fictícias já pagas, com a mesma latência."""
+
+    def __init__(self, stripe_module, db: LatencyDatabase):
+        self.stripe = stripe_module
+        self.db = db
+        self.sessions: Dict[str, SimpleNamespace] = {}
+        self._original = None
+
+    def install(self) -> None:
+        self._original = self.stripe.checkout.Session
+        self.stripe.checkout.Session = SimpleNamespace(create=self.create, retrieve=self.retrieve)
+
+    def uninstall(self) -> None:
+        if self._original is not None:
+            self.stripe.checkout.Session = self._original
+
+    def create(self, customer_email=None, metadata=None, **_kwargs) -> SimpleNamespace:
+        time.sleep(self.db.latency)
+        session_id = f"cs_test_{len(self.sessions) + 1}"
+        session = SimpleNamespace(
+            id=session_id,
+            url=f"https://checkout.stripe.test/{session_id}",
+            payment_status="paid",
+            status="complete",
+            customer_email=customer_email,
+            metadata=metadata or {},
+        )
+        self.sessions[session_id] = session
+        return session
+
+    def retrieve(self, session_id: str) -> SimpleNamespace:
+        time.sleep(self.db.latency)
+        return self.sessions[session_id]
@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from tests.bench.runner import load_server
+from tests.bench.scenarios import EMAIL, PASSWORD, seed
+
+POOL_SIZE = 4
+
+
+@pytest.fixture(scope="session")
+def server(tmp_path_factory):
+    """O app com DB_BACKEND=sqlite num arquivo temporário (importado uma vez por sessão)."""
+    return load_server(str(tmp_path_factory.mktemp("personalhub") / "test.db"), pool_size=POOL_SIZE)
+
+
+@pytest.fixture(scope="session")
+def client(server):
+    with TestClient(server.app) as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def student_id(server, client) -> str:
+    """Treinador de teste com um aluno completo (treinos, exercícios, histórico, cardio, evolução e rotina)."""
+    return asyncio.run(seed(server.repository, roster_size=3, workouts=2, exercises=2, history=3))
+
+
+@pytest.fixture(scope="session")
+def login(client, student_id) -> dict:
+    response = client.post("/api/auth/login", json={"email": EMAIL, "password": PASSWORD})
+    response.raise_for_status()
+    return response.json()
+
+
+@pytest.fixture(scope="session")
+def headers(login) -> dict:
+    return {"Authorization": f"Bearer {login['access_token']}"}
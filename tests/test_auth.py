@@ -0,0 +1,8 @@
+def test_change_stream_rejects_token_in_query_string(client, login):
+    # Tokens na URL acabam nos logs de acesso e de proxies: só o header Authorization vale
+    response = client.get("/api/changes/stream", params={"access_token": login["access_token"]})
+    assert response.status_code == 401
+
+
+def test_missing_token_is_401(client):
+    assert client.get("/api/students").status_code == 401
@@ -0,0 +1,23 @@
+import asyncio
+
+
+def test_load_and_store_skips_values_loaded_across_a_write(server):
+    stored = []
+
+    async def load_with_write():
+        server.response_cache.invalidate("trainer-x", "students")
+        return "stale"
+
+    async def load():
+        return "fresh"
+
+    assert asyncio.run(server.load_and_store("trainer-x", load_with_write, stored.append)) == "stale"
+    assert stored == []
+    assert asyncio.run(server.load_and_store("trainer-x", load, stored.append)) == "fresh"
+    assert stored == ["fresh"]
+
+
+def test_search_finds_typos(client, headers, student_id):
+    response = client.get("/api/search", params={"q": "Alno 00000", "types": "students"}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()[0]["id"] == student_id
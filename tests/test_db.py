@@ -0,0 +1,40 @@
+import asyncio
+import uuid
+
+import pytest
+
+from db import Database, InstrumentedDatabase
+from sqlite_db import SQLiteDatabase, new_ids
+
+
+def test_backend_missing_a_method_fails_at_instantiation():
+    class Partial(Database):
+        async def run(self, fn, *args, **kwargs):
+            return fn(*args, **kwargs)
+
+    with pytest.raises(TypeError, match="abstract"):
+        Partial()
+
+
+def test_backends_implement_every_method():
+    InstrumentedDatabase(SQLiteDatabase(":memory:"), "sqlite")
+
+
+def test_new_ids_are_distinct_uuid4():
+    ids = new_ids(50)
+    assert len(set(ids)) == 50
+    assert all(uuid.UUID(value).version == 4 for value in ids)
+
+
+def test_concurrent_sqlite_writes_queue_instead_of_hitting_busy_timeout(tmp_path):
+    async def scenario():
+        db = SQLiteDatabase(str(tmp_path / "writes.db"), pool_size=8, busy_timeout=0)
+        user = await db.create_user("escrita@example.com", "senha-segura")
+        rows = await asyncio.gather(*(
+            db.insert("students", [{"user_id": user, "name": f"Aluno {i}-{j}"} for j in range(3)]) for i in range(40)
+        ))
+        db.close()
+        return rows
+
+    rows = [row for batch in asyncio.run(scenario()) for row in batch]
+    assert len({row["id"] for row in rows}) == 120
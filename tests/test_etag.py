@@ -0,0 +1,126 @@
+import uuid
+from datetime import date
+
+import pytest
+
+TODAY = date.today().isoformat()
+
+
+@pytest.fixture(scope="module")
+def ids(client, headers, student_id) -> dict:
+    profile = client.get(f"/api/students/{student_id}/profile", headers=headers).json()
+    workout = profile["workouts"][0]
+    return {
+        "student_id": student_id,
+        "workout_id": workout["id"],
+        "exercise_id": workout["exercises"][0]["id"],
+        "routine_id": profile["weekly_routine"][0]["id"],
+    }
+
+
+def unique(prefix: str) -> str:
+    return f"{prefix} {uuid.uuid4().hex[:8]}"
+
+
+# Recurso -> (leitura, escrita que altera o resultado da leitura)
+RESOURCES = {
+    "students": (
+        lambda ids: ("/api/students", {}),
+        lambda ids: ("POST", "/api/students", {"name": unique("Aluno")}),
+    ),
+    "workouts": (
+        lambda ids: ("/api/workouts", {"student_id": ids["student_id"]}),
+        lambda ids: ("POST", "/api/workouts", {"student_id": ids["student_id"], "name": unique("Treino")}),
+    ),
+    "exercises": (
+        lambda ids: ("/api/exercises", {"workout_id": ids["workout_id"]}),
+        lambda ids: ("POST", "/api/exercises", {"workout_id": ids["workout_id"], "name": unique("Remada")}),
+    ),
+    "exercise-history": (
+        lambda ids: ("/api/exercise-history", {"exercise_id": ids["exercise_id"]}),
+        lambda ids: ("POST", "/api/exercise-history", {"exercise_id": ids["exercise_id"], "date": TODAY, "weight": "42kg"}),
+    ),
+    "cardio": (
+        lambda ids: ("/api/cardio", {"student_id": ids["student_id"]}),
+        lambda ids: ("POST", "/api/cardio", {"student_id": ids["student_id"], "equipment": unique("Bike"), "duration": 30}),
+    ),
+    "evolution": (
+        lambda ids: ("/api/evolution", {"student_id": ids["student_id"]}),
+        lambda ids: ("POST", "/api/evolution", {"student_id": ids["student_id"], "date": TODAY, "current_weight": 81.5}),
+    ),
+    "weekly-routine": (
+        lambda ids: ("/api/weekly-routine", {"student_id": ids["student_id"]}),
+        lambda ids: ("PUT", f"/api/weekly-routine/{ids['routine_id']}",
+                     {"student_id": ids["student_id"], "day_of_week": 1, "workout_name": unique("Treino")}),
+    ),
+    "profile": (
+        lambda ids: (f"/api/students/{ids['student_id']}/profile", {}),
+        lambda ids: ("POST", "/api/cardio", {"student_id": ids["student_id"], "equipment": unique("Remo"), "duration": 15}),
+    ),
+    "timeseries": (
+        lambda ids: (f"/api/students/{ids['student_id']}/timeseries", {}),
+        lambda ids: ("POST", "/api/evolution", {"student_id": ids["student_id"], "date": TODAY, "current_weight": 77.25}),
+    ),
+    "schedule": (
+        lambda ids: ("/api/schedule", {"day_of_week": 1, "date": TODAY}),
+        lambda ids: ("POST", "/api/weekly-routine", {"student_id": ids["student_id"], "day_of_week": 1, "workout_name": unique("Treino")}),
+    ),
+}
+
+
+@pytest.mark.parametrize("resource", RESOURCES)
+def test_get_returns_etag(client, headers, ids, resource):
+    path, params = RESOURCES[resource][0](ids)
+    response = client.get(path, params=params, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["ETag"].startswith('"')
+    assert response.headers["Cache-Control"] == "private, no-cache"
+
+
+@pytest.mark.parametrize("resource", RESOURCES)
+def test_if_none_match_returns_304(client, headers, ids, resource):
+    path, params = RESOURCES[resource][0](ids)
+    etag = client.get(path, params=params, headers=headers).headers["ETag"]
+    response = client.get(path, params=params, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+
+
+@pytest.mark.parametrize("resource", RESOURCES)
+def test_mutation_changes_etag(client, headers, ids, resource):
+    read, write = RESOURCES[resource]
+    path, params = read(ids)
+    etag = client.get(path, params=params, headers=headers).headers["ETag"]
+
+    method, write_path, body = write(ids)
+    assert client.request(method, write_path, json=body, headers=headers).status_code == 200
+
+    response = client.get(path, params=params, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+@pytest.mark.parametrize("resource", RESOURCES)
+def test_revalidation_does_not_load(server, client, headers, ids, resource, monkeypatch):
+    path, params = RESOURCES[resource][0](ids)
+    etag = client.get(path, params=params, headers=headers).headers["ETag"]
+
+    # Sem cache, só o ETag da versão pode evitar a consulta
+    monkeypatch.setattr(server, "CACHE_ENABLED", False)
+    calls = []
+    for method in ("select", "rpc"):
+        original = getattr(server.repository, method)
+        monkeypatch.setattr(server.repository, method, lambda *a, _original=original, **k: calls.append(a) or _original(*a, **k))
+
+    response = client.get(path, params=params, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert calls == []
+
+
+def test_wildcard_revalidation_of_unknown_student_is_404(client, headers):
+    response = client.get(
+        "/api/students/00000000-0000-0000-0000-000000000000/profile",
+        headers={**headers, "If-None-Match": "*"},
+    )
+    assert response.status_code == 404
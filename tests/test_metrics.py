@@ -0,0 +1,59 @@
+from metrics import MetricsMiddleware, http_duration, upstream_duration
+
+
+def metrics_middleware(server) -> MetricsMiddleware:
+    layer = server.app.middleware_stack
+    while not isinstance(layer, MetricsMiddleware):
+        layer = layer.app
+    return layer
+
+
+def auth_calls(operation: str) -> int:
+    series = upstream_duration._series.get(("auth", operation))
+    return sum(series[0]) if series else 0
+
+
+def test_local_token_verification_is_not_an_upstream_call(server, client, login, headers):
+    before = auth_calls("get_user")
+    server.token_verifier.invalidate(login["access_token"])
+    assert client.get("/api/students", headers=headers).status_code == 200
+    assert client.get("/api/students", headers=headers).status_code == 200
+    assert auth_calls("get_user") == before
+    assert auth_calls("verify_token") == 0
+
+
+def test_remote_token_check_is_tracked(server, client, login, headers, monkeypatch):
+    # Sem o segredo HS256, o token só pode ser validado no provedor de auth
+    monkeypatch.setattr(server.token_verifier, "jwt_secret", "")
+    server.token_verifier.invalidate(login["access_token"])
+    before = auth_calls("get_user")
+    assert client.get("/api/students", headers=headers).status_code == 200
+    assert auth_calls("get_user") == before + 1
+
+
+def test_route_labels_use_the_template(client, headers, student_id):
+    assert client.get("/api/students", headers=headers).status_code == 200
+    assert client.get(f"/api/students/{student_id}/profile", headers=headers).status_code == 200
+    labels = {labels[1] for labels in http_duration._series}
+    assert {"/api/students", "/api/students/{student_id}/profile"} <= labels
+    assert not any(student_id in label for label in labels)
+
+
+def test_static_route_label_is_cached(server, client, headers, monkeypatch):
+    middleware = metrics_middleware(server)
+    assert client.get("/api/students", headers=headers).status_code == 200
+    assert middleware.static_routes[("GET", "/api/students")] == "/api/students"
+
+    def no_scan(app, scope):
+        raise AssertionError("rota estática deveria vir do cache")
+
+    monkeypatch.setattr("metrics.route_path", no_scan)
+    assert client.get("/api/students", headers=headers).status_code == 200
+
+
+def test_parameterized_route_is_not_cached_per_path(server, client, headers, student_id):
+    middleware = metrics_middleware(server)
+    path = f"/api/students/{student_id}/profile"
+    assert client.get(path, headers=headers).status_code == 200
+    assert ("GET", path) not in middleware.static_routes
+    assert not any(student_id in route for _method, route in middleware.static_routes)
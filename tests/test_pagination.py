@@ -0,0 +1,52 @@
+import base64
+import json
+
+import pytest
+
+from db import SupabaseDatabase
+
+
+def make_cursor(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+
+def test_cursor_walks_every_page(client, headers, student_id):
+    ids, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/students", params=params, headers=headers)
+        assert response.status_code == 200
+        ids += [row["id"] for row in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    everyone = client.get("/api/students", headers=headers).json()
+    assert ids == [row["id"] for row in everyone]
+
+
+@pytest.mark.parametrize("cursor", [
+    "não-é-base64",
+    make_cursor({"created_at": "2024-01-01", "id": "x"}),
+    make_cursor(["2024-01-01"]),
+    make_cursor(["2024-01-01", "x", "y"]),
+    make_cursor([["2024-01-01"], "x"]),
+    make_cursor([{"a": 1}, "x"]),
+    make_cursor([True, "x"]),
+    make_cursor([None, "x"]),
+    make_cursor(["2024-01-01", 1]),
+])
+def test_malformed_cursor_is_rejected(client, headers, student_id, cursor):
+    response = client.get("/api/students", params={"limit": 2, "cursor": cursor}, headers=headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Cursor inválido"
+
+
+def test_cursor_with_reserved_characters_is_a_plain_value(client, headers, student_id):
+    response = client.get("/api/students", params={"limit": 2, "cursor": make_cursor(['2024",id.gt.(x)\\', 'a"b'])}, headers=headers)
+    assert response.status_code == 200
+
+
+def test_postgrest_values_are_quoted():
+    assert SupabaseDatabase._quote('2024",and(id.gt.x)') == '"2024\\",and(id.gt.x)"'
+    assert SupabaseDatabase._quote("a\\b") == '"a\\\\b"'
+    assert SupabaseDatabase._quote(12.5) == '"12.5"'
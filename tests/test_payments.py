@@ -0,0 +1,37 @@
+import asyncio
+import secrets
+from datetime import datetime, timedelta, timezone
+
+
+def purchase_token(server, expires_in: timedelta) -> dict:
+    row = {
+        "token": secrets.token_urlsafe(16),
+        "email": f"{secrets.token_hex(4)}@personalhub.test",
+        "plan_type": "monthly",
+        "stripe_session_id": f"cs_test_{secrets.token_hex(8)}",
+        "used": False,
+        "expires_at": (datetime.now(timezone.utc) + expires_in).isoformat(),
+    }
+    return asyncio.run(server.repository.insert("purchase_tokens", row))[0]
+
+
+def signup(client, token: dict):
+    return client.post("/api/signup", json={"email": token["email"], "password": "senha-forte", "token": token["token"]})
+
+
+def test_expired_token_is_reported_as_expired_and_not_consumed(server, client):
+    token = purchase_token(server, timedelta(hours=-1))
+    for _ in range(2):
+        response = signup(client, token)
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Token expirado"
+    stored = asyncio.run(server.repository.select("purchase_tokens", {"token": token["token"]}))
+    assert stored[0]["used"] is False
+
+
+def test_token_creates_a_single_account(server, client):
+    token = purchase_token(server, timedelta(hours=1))
+    assert signup(client, token).status_code == 200
+    response = signup(client, token)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Token inválido ou já utilizado"
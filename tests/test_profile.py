@@ -0,0 +1,28 @@
+def test_history_limit_returns_latest_entries_per_exercise(client, headers, student_id):
+    response = client.get(f"/api/students/{student_id}/profile", params={"history_limit": 2}, headers=headers)
+    assert response.status_code == 200
+    exercises = [ex for w in response.json()["workouts"] for ex in w["exercises"]]
+    assert exercises
+    for exercise in exercises:
+        full = client.get("/api/exercise-history", params={"exercise_id": exercise["id"]}, headers=headers).json()
+        assert [h["id"] for h in exercise["history"]] == [h["id"] for h in full[:2]]
+
+
+def test_profile_without_history_limit_omits_history(client, headers, student_id):
+    response = client.get(f"/api/students/{student_id}/profile", headers=headers)
+    assert response.status_code == 200
+    assert all(ex["history"] == [] for w in response.json()["workouts"] for ex in w["exercises"])
+
+
+def test_progress_of_unknown_student_is_404(server, client, login, headers):
+    response = client.get("/api/students/00000000-0000-0000-0000-000000000000/progress", headers=headers)
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Aluno não encontrado"
+    assert server.progress_tracker.get(login["user_id"], "00000000-0000-0000-0000-000000000000") is None
+
+
+def test_progress_of_deleted_student_is_404(client, headers, student_id):
+    created = client.post("/api/students", json={"name": "Aluno Removido"}, headers=headers).json()
+    assert client.get(f"/api/students/{created['id']}/progress", headers=headers).status_code == 200
+    client.delete(f"/api/students/{created['id']}", headers=headers)
+    assert client.get(f"/api/students/{created['id']}/progress", headers=headers).status_code == 404
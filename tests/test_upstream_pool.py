@@ -0,0 +1,55 @@
+import asyncio
+import threading
+import time
+
+import httpx
+
+from tests.bench.runner import percentile
+
+REQUESTS = 100
+HOLD_TIMEOUT = 10.0
+P99_BOUND = 1.0
+
+
+def test_slow_upstream_call_does_not_stall_other_requests(server, headers, student_id, monkeypatch):
+    """Uma chamada presa no upstream ocupa só uma thread do pool; as outras listas continuam rápidas."""
+    monkeypatch.setattr(server, "CACHE_ENABLED", False)
+    repository = server.repository
+    select = repository.select
+    entered, release = threading.Event(), threading.Event()
+
+    def hold():
+        # Bloqueia uma thread do pool, como o client síncrono esperando uma resposta HTTP lenta
+        entered.set()
+        release.wait(HOLD_TIMEOUT)
+
+    async def held_select(table, filters, **kwargs):
+        if table == "cardio":
+            await repository.run(hold)
+        return await select(table, filters, **kwargs)
+
+    monkeypatch.setattr(repository, "select", held_select)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            slow = asyncio.create_task(client.get("/api/cardio", params={"student_id": student_id}, headers=headers))
+            try:
+                while not entered.is_set():
+                    await asyncio.sleep(0.01)
+
+                async def timed(i: int) -> float:
+                    started = time.perf_counter()
+                    response = await client.get("/api/students", params={"limit": 1 + i % 20}, headers=headers)
+                    assert response.status_code == 200
+                    return time.perf_counter() - started
+
+                latencies = sorted(await asyncio.gather(*(timed(i) for i in range(REQUESTS))))
+                assert not slow.done()
+            finally:
+                release.set()
+            assert (await slow).status_code == 200
+            return latencies
+
+    latencies = asyncio.run(scenario())
+    assert percentile(latencies, 99) < P99_BOUND